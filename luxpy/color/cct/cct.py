@@ -444,7 +444,7 @@ def xyz_to_cct_search(xyzw, cieobs = _CIEOBS, out = 'cct',wl = None, accuracy =
     elif (out == "[cct,duv]") | (out == -2):
         return np.vstack((ccts,duvs)).T
 
-def xyz_to_cct_ohno(xyzw, cieobs = _CIEOBS, out = 'cct', wl = None, accuracy = 0.1, force_out_of_lut = True, upper_cct_max = 10.0**20, approx_cct_temp = True):
+def xyz_to_cct_ohno(xyzw, cieobs = _CIEOBS, out = 'cct', wl = None, accuracy = 0.1, force_out_of_lut = True, upper_cct_max = 10.0**20, approx_cct_temp = True, chunk_size = 1000):
     """
     Convert XYZ tristimulus values to correlated color temperature (CCT) and 
     Duv (distance above (>0) or below (<0) the Planckian locus) 
@@ -477,6 +477,9 @@ def xyz_to_cct_ohno(xyzw, cieobs = _CIEOBS, out = 'cct', wl = None, accuracy = 0
             | True, optional
             | If True and cct is out of range of the LUT, then switch to 
               brute-force search method, else return numpy.nan values.
+        :chunk_size:
+            | 1000, optional
+            | Number of xyzw processed at once in the (vectorized) LUT search.
         
     Returns:
         :returns: 
@@ -511,64 +514,49 @@ def xyz_to_cct_ohno(xyzw, cieobs = _CIEOBS, out = 'cct', wl = None, accuracy = 0
     # load cct & uv from LUT:
     if cieobs not in _CCT_LUT:
         _CCT_LUT[cieobs] = calculate_lut(ccts = None, cieobs = cieobs, add_to_lut = False)
-    cct_LUT = _CCT_LUT[cieobs][:,0,None] 
+    cct_LUT = _CCT_LUT[cieobs][:,0] 
     uv_LUT = _CCT_LUT[cieobs][:,1:3] 
     
-    # calculate CCT of each uv:
+    # calculate CCT of each uv (vectorized, in chunks to limit memory use):
     CCT = np.ones(uv.shape[0])*np.nan # initialize with NaN's
     Duv = CCT.copy() # initialize with NaN's
     idx_m = 0
     idx_M = uv_LUT.shape[0]-1
-    for i in range(uv.shape[0]):
-        out_of_lut = False
-        delta_uv = (((uv_LUT - uv[i])**2.0).sum(axis = 1))**0.5 # calculate distance of uv with uv_LUT
-        idx_min = delta_uv.argmin() # find index of minimum distance 
+    out_of_lut = np.zeros(uv.shape[0], dtype = bool)
+    chunk_size = max(int(chunk_size),1)
+    for s in range(0, uv.shape[0], chunk_size):
+        uv_s = uv[s:s + chunk_size]
+        rows = np.arange(uv_s.shape[0])
+        delta_uv = (((uv_LUT[None,:,:] - uv_s[:,None,:])**2.0).sum(axis = 2))**0.5 # calculate distance of uv with uv_LUT
+        idx_min = delta_uv.argmin(axis = 1) # find index of minimum distance 
 
         # find Tm, delta_uv and u,v for 2 points surrounding uv corresponding to idx_min:
-        if idx_min == idx_m:
-            idx_min_m1 = idx_min
-            out_of_lut = True
-        else:
-            idx_min_m1 = idx_min - 1
-        if idx_min == idx_M:
-            idx_min_p1 = idx_min
-            out_of_lut = True
-        else:
-            idx_min_p1 = idx_min + 1
-        
+        idx_min_m1 = np.where(idx_min == idx_m, idx_min, idx_min - 1)
+        idx_min_p1 = np.where(idx_min == idx_M, idx_min, idx_min + 1)
+        out_of_lut[s:s + chunk_size] = (idx_min == idx_m) | (idx_min == idx_M)
 
-        if (out_of_lut == True) & (force_out_of_lut == True): # calculate using search-function
-            cct_i, Duv_i = xyz_to_cct_search(xyzw[i], cieobs = cieobs, wl = wl, accuracy = accuracy,out = 'cct,duv',upper_cct_max = upper_cct_max, approx_cct_temp = approx_cct_temp)
-            CCT[i] = cct_i
-            Duv[i] = Duv_i
-            continue
-        elif (out_of_lut == True) & (force_out_of_lut == False):
-            CCT[i] = np.nan
-            Duv[i] = np.nan
-            
-            
         cct_m1 = cct_LUT[idx_min_m1] # - 2*_EPS
-        delta_uv_m1 = delta_uv[idx_min_m1]
+        delta_uv_m1 = delta_uv[rows,idx_min_m1]
         uv_m1 = uv_LUT[idx_min_m1]
         cct_p1 = cct_LUT[idx_min_p1] 
-        delta_uv_p1 = delta_uv[idx_min_p1]
+        delta_uv_p1 = delta_uv[rows,idx_min_p1]
         uv_p1 = uv_LUT[idx_min_p1]
 
         cct_0 = cct_LUT[idx_min]
-        delta_uv_0 = delta_uv[idx_min]
+        delta_uv_0 = delta_uv[rows,idx_min]
 
         # calculate uv distance between Tm_m1 & Tm_p1:
-        delta_uv_p1m1 = ((uv_p1[0] - uv_m1[0])**2.0 + (uv_p1[1] - uv_m1[1])**2.0)**0.5
+        delta_uv_p1m1 = ((uv_p1[:,0] - uv_m1[:,0])**2.0 + (uv_p1[:,1] - uv_m1[:,1])**2.0)**0.5
 
         # Triangular solution:
         x = ((delta_uv_m1**2)-(delta_uv_p1**2)+(delta_uv_p1m1**2))/(2*delta_uv_p1m1)
         Tx = cct_m1 + ((cct_p1 - cct_m1) * (x / delta_uv_p1m1))
-        uBB = uv_m1[0] + (uv_p1[0] - uv_m1[0]) * (x / delta_uv_p1m1)
-        vBB = uv_m1[1] + (uv_p1[1] - uv_m1[1]) * (x / delta_uv_p1m1)
+        uBB = uv_m1[:,0] + (uv_p1[:,0] - uv_m1[:,0]) * (x / delta_uv_p1m1)
+        vBB = uv_m1[:,1] + (uv_p1[:,1] - uv_m1[:,1]) * (x / delta_uv_p1m1)
 
         Tx_corrected_triangular = Tx*0.99991
-        signDuv = np.sign(uv[i][1]-vBB)
-        Duv_triangular = signDuv*np.atleast_1d(((delta_uv_m1**2.0) - (x**2.0))**0.5)
+        signDuv = np.sign(uv_s[:,1]-vBB)
+        Duv_triangular = signDuv*(((delta_uv_m1**2.0) - (x**2.0))**0.5)
 
                                 
         # Parabolic solution:   
@@ -583,13 +571,16 @@ def xyz_to_cct_ohno(xyzw, cieobs = _CIEOBS, out = 'cct', wl = None, accuracy = 0
         Duv_parabolic = signDuv*(A*np.power(Tx_corrected_parabolic,2) + B*Tx_corrected_parabolic + C)
 
         Threshold = 0.002
-        if Duv_triangular < Threshold:
-            CCT[i] = Tx_corrected_triangular
-            Duv[i] = Duv_triangular
-        else:
-            CCT[i] = Tx_corrected_parabolic
-            Duv[i] = Duv_parabolic
+        is_triangular = Duv_triangular < Threshold
+        CCT[s:s + chunk_size] = np.where(is_triangular, Tx_corrected_triangular, Tx_corrected_parabolic)
+        Duv[s:s + chunk_size] = np.where(is_triangular, Duv_triangular, Duv_parabolic)
     
+    # calculate out-of-lut ccts using search-function:
+    if force_out_of_lut == True:
+        for i in np.where(out_of_lut)[0]:
+            cct_i, Duv_i = xyz_to_cct_search(xyzw[i], cieobs = cieobs, wl = wl, accuracy = accuracy,out = 'cct,duv',upper_cct_max = upper_cct_max, approx_cct_temp = approx_cct_temp)
+            CCT[i] = cct_i
+            Duv[i] = Duv_i
     
     # Regulate output:
     if (out == 'cct') | (out == 1):
@@ -43,6 +43,9 @@ VECTOR FIELD MODEL
  :get_poly_model(): Setup base color shift model (delta_a, delta_b), 
                     determine model parameters and accuracy.
 
+ :get_poly_models(): Vectorized version of get_poly_model() 
+                     for multiple test SPDs.
+
  :apply_poly_model_at_x(): Applies base color shift model 
                            at cartesian coordinates axr, bxr.
 
@@ -87,13 +90,14 @@ VECTOR FIELD & PIXEL MODEL
 .. codeauthor:: Kevin A.G. Smet (ksmet1977 at gmail.com)
 """
 
-from luxpy import np, pd, _CIE_ILLUMINANTS, spd_to_xyz, colortf
+from luxpy import np, pd, _CIE_ILLUMINANTS, spd_to_xyz, colortf, parallel_map
+from functools import partial
 from .vectorshiftmodel import *
 from .pixelshiftmodel import *
 
 # .colorrendition_vectorshiftmodel:
 __all__ = ['_VF_CRI_DEFAULT','_VF_CSPACE','_VF_CSPACE_EXAMPLE','_VF_CIEOBS','_VF_MAXR','_VF_DELTAR','_VF_MODEL_TYPE','_VF_SIG','_VF_PCOLORSHIFT']
-__all__ += ['get_poly_model','apply_poly_model_at_x','generate_vector_field','VF_colorshift_model','initialize_VF_hue_angles']
+__all__ += ['get_poly_model','get_poly_models','apply_poly_model_at_x','generate_vector_field','VF_colorshift_model','initialize_VF_hue_angles']
 __all__ += ['generate_grid','calculate_shiftvectors','plot_shift_data','plotcircle']
 
 # .colorrendition_pixelshiftmodel:
@@ -108,7 +112,7 @@ __all__ +=['calculate_VF_PX_models','subsample_RFL_set','plot_VF_PX_models']
 def calculate_VF_PX_models(S, cri_type = _VF_CRI_DEFAULT, sampleset = None, pool = False, \
                            pcolorshift = {'href': np.arange(np.pi/10,2*np.pi,2*np.pi/10),\
                                           'Cref' : _VF_MAXR, 'sig' : _VF_SIG, 'labels' : '#'},\
-                           vfcolor = 'k', verbosity = 0):
+                           vfcolor = 'k', verbosity = 0, executor = None, max_workers = None):
     """
     Calculate Vector Field and Pixel color shift models.
     
@@ -143,6 +147,13 @@ def calculate_VF_PX_models(S, cri_type = _VF_CRI_DEFAULT, sampleset = None, pool
         :verbosity: 
             | 0, optional
             | Report warnings or not.
+        :executor:
+            | None or 'process' or 'thread' or concurrent.futures.Executor, optional
+            | If not None, the VF and PX models of the different SPDs in :S: 
+              are calculated in parallel (see luxpy.parallel_map()).
+        :max_workers:
+            | None or int, optional
+            | Number of workers of a newly created :executor:.
     
     Returns:
         :returns:
@@ -151,23 +162,25 @@ def calculate_VF_PX_models(S, cri_type = _VF_CRI_DEFAULT, sampleset = None, pool
               luxpy.cri.VF_colorshift_model() and luxpy.cri.PX_colorshift_model()
     """
     # calculate VectorField cri_color_shift model:
-    dataVF = VF_colorshift_model(S, cri_type = cri_type, sampleset = sampleset, vfcolor = vfcolor, pcolorshift = pcolorshift, pool = pool, verbosity = verbosity)
+    dataVF = VF_colorshift_model(S, cri_type = cri_type, sampleset = sampleset, vfcolor = vfcolor, pcolorshift = pcolorshift, pool = pool, verbosity = verbosity, executor = executor, max_workers = max_workers)
     
     # Set jab_ranges and _deltas for PX-model pixel calculations:
     PX_jab_deltas = np.array([_VF_DELTAR,_VF_DELTAR,_VF_DELTAR]) #set same as for vectorfield generation
     PX_jab_ranges = np.vstack(([0,100,_VF_DELTAR],[-_VF_MAXR,_VF_MAXR+_VF_DELTAR,_VF_DELTAR], [-_VF_MAXR,_VF_MAXR+_VF_DELTAR,_VF_DELTAR]))#IES4880 gamut
    
+    # Calculate shifts using pixel method, PX:
+    fcn = partial(PX_colorshift_model, jab_ranges = PX_jab_ranges, jab_deltas = PX_jab_deltas, limit_grid_radius = _VF_MAXR)
+    dataPX = parallel_map(fcn, [dataVF[Snr]['Jab']['Jabt'][:,0,:] for Snr in range(len(dataVF))], 
+                          [dataVF[Snr]['Jab']['Jabr'][:,0,:] for Snr in range(len(dataVF))],
+                          executor = executor, max_workers = max_workers)
+    
     # Calculate shift vectors using vectorfield and pixel methods:
     delta_SvsVF_vshift_ab_mean = np.nan*np.ones((len(dataVF),1))
     delta_SvsVF_vshift_ab_mean_normalized = delta_SvsVF_vshift_ab_mean.copy()
     delta_PXvsVF_vshift_ab_mean = np.nan*np.ones((len(dataVF),1))
     delta_PXvsVF_vshift_ab_mean_normalized = delta_PXvsVF_vshift_ab_mean.copy()
-    dataPX = [[] for k in range(len(dataVF))]
     for Snr in range(len(dataVF)):
 
-        # Calculate shifts using pixel method, PX:
-        dataPX[Snr] = PX_colorshift_model(dataVF[Snr]['Jab']['Jabt'][:,0,:],dataVF[Snr]['Jab']['Jabr'][:,0,:], jab_ranges = PX_jab_ranges, jab_deltas = PX_jab_deltas,limit_grid_radius = _VF_MAXR)
-        
         # Calculate shift difference between Samples (S) and VectorField model predictions (VF):
         delta_SvsVF_vshift_ab = dataVF[Snr]['vshifts']['vshift_ab_s'] - dataVF[Snr]['vshifts']['vshift_ab_s_vf']
         delta_SvsVF_vshift_ab_mean[Snr] = np.nanmean(np.sqrt((delta_SvsVF_vshift_ab[...,1:3]**2).sum(axis = delta_SvsVF_vshift_ab[...,1:3].ndim-1)), axis=0)
@@ -28,8 +28,8 @@ Module with functions related to color rendering Pixel models
 .. codeauthor:: Kevin A.G. Smet (ksmet1977 at gmail.com)
 """
 
-from luxpy import np
-from .vectorshiftmodel import _VF_DELTAR,_VF_DELTAR, generate_grid
+from luxpy import np, math
+from .vectorshiftmodel import _VF_MAXR,_VF_DELTAR, generate_grid
 
 __all__ = ['get_pixel_coordinates','PX_colorshift_model']
 
@@ -72,30 +72,34 @@ def get_pixel_coordinates(jab, jab_ranges = None, jab_deltas = None, limit_grid_
     if jab_ranges is None:
         jab_ranges = np.vstack(([0,100,jab_deltas[0]],[-_VF_MAXR,_VF_MAXR+jab_deltas[1],jab_deltas[1]], [-_VF_MAXR,_VF_MAXR+jab_deltas[2],jab_deltas[2]]))
     
-    # Get pixel grid:
-    gridp = generate_grid(jab_ranges = jab_ranges, limit_grid_radius = limit_grid_radius) 
+    # Get full pixel grid and keep track of pixels within limit_grid_radius:
+    gridp = generate_grid(jab_ranges = jab_ranges, limit_grid_radius = 0) 
+    if limit_grid_radius > 0:
+        keep = (gridp[:,1]**2 + gridp[:,2]**2)**0.5 <= limit_grid_radius
+    else:
+        keep = np.ones((gridp.shape[0],), dtype = bool)
+    gridp = gridp[keep]
+    gridnrs = -np.ones(keep.shape, dtype = int)
+    gridnrs[keep] = np.arange(gridp.shape[0])
 
-    # determine pixel coordinates of each sample in jab:
-    samplesIDs = []
-    for idx in np.arange(gridp.shape[0]):
-        
-        # get pixel coordinates:
-        jp = gridp[idx,0]
-        ap = gridp[idx,1]
-        bp = gridp[idx,2]
-        Cp = np.sqrt(ap**2+bp**2)
-                      
-        if type(jab_deltas) == np.ndarray:
-            sampleID = np.where(((np.abs(jab[...,0]-jp) <= jab_deltas[0]/2) & (np.abs(jab[...,1]-ap) <= jab_deltas[1]/2) & (np.abs(jab[...,2]-bp) <= jab_deltas[2]/2)))
-        else:
-            sampleID = np.where((np.sqrt((jab[...,0]-jp)**2 + (jab[...,1]-ap)**2 + (jab[...,2]-bp)**2) <= jab_deltas/2))
-
-        if (sampleID[0].shape[0] > 0):
-            samplesIDs.append(np.hstack((idx,np.array([jp,ap,bp]),sampleID[0])))
-       
-    idxp = [np.int(samplesIDs[i][0]) for i in range(len(samplesIDs))]
-    jabp = np.vstack([samplesIDs[i][1:4] for i in range(len(samplesIDs))])
-    samplenrs = [np.array(samplesIDs[i][4:],dtype = int).tolist() for i in range(len(samplesIDs))]
+    # determine pixel coordinates of each sample in jab by binning
+    # (generate_grid() loops over a faster than over b, so swap a and b 
+    # to obtain the same order of flattened indices):
+    if jab.ndim == 3:
+        jab = jab[:,0,:]
+    deltas = jab_deltas[[0,2,1]] if isinstance(jab_deltas, np.ndarray) else jab_deltas
+    sampleID, idx, grid_shape = math.grid_indices(jab[:,[0,2,1]], jab_ranges[[0,2,1]], deltas = deltas, flatten = True)
+    idx = gridnrs[idx]
+    sampleID, idx = sampleID[idx >= 0], idx[idx >= 0]
+    
+    # group sample numbers per non-empty pixel:
+    order = np.lexsort((sampleID, idx))
+    sampleID, idx = sampleID[order], idx[order]
+    idxp, starts = np.unique(idx, return_index = True)
+    samplenrs = [x.tolist() for x in np.split(sampleID, starts[1:])] if (idxp.shape[0] > 0) else []
+    jabp = gridp[idxp]
+    samplesIDs = [np.hstack((idxp[i],jabp[i],samplenrs[i])) for i in range(idxp.shape[0])]
+    idxp = idxp.tolist()
     
     return gridp, idxp,jabp,samplenrs, samplesIDs
 
@@ -169,27 +173,23 @@ def PX_colorshift_model(Jabt,Jabr, jab_ranges = None, jab_deltas = None,limit_gr
     gridp,idxp, jabp, pixelsamplenrs, pixelIDs = get_pixel_coordinates(Jabr, jab_ranges = jab_ranges, jab_deltas = jab_deltas, limit_grid_radius = limit_grid_radius)
 
     # get average Jab coordinates for each pixel:
-    Npixels = len(idxp) # number of non-empty pixels
-    Jabr_avg = np.nan*np.ones((gridp.shape[0],3))
-    Jabt_avg = Jabr_avg.copy()
-    for i in np.arange(Npixels):
-        Jabr_avg[idxp[i],:] = Jabr[pixelsamplenrs[i],:].mean(axis=0)
-        Jabt_avg[idxp[i],:] = Jabt[pixelsamplenrs[i],:].mean(axis=0)
-        jabtemp = Jabr[pixelsamplenrs[i],:]
-        jabtempm = Jabr_avg[idxp[i],:]
+    pixelnrs = np.repeat(np.array(idxp, dtype = int), [len(x) for x in pixelsamplenrs])
+    samplenrs = np.array([x for xs in pixelsamplenrs for x in xs], dtype = int)
+    Jabr_avg = math.accumarray(pixelnrs, Jabr[samplenrs,:], size = gridp.shape[0], func = 'mean', fillval = np.nan)
+    Jabt_avg = math.accumarray(pixelnrs, Jabt[samplenrs,:], size = gridp.shape[0], func = 'mean', fillval = np.nan)
             
     # calculate Jab vector shift:    
     vectorshift = Jabt_avg - Jabr_avg
     
-    # calculate ab vector shift:
-    uabs = gridp[gridp[:,0]==0,1:3] #np.unique(gridp[:,1:3],axis=0)
-    vectorshift_ab_J0 = np.ones((uabs.shape[0],2))*np.nan
-    vectorshift_ab = np.ones((vectorshift.shape[0],2))*np.nan
-    for i in range(uabs.shape[0]):
-        cond = (gridp[:,1:3] == uabs[i,:]).all(axis = 1)
-        if cond.any() & np.logical_not(np.isnan(vectorshift[cond,1:3]).all()): #last condition is to avoid warning of taking nanmean of empty slice when all are NaNs
-            vectorshift_ab_J0[i,:] = np.nanmean(vectorshift[cond,1:3], axis = 0)
-            vectorshift_ab[cond,:] = np.nanmean(vectorshift[cond,1:3],axis = 0)
+    # calculate ab vector shift (average over J of all pixels with same a,b):
+    J0 = (gridp[:,0] == 0)
+    uabs = gridp[J0,1:3] #np.unique(gridp[:,1:3],axis=0)
+    abnrs = np.unique(gridp[:,1:3], axis = 0, return_inverse = True)[1]
+    notnan = np.logical_not(np.isnan(vectorshift[:,1:3]).any(axis = 1))
+    vectorshift_ab_u = math.accumarray(abnrs[notnan], vectorshift[notnan,1:3], size = abnrs.max() + 1, func = 'mean', fillval = np.nan)
+    vectorshift_ab_J0 = vectorshift_ab_u[abnrs[J0]]
+    vectorshift_ab = vectorshift_ab_u[abnrs]
+    vectorshift_ab[np.logical_not(np.in1d(abnrs, abnrs[J0]))] = np.nan
    
     # Calculate length of shift vectors:
     vectorshift_len = np.sqrt((vectorshift**2).sum(axis = vectorshift.ndim-1))
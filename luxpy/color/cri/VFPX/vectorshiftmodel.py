@@ -40,6 +40,9 @@ Module with functions related to color rendering Vector Field model
  :get_poly_model(): Setup base color shift model (delta_a, delta_b), 
                     determine model parameters and accuracy.
 
+ :get_poly_models(): Vectorized version of get_poly_model() 
+                     for multiple test SPDs.
+
  :apply_poly_model_at_x(): Applies base color shift model 
                            at cartesian coordinates axr, bxr.
 
@@ -65,7 +68,9 @@ Module with functions related to color rendering Vector Field model
 """
 
 
-from luxpy import np, plt, math, _CIE_ILLUMINANTS, _MUNSELL,_EPS
+from luxpy import np, plt, math, _CIE_ILLUMINANTS, _MUNSELL,_EPS, np2d, parallel_map
+import os
+from functools import partial
 from ..utils.helpers import spd_to_cri
 from ..utils.init_cri_defaults_database import _CRI_DEFAULTS
 from ..utils.graphics import plot_hue_bins
@@ -73,7 +78,7 @@ from ..utils.graphics import plot_hue_bins
 #from munsell import *
 
 __all__ = ['_VF_CRI_DEFAULT','_VF_CSPACE','_VF_CSPACE_EXAMPLE','_VF_CIEOBS','_VF_MAXR','_VF_DELTAR','_VF_MODEL_TYPE','_VF_SIG','_VF_PCOLORSHIFT']
-__all__ += ['get_poly_model','apply_poly_model_at_x','generate_vector_field','VF_colorshift_model','initialize_VF_hue_angles']
+__all__ += ['get_poly_model','get_poly_models','apply_poly_model_at_x','generate_vector_field','VF_colorshift_model','initialize_VF_hue_angles']
 __all__ += ['generate_grid','calculate_shiftvectors','plot_shift_data','plotcircle']
 
 # Default color space for Vector Field model:
@@ -91,6 +96,23 @@ _VF_PCOLORSHIFT = None
 
 
 
+#------------------------------------------------------------------------------
+# Define polynomial model functions (module level, so they can be pickled):
+def _poly5_model(a, b, p):
+    return p[0]*a + p[1]*b + p[2]*(a**2) + p[3]*a*b + p[4]*(b**2)
+
+def _poly6_model(a, b, p):
+    return p[0] + p[1]*a + p[2]*b + p[3]*(a**2) + p[4]*a*b + p[5]*(b**2)
+
+def _poly_design_matrix(ar, br, modeltype = _VF_MODEL_TYPE):
+    """
+    Stack the polynomial terms of the 'M5' or 'M6' model along a new last axis.
+    """
+    terms = [ar, br, ar**2, ar*br, br**2]
+    if modeltype != 'M5':
+        terms = [np.ones(ar.shape)] + terms
+    return np.stack(terms, axis = -1)
+
 #------------------------------------------------------------------------------
 # Define function to get poly_model:
 def get_poly_model(jabt, jabr, modeltype = _VF_MODEL_TYPE):
@@ -166,15 +188,12 @@ def get_poly_model(jabt, jabr, modeltype = _VF_MODEL_TYPE):
             [np.sum((br**2)*1.0),np.sum((br**2)*ar), np.sum((br**2)*br), np.sum((br**2)*ar**2),np.sum((br**2)*ar*br),np.sum((br**2)*br**2)]])
     
     # B.2 Define model function:
-    poly5_model = lambda a,b,p: p[0]*a + p[1]*b + p[2]*(a**2) + p[3]*a*b + p[4]*(b**2)
-    poly6_model = lambda a,b,p: p[0] + p[1]*a + p[2]*b + p[3]*(a**2) + p[4]*a*b + p[5]*(b**2)
-    
     if modeltype == 'M5':
         M = M5
-        poly_model = poly5_model
+        poly_model = _poly5_model
     else:
         M = M6
-        poly_model = poly6_model
+        poly_model = _poly6_model
 
     M = np.linalg.inv(M)
 
@@ -217,6 +236,88 @@ def get_poly_model(jabt, jabr, modeltype = _VF_MODEL_TYPE):
     return poly_model, pmodel, dab_model, dab_res, dCHoverC_res, dab_std, dCHoverC_std
 
 
+def get_poly_models(jabt, jabr, modeltype = _VF_MODEL_TYPE):
+    """
+    Setup base color shift models (delta_a, delta_b) for multiple test SPDs 
+    at once, determine model parameters and accuracy.
+    
+    | Vectorized version of get_poly_model(): the least-squares problems of 
+      all SPDs are solved in one go by stacking the design matrices 
+      of each SPD along the first axis.
+    
+    Args:
+        :jabt: 
+            | ndarray with jab color coordinates under the test SPDs.
+            | (.shape = (Nsamples, Nspds, 3))
+        :jabr: 
+            | ndarray with jab color coordinates under the reference SPDs.
+            | (.shape = (Nsamples, Nspds, 3))
+        :modeltype:
+            | _VF_MODEL_TYPE or 'M6' or 'M5', optional
+            | Specifies degree 5 or degree 6 polynomial model in ab-coordinates.
+              (see notes in get_poly_model())
+            
+    Returns:
+        :returns: 
+            | (poly_model, 
+            |       pmodel, 
+            |       dab_model, 
+            |        dab_res, 
+            |        dCHoverC_res, 
+            |        dab_std, 
+            |        dCHoverC_std)
+            |
+            | Same output as get_poly_model(), but with an additional first 
+              axis for the SPDs: e.g. pmodel[i] contains the model parameters
+              of the i-th SPD (.shape = (2, number of parameters)).
+    """
+    if jabt.ndim < 3:
+        jabt = jabt[:,None,:]
+        jabr = jabr[:,None,:]
+    
+    # put SPDs on first axis:
+    at = jabt[...,1].T[...,None]
+    bt = jabt[...,2].T[...,None]
+    ar = jabr[...,1].T[...,None]
+    br = jabr[...,2].T[...,None]
+    
+    # A. Calculate da, db:
+    da = at - ar
+    db = bt - br
+    dab = np.concatenate((da,db), axis = -1)
+    
+    # B. Solve normal equations for all SPDs:
+    X = _poly_design_matrix(ar[...,0], br[...,0], modeltype = modeltype)
+    M = np.einsum('snp,snq->spq', X, X)
+    B = np.einsum('snp,snk->spk', X, dab)
+    pmodel = np.transpose(np.linalg.solve(M, B), (0,2,1))
+    poly_model = _poly5_model if (modeltype == 'M5') else _poly6_model
+    
+    # C. Calculate model da, db and residuals:
+    dab_model = np.einsum('snp,skp->snk', X, pmodel)
+    da_model = dab_model[...,0:1]
+    db_model = dab_model[...,1:2]
+    dab_res = dab - dab_model
+    dab_std = np.std(dab_res, axis = 1)[...,None]
+    
+    # D. Calculate href, Cref:
+    href = np.arctan2(br,ar)
+    Cref = (ar**2 + br**2)**0.5
+    
+    # E. Calculate dC/C, dH/C for data and model and calculate residuals:
+    dCoverC = (np.cos(href)*da + np.sin(href)*db)/Cref
+    dHoverC = (np.cos(href)*db - np.sin(href)*da)/Cref
+    dCoverC_model = (np.cos(href)*da_model + np.sin(href)*db_model)/Cref
+    dHoverC_model = (np.cos(href)*db_model - np.sin(href)*da_model)/Cref
+    dCoverC_res = dCoverC - dCoverC_model
+    dHoverC_res = dHoverC - dHoverC_model
+    dCHoverC_std = np.concatenate((np.std(dCoverC_res,axis = 1),np.std(dHoverC_res,axis = 1)), axis = -1)[...,None]
+    
+    dCHoverC_res = np.concatenate((href,dCoverC_res,dHoverC_res), axis = -1)
+
+    return poly_model, pmodel, dab_model, dab_res, dCHoverC_res, dab_std, dCHoverC_std
+
+
 def apply_poly_model_at_x(poly_model, pmodel,axr,bxr):
     """
     Applies base color shift model at cartesian coordinates axr, bxr.
@@ -382,7 +483,8 @@ def generate_vector_field(poly_model, pmodel, \
 def VF_colorshift_model(S, cri_type = _VF_CRI_DEFAULT, model_type = _VF_MODEL_TYPE, \
                         cspace = _VF_CSPACE, sampleset = None, pool = False, \
                         pcolorshift = {'href': np.arange(np.pi/10,2*np.pi,2*np.pi/10),'Cref' : _VF_MAXR, 'sig' : _VF_SIG}, \
-                        vfcolor = 'k',verbosity = 0):
+                        vfcolor = 'k',verbosity = 0, executor = None, \
+                        max_workers = None, n_chunks = None):
     """
     Applies full vector field model calculations to spectral data.
     
@@ -425,6 +527,19 @@ def VF_colorshift_model(S, cri_type = _VF_CRI_DEFAULT, model_type = _VF_MODEL_TY
         :verbosity: 
             | 0, optional
             | Report warnings or not.
+        :executor:
+            | None or 'process' or 'thread' or concurrent.futures.Executor, optional
+            | If not None and :pool: is False, the test SPDs in :S: are split 
+              in :n_chunks: chunks that are processed in parallel 
+              (see luxpy.parallel_map()).
+        :max_workers:
+            | None or int, optional
+            | Number of workers of a newly created :executor:.
+        :n_chunks:
+            | None or int, optional
+            | Number of chunks to split the SPDs in :S: into when using an 
+              :executor:. None defaults to :max_workers: 
+              (or os.cpu_count() when :max_workers: is None).
             
     Returns:
         :returns: 
@@ -468,6 +583,21 @@ def VF_colorshift_model(S, cri_type = _VF_CRI_DEFAULT, model_type = _VF_MODEL_TY
             |                            model predictions of vector field grid.
     """
     
+    S = np2d(S)
+    
+    # Process chunks of SPDs in parallel:
+    if (executor is not None) & (pool == False) & (S.shape[0] > 2):
+        if n_chunks is None:
+            n_chunks = max_workers if (max_workers is not None) else os.cpu_count()
+        Schunks = [np.vstack((S[:1],Si)) for Si in np.array_split(S[1:], min(n_chunks, S.shape[0] - 1), axis = 0)]
+        fcn = partial(VF_colorshift_model, cri_type = cri_type, model_type = model_type, 
+                      cspace = cspace, sampleset = sampleset, pool = False, 
+                      pcolorshift = pcolorshift, vfcolor = vfcolor, verbosity = verbosity)
+        out = [outi for outchunk in parallel_map(fcn, Schunks, executor = executor, max_workers = max_workers) for outi in outchunk]
+        for outi in out:
+            outi['Source']['S'] = S
+        return out
+    
     if type(cri_type) == str:
         cri_type_str = cri_type
     else:
@@ -492,6 +622,20 @@ def VF_colorshift_model(S, cri_type = _VF_CRI_DEFAULT, model_type = _VF_MODEL_TY
         N = Jabr.shape[1]
     else:
         N = 1
+    
+    # Determine polynomial models of all SPDs in one go:
+    poly_model, pmodels, dab_models, dab_ress, dCHoverC_ress, dab_stds, dCHoverC_stds = get_poly_models(Jabt[:,:N,:], Jabr[:,:N,:], modeltype = model_type)
+    
+    # Get scaling function to convert DEim to Rti:
+    scale_factor = cri_type['scale']['cfactor']
+    scale_fcn = cri_type['scale']['fcn']
+    avg = cri_type['avg']  
+    rms = lambda x: np.sqrt(np.sum(x**2,axis=0)/x.shape[0])
+    
+    # Get reference coordinates of vector and circle fields:
+    axr_vf, bxr_vf = generate_grid(ax = np.arange(-_VF_MAXR,_VF_MAXR+_VF_DELTAR,_VF_DELTAR), bx = np.arange(-_VF_MAXR,_VF_MAXR+_VF_DELTAR,_VF_DELTAR), out = 'ax,bx', limit_grid_radius = _VF_MAXR)
+    x,y = plotcircle(radii = np.arange(0,_VF_MAXR+_VF_DELTAR,10), angles = np.arange(0,359,1), out = 'x,y')
+    
     for i in range(N):
         
         Jabr_i = Jabr[:,i,:].copy()
@@ -501,8 +645,8 @@ def VF_colorshift_model(S, cri_type = _VF_CRI_DEFAULT, model_type = _VF_MODEL_TY
 
         DEi = np.sqrt((Jabr_i[...,0] - Jabt_i[...,0])**2 + (Jabr_i[...,1] - Jabt_i[...,1])**2 + (Jabr_i[...,2] - Jabt_i[...,2])**2)
 
-        # Determine polynomial model:
-        poly_model, pmodel, dab_model, dab_res, dCHoverC_res, dab_std, dCHoverC_std = get_poly_model(Jabt_i, Jabr_i, modeltype = _VF_MODEL_TYPE)
+        # Get polynomial model:
+        pmodel, dab_model, dab_res, dCHoverC_res, dab_std = pmodels[i], dab_models[i], dab_ress[i], dCHoverC_ress[i], dab_stds[i]
         
         # Apply model at fixed hues:
         href = pcolorshift['href']
@@ -528,18 +672,12 @@ def VF_colorshift_model(S, cri_type = _VF_CRI_DEFAULT, model_type = _VF_MODEL_TY
         DEim = np.sqrt(0*(Jr - Jt)**2 + (at - ar)**2 + (bt - br)**2) # J is not used
 
         # Apply scaling function to convert DEim to Rti:
-        scale_factor = cri_type['scale']['cfactor']
-        scale_fcn = cri_type['scale']['fcn']
-        avg = cri_type['avg']  
         Rfi_deshifted = scale_fcn(DEim,scale_factor)
         Rf_deshifted = scale_fcn(avg(DEim,axis = 0),scale_factor)
-        
-        rms = lambda x: np.sqrt(np.sum(x**2,axis=0)/x.shape[0])
         Rf_deshifted_rms = scale_fcn(rms(DEim),scale_factor)
     
         # Generate vector field:
-        vfaxt,vfbxt,vfaxr,vfbxr = generate_vector_field(poly_model, pmodel,axr = np.arange(-_VF_MAXR,_VF_MAXR+_VF_DELTAR,_VF_DELTAR), bxr = np.arange(-_VF_MAXR,_VF_MAXR+_VF_DELTAR,_VF_DELTAR), limit_grid_radius = _VF_MAXR,color = 0)
-        vfaxt,vfbxt,vfaxr,vfbxr = generate_vector_field(poly_model, pmodel,axr = np.arange(-_VF_MAXR,_VF_MAXR+_VF_DELTAR,_VF_DELTAR), bxr = np.arange(-_VF_MAXR,_VF_MAXR+_VF_DELTAR,_VF_DELTAR), limit_grid_radius = _VF_MAXR,color = 0)
+        vfaxt,vfbxt,vfaxr,vfbxr = generate_vector_field(poly_model, pmodel,axr = axr_vf, bxr = bxr_vf, make_grid = False, color = 0)
 
         # Calculate ab-shift vectors of samples and VF model predictions:
         vshift_ab_s = calculate_shiftvectors(Jabt_i, Jabr_i, average = False, vtype = 'ab')[:,0,0:3]
@@ -551,7 +689,6 @@ def VF_colorshift_model(S, cri_type = _VF_CRI_DEFAULT, model_type = _VF_MODEL_TY
         vshift_ab_vf = calculate_shiftvectors(Jabt_vf,Jabr_vf, average = False, vtype = 'ab')
 
         # Generate circle field:
-        x,y = plotcircle(radii = np.arange(0,_VF_MAXR+_VF_DELTAR,10), angles = np.arange(0,359,1), out = 'x,y')
         cfaxt,cfbxt,cfaxr,cfbxr = generate_vector_field(poly_model, pmodel,make_grid = False,axr = x[:,None], bxr = y[:,None], limit_grid_radius = _VF_MAXR,color = 0)
 
         out[i] = {'Source' : {'S' : S, 'cct' : cct[i] , 'duv': duv[i]},
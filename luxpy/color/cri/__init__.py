@@ -46,6 +46,10 @@ utils/init_cri_defaults_database.py
  :process_cri_type_input(): load a cri_type dict but overwrites any keys that 
                             have a non-None input in calling function.
 
+ :CompiledCriType: | cri_type dict with pre-resolved sample set, color space 
+                   | and cat parameters and cached (interpolated) spectral 
+                   | data, for fast repeated cri calculations.
+
 
 utils/DE_scalers.py
 -------------------
@@ -149,6 +153,10 @@ iestm30/iestm30_metrics.py
 
  :spd_to_ies_tm30_metrics(): Calculates IES TM30 metrics from spectral data.
 
+ :spd_to_ies_tm30_metrics_batch(): | Calculates IES TM30 metrics for a batch 
+                                   | of SPDs and returns them as a numpy 
+                                   | structured array (one record per SPD).
+
 
 iestm30/iestm30_graphics.py
 ---------------------------
@@ -46,6 +46,10 @@ utils/init_cri_defaults_database.py
  :process_cri_type_input(): load a cri_type dict but overwrites any keys that 
                             have a non-None input in calling function.
 
+ :CompiledCriType: | cri_type dict with pre-resolved sample set, color space 
+                   | and cat parameters and cached (interpolated) spectral 
+                   | data, for fast repeated cri calculations.
+
 
 utils/DE_scalers.py
 -------------------
@@ -149,6 +153,10 @@ iestm30/iestm30_metrics.py
 
  :spd_to_ies_tm30_metrics(): Calculates IES TM30 metrics from spectral data.
 
+ :spd_to_ies_tm30_metrics_batch(): | Calculates IES TM30 metrics for a batch 
+                                   | of SPDs and returns them as a numpy 
+                                   | structured array (one record per SPD).
+
 
 iestm30/iestm30_graphics.py
 ---------------------------
@@ -167,6 +175,8 @@ VFPX
 """
 from .utils.DE_scalers import linear_scale, log_scale, psy_scale
 
+from .utils.init_cri_defaults_database import CompiledCriType
+
 from .utils.helpers import (gamut_slicer,jab_to_rg, jab_to_rhi, jab_to_DEi,
                       spd_to_DEi, spd_to_rg, spd_to_cri)
 
@@ -174,11 +184,14 @@ from .indices.indices import *
 from .utils.graphics import *
 from .VFPX import VF_PX_models as VFPX
 from .iestm30.ies_tm30_graphics import plot_cri_graphics
-from .iestm30.ies_tm30_metrics import spd_to_ies_tm30_metrics
+from .iestm30.ies_tm30_metrics import spd_to_ies_tm30_metrics, spd_to_ies_tm30_metrics_batch
 
 # .DE_scalers:
 __all__ = ['linear_scale', 'log_scale', 'psy_scale']
 
+# .init_cri_defaults_database:
+__all__ += ['CompiledCriType']
+
 # .helpers:
 __all__ += ['gamut_slicer','jab_to_rg', 'jab_to_rhi', 'jab_to_DEi',
            'spd_to_DEi', 'spd_to_rg', 'spd_to_cri']
@@ -202,7 +215,7 @@ __all__ += ['plot_hue_bins','plot_ColorVectorGraphic']
 __all__ += ['VFPX']
 
 # .ies_tm30_metrics:
-__all__ += ['spd_to_ies_tm30_metrics']
+__all__ += ['spd_to_ies_tm30_metrics','spd_to_ies_tm30_metrics_batch']
 
 # .ies_tm30_graphics:
 __all__ += ['plot_cri_graphics']
\ No newline at end of file
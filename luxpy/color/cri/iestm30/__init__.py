@@ -21,6 +21,10 @@ Module for IES TM30 color rendition output
                        
  :spd_to_ies_tm30_metrics(): Calculates IES TM30 metrics from spectral data
  
+ :spd_to_ies_tm30_metrics_batch(): | Calculates IES TM30 metrics for a batch 
+                                   | of SPDs and returns them as a numpy 
+                                   | structured array (one record per SPD).
+ 
  :plot_cri_graphics(): Plots graphical information on color rendition 
                        properties based on spectral data input or dict with 
                        pre-calculated measures.
@@ -21,6 +21,10 @@ Extension module for IES TM30 metric calculation with additional Vector Field su
 =====================================================================================
 
  :spd_to_ies_tm30_metrics(): Calculates IES TM30 metrics from spectral data
+ 
+ :spd_to_ies_tm30_metrics_batch(): | Calculates IES TM30 metrics for a batch 
+                                   | of SPDs and returns them as a numpy 
+                                   | structured array (one record per SPD).
 
 
 .. codeauthor:: Kevin A.G. Smet (ksmet1977 at gmail.com)
@@ -30,17 +34,93 @@ from luxpy import np, _CRI_RFL
 from ..utils.helpers import gamut_slicer, spd_to_cri, jab_to_rhi
 from ..utils.init_cri_defaults_database import _CRI_DEFAULTS
 
-from ..VFPX.vectorshiftmodel import  _VF_MODEL_TYPE, _VF_PCOLORSHIFT, VF_colorshift_model
+from ..VFPX.vectorshiftmodel import  (_VF_MODEL_TYPE, _VF_PCOLORSHIFT, _VF_MAXR, _VF_DELTAR,
+                                      VF_colorshift_model, get_poly_models, generate_grid, 
+                                      _poly_design_matrix)
 from ..VFPX.VF_PX_models import plot_VF_PX_models
 
-__all__ = ['spd_to_ies_tm30_metrics']
+__all__ = ['spd_to_ies_tm30_metrics','spd_to_ies_tm30_metrics_batch']
+
+def _process_tm30_cri_type(cri_type, hbins, start_hue, scalef):
+    """
+    Get cri_type dict and overwrite rg_pars with non-None :hbins:, 
+    :start_hue: and :scalef:.
+    """
+    if cri_type is None:
+        cri_type = 'iesrf'
+    if isinstance(cri_type,str): # get dict 
+        cri_type = _CRI_DEFAULTS[cri_type].copy()
+    else:
+        cri_type = cri_type.copy()
+    cri_type['rg_pars'] = cri_type['rg_pars'].copy() # avoid changing defaults
+    if hbins is not None:
+        cri_type['rg_pars']['nhbins'] = hbins 
+    if start_hue is not None:
+        cri_type['rg_pars']['start_hue'] = start_hue
+    if scalef is not None:
+        cri_type['rg_pars']['normalized_chroma_ref'] = scalef
+    return cri_type
+
+def _vf_hue_bin_metrics(pmodel, cri_type, model_type = _VF_MODEL_TYPE, Cr_s = None):
+    """
+    Calculate hue bin metrics (Rfhi, Rcshi, Rhshi) from vector field model 
+    predictions at the color space pixel coordinates for all SPDs at once.
+    
+    Args:
+        :pmodel:
+            | ndarray with polynomial model parameters.
+            | (.shape = (Nspds, 2, number of parameters))
+        :cri_type:
+            | dict with cri_type parameters.
+        :model_type:
+            | _VF_MODEL_TYPE or 'M6' or 'M5', optional
+        :Cr_s:
+            | None or float or ndarray (.shape = (Nspds,)), optional
+            | If not None: rescale chroma of reference and test vf fields 
+              such that average binned reference chroma equals :Cr_s:.
+    
+    Returns:
+        :returns:
+            | Rfhi_vf, Rcshi_vf, Rhshi_vf 
+            | (ndarrays with .shape = (nhbins, Nspds))
+    """
+    nhbins, normalize_gamut, normalized_chroma_ref, start_hue = [cri_type['rg_pars'][x] for x in sorted(cri_type['rg_pars'].keys())]
+    
+    # Apply models of all SPDs at the reference grid coordinates:
+    axr, bxr = generate_grid(ax = np.arange(-_VF_MAXR,_VF_MAXR+_VF_DELTAR,_VF_DELTAR), bx = np.arange(-_VF_MAXR,_VF_MAXR+_VF_DELTAR,_VF_DELTAR), out = 'ax,bx', limit_grid_radius = _VF_MAXR)
+    X = _poly_design_matrix(axr[:,0], bxr[:,0], modeltype = model_type)
+    dab = np.einsum('gp,skp->gsk', X, pmodel)
+    vfjabr = np.ones(dab.shape[:2] + (3,))
+    vfjabr[...,1] = axr
+    vfjabr[...,2] = bxr
+    vfjabt = vfjabr.copy()
+    vfjabt[...,1:] += dab
+    
+    # Get normalized and sliced VF data:
+    vfbjabt, vfbjabr, vfbDEi = gamut_slicer(vfjabt, vfjabr, out = 'jabt,jabr,DEi', nhbins = nhbins, start_hue = start_hue, normalize_gamut = normalize_gamut, normalized_chroma_ref = normalized_chroma_ref, close_gamut = False)
+    
+    if Cr_s is not None:
+        #rescale vfbjabt and vfbjabr to same chroma level as binned sample data:
+        Cr_vfb = np.sqrt(vfbjabr[...,1]**2 + vfbjabr[...,2]**2)
+        fC = Cr_s/Cr_vfb.mean(axis = 0)
+        for vfjab in [vfjabr, vfjabt]:
+            C_vf = np.sqrt(vfjab[...,1]**2 + vfjab[...,2]**2)
+            h_vf = np.arctan2(vfjab[...,2],vfjab[...,1])
+            vfjab[...,1] = fC * C_vf*np.cos(h_vf)
+            vfjab[...,2] = fC * C_vf*np.sin(h_vf)
+        vfbjabt, vfbjabr, vfbDEi = gamut_slicer(vfjabt, vfjabr, out = 'jabt,jabr,DEi', nhbins = nhbins, start_hue = start_hue, normalize_gamut = normalize_gamut, normalized_chroma_ref = normalized_chroma_ref, close_gamut = False)
+
+    scale_factor = cri_type['scale']['cfactor']
+    scale_fcn = cri_type['scale']['fcn']
+    return jab_to_rhi(jabt = vfbjabt, jabr = vfbjabr, DEi = vfbDEi, cri_type = cri_type, scale_factor = scale_factor, scale_fcn = scale_fcn, use_bin_avg_DEi = True)
 
 def spd_to_ies_tm30_metrics(SPD, cri_type = None, \
                             hbins = 16, start_hue = 0.0,\
                             scalef = 100, \
                             vf_model_type = _VF_MODEL_TYPE, \
                             vf_pcolorshift = _VF_PCOLORSHIFT,\
-                            scale_vf_chroma_to_sample_chroma = False):
+                            scale_vf_chroma_to_sample_chroma = False,\
+                            executor = None, max_workers = None):
     """
     Calculates IES TM30 metrics from spectral data.      
       
@@ -70,6 +150,14 @@ def spd_to_ies_tm30_metrics(SPD, cri_type = None, \
             | Scale chroma of reference and test vf fields such that average of 
               binned reference chroma equals that of the binned sample chroma
               before calculating hue bin metrics.
+        :executor:
+            | None or 'process' or 'thread' or concurrent.futures.Executor, optional
+            | If not None, the vector field models (metameric uncertainty) of 
+              the SPDs are calculated in parallel 
+              (see luxpy.cri.VFPX.VF_colorshift_model()).
+        :max_workers:
+            | None or int, optional
+            | Number of workers of a newly created :executor:.
             
     Returns:
         :data: 
@@ -95,25 +183,15 @@ def spd_to_ies_tm30_metrics(SPD, cri_type = None, \
             | - 'Rhshi_vf': ndarray with local hue shifts indices 
             |               (same as above)
     """
-    if cri_type is None:
-        cri_type = 'iesrf'
-
     #Calculate color rendering measures for SPDs in data:
     out = 'Rf,Rg,cct,duv,Rfi,jabt,jabr,Rfhi,Rcshi,Rhshi,cri_type'
-    if isinstance(cri_type,str): # get dict 
-        cri_type = _CRI_DEFAULTS[cri_type].copy()
-    if hbins is not None:
-        cri_type['rg_pars']['nhbins'] = hbins 
-    if start_hue is not None:
-        cri_type['rg_pars']['start_hue'] = start_hue
-    if scalef is not None:
-        cri_type['rg_pars']['normalized_chroma_ref'] = scalef
+    cri_type = _process_tm30_cri_type(cri_type, hbins, start_hue, scalef)
     Rf,Rg,cct,duv,Rfi,jabt,jabr,Rfhi,Rcshi,Rhshi,cri_type = spd_to_cri(SPD, cri_type = cri_type, out = out)
     rg_pars = cri_type['rg_pars']
 
     
     #Calculate Metameric uncertainty and base color shifts:
-    dataVF = VF_colorshift_model(SPD, cri_type = cri_type, model_type = vf_model_type, cspace = cri_type['cspace'], sampleset = eval(cri_type['sampleset']), pool = False, pcolorshift = vf_pcolorshift, vfcolor = 0)
+    dataVF = VF_colorshift_model(SPD, cri_type = cri_type, model_type = vf_model_type, cspace = cri_type['cspace'], sampleset = eval(cri_type['sampleset']), pool = False, pcolorshift = vf_pcolorshift, vfcolor = 0, executor = executor, max_workers = max_workers)
     Rf_ = np.array([dataVF[i]['metrics']['Rf'] for i in range(len(dataVF))]).T
     Rt = np.array([dataVF[i]['metrics']['Rt'] for i in range(len(dataVF))]).T
     Rti = np.array([dataVF[i]['metrics']['Rti'] for i in range(len(dataVF))][0])
@@ -132,42 +210,127 @@ def spd_to_ies_tm30_metrics(SPD, cri_type = None, \
     bjabt, bjabr = gamut_slicer(jabt,jabr, out = 'jabt,jabr', nhbins = nhbins, start_hue = start_hue, normalize_gamut = normalize_gamut, normalized_chroma_ref = normalized_chroma_ref, close_gamut = True)
 
 
-    Rfhi_vf = np.empty(Rfhi.shape)
-    Rcshi_vf = np.empty(Rcshi.shape)
-    Rhshi_vf = np.empty(Rhshi.shape)
-    for i in range(cct.shape[0]):
-        
-        # Get normalized and sliced VF data for hue specific metrics:
-        vfjabt = np.hstack((np.ones(dataVF[i]['fielddata']['vectorfield']['axt'].shape),dataVF[i]['fielddata']['vectorfield']['axt'],dataVF[i]['fielddata']['vectorfield']['bxt']))
-        vfjabr = np.hstack((np.ones(dataVF[i]['fielddata']['vectorfield']['axr'].shape),dataVF[i]['fielddata']['vectorfield']['axr'],dataVF[i]['fielddata']['vectorfield']['bxr']))
-        nhbins, normalize_gamut, normalized_chroma_ref, start_hue = [rg_pars[x] for x in sorted(rg_pars.keys())]
-        vfbjabt, vfbjabr, vfbDEi = gamut_slicer(vfjabt, vfjabr, out = 'jabt,jabr,DEi', nhbins = nhbins, start_hue = start_hue, normalize_gamut = normalize_gamut, normalized_chroma_ref = normalized_chroma_ref, close_gamut = False)
-        
-        if scale_vf_chroma_to_sample_chroma == True:
-            #rescale vfbjabt and vfbjabr to same chroma level as bjabr.
-            Cr_vfb = np.sqrt(vfbjabr[...,1]**2 + vfbjabr[...,2]**2)
-            Cr_vf = np.sqrt(vfjabr[...,1]**2 + vfjabr[...,2]**2)
-            hr_vf = np.arctan2(vfjabr[...,2],vfjabr[...,1])
-            Ct_vf = np.sqrt(vfjabt[...,1]**2 + vfjabt[...,2]**2)
-            ht_vf = np.arctan2(vfjabt[...,2],vfjabt[...,1])
-            fC = Cr_s.mean()/Cr_vfb.mean()
-            vfjabr[...,1] = fC * Cr_vf*np.cos(hr_vf)
-            vfjabr[...,2] = fC * Cr_vf*np.sin(hr_vf)
-            vfjabt[...,1] = fC * Ct_vf*np.cos(ht_vf)
-            vfjabt[...,2] = fC * Ct_vf*np.sin(ht_vf)
-            vfbjabt, vfbjabr, vfbDEi = gamut_slicer(vfjabt, vfjabr, out = 'jabt,jabr,DEi', nhbins = nhbins, start_hue = start_hue, normalize_gamut = normalize_gamut, normalized_chroma_ref = normalized_chroma_ref, close_gamut = False)
-
-        scale_factor = cri_type['scale']['cfactor']
-        scale_fcn = cri_type['scale']['fcn']
-        vfRfhi, vfRcshi, vfRhshi = jab_to_rhi(jabt = vfbjabt, jabr = vfbjabr, DEi = vfbDEi, cri_type = cri_type, scale_factor = scale_factor, scale_fcn = scale_fcn, use_bin_avg_DEi = True) # [:-1,...] removes last row from jab as this was added to close the gamut. 
-
-        Rfhi_vf[:,i:i+1] = vfRfhi
-        Rhshi_vf[:,i:i+1] = vfRhshi
-        Rcshi_vf[:,i:i+1] = vfRcshi
+    # Get hue bin metrics from VF model predictions:
+    pmodel = np.array([dataVF[i]['modeldata']['pmodel'] for i in range(len(dataVF))])
+    Cr_s = Cr_s.mean() if (scale_vf_chroma_to_sample_chroma == True) else None
+    Rfhi_vf, Rcshi_vf, Rhshi_vf = _vf_hue_bin_metrics(pmodel, cri_type, model_type = vf_model_type, Cr_s = Cr_s)
 
     # Create dict with CRI info:
     data = {'SPD' : SPD, 'cct' : cct, 'duv' : duv, 'bjabt' : bjabt, 'bjabr' : bjabr,\
            'Rf' : Rf, 'Rg' : Rg, 'Rfi': Rfi, 'Rfhi' : Rfhi, 'Rchhi' : Rcshi, 'Rhshi' : Rhshi, \
            'Rt' : Rt, 'Rti' : Rti,  'Rfhi_vf' : Rfhi_vf, 'Rfcshi_vf' : Rcshi_vf, 'Rfhshi_vf' : Rhshi_vf, \
            'dataVF' : dataVF,'cri_type' : cri_type}
-    return data
\ No newline at end of file
+    return data
+
+def spd_to_ies_tm30_metrics_batch(SPD, cri_type = None, \
+                                  hbins = 16, start_hue = 0.0,\
+                                  scalef = 100, \
+                                  vf_model_type = _VF_MODEL_TYPE, \
+                                  scale_vf_chroma_to_sample_chroma = False):
+    """
+    Calculates IES TM30 metrics for a batch of SPDs and returns them as a 
+    numpy structured array (one record per SPD).
+    
+    | Compared to spd_to_ies_tm30_metrics(), the sample color coordinates are 
+      only calculated once, the vector field models of all SPDs are fitted 
+      in one go and the hue bin slicing is done for all SPDs simultaneously.
+      No per-SPD dicts with plotting / field data are generated, making it 
+      suitable for large spectral catalogs.
+      
+    Args:
+        :SPD:
+            | numpy.ndarray with spectral data 
+        :cri_type:
+            | None, optional
+            | If None: defaults to cri_type = 'iesrf'.
+            | Not none values of :hbins:, :start_hue: and :scalef: overwrite 
+              input in cri_type['rg_pars'] 
+        :hbins:
+            | 16 or int, optional
+            | Number of hue bins.
+        :start_hue: 
+            | 0.0, optional
+        :scalef:
+            | 100, optional
+            | Scale factor for reference circle.
+        :vf_model_type:
+            | _VF_MODEL_TYPE or 'M6' or 'M5', optional
+            | Type of polynomial vector field model.
+        :scale_vf_chroma_to_sample_chroma: 
+            | False, optional
+            | Scale chroma of reference and test vf fields such that average of 
+              binned reference chroma equals that of the binned sample chroma
+              before calculating hue bin metrics.
+            | If True: use the binned sample chroma averaged over all SPDs
+              (as in spd_to_ies_tm30_metrics()).
+            | If 'per_spd': use the binned sample chroma of each SPD.
+            
+    Returns:
+        :data: 
+            | numpy structured array (.shape = (Nspds,)) with fields:
+            | - 'cct'  : CCT of test SPD
+            | - 'duv'  : distance to blackbody locus of test SPD
+            | - 'Rf'   : general color fidelity index
+            | - 'Rg'   : gamut area index
+            | - 'Rt'   : general metameric uncertainty index Rt
+            | - 'Rfi'  : specific color fidelity indices (Nsamples,)
+            | - 'Rti'  : specific metameric uncertainty indices (Nsamples,)
+            | - 'Rfhi' : local (hue binned) fidelity indices (nhbins,)
+            | - 'Rcshi': local chroma shifts indices (nhbins,)
+            | - 'Rhshi': local hue shifts indices (nhbins,)
+            | - 'Rfhi_vf' : local (hue binned) fidelity indices 
+            |               obtained from VF model predictions at color space
+            |               pixel coordinates (nhbins,)
+            | - 'Rcshi_vf': local chroma shifts indices (same as above)
+            | - 'Rhshi_vf': local hue shifts indices (same as above)
+            | - 'bjabt': binned (normalized) jab data under test SPD (nhbins+1,3)
+            | - 'bjabr': binned (normalized) jab data under reference (nhbins+1,3)
+            |
+            | Data of the i-th SPD can be obtained as data[i], a field of all 
+              SPDs as e.g. data['Rf'] and subsets as e.g. data[data['Rf']>90].
+    """
+    #Calculate color rendering measures for SPDs in data:
+    out = 'Rf,Rg,cct,duv,Rfi,jabt,jabr,Rfhi,Rcshi,Rhshi,cri_type'
+    cri_type = _process_tm30_cri_type(cri_type, hbins, start_hue, scalef)
+    Rf,Rg,cct,duv,Rfi,jabt,jabr,Rfhi,Rcshi,Rhshi,cri_type = spd_to_cri(SPD, cri_type = cri_type, out = out)
+    nhbins, normalize_gamut, normalized_chroma_ref, start_hue = [cri_type['rg_pars'][x] for x in sorted(cri_type['rg_pars'].keys())]
+    if jabt.ndim < 3:
+        jabt, jabr = jabt[:,None,:], jabr[:,None,:]
+    
+    # Fit base color shift models of all SPDs at once:
+    pmodel, dab_res = get_poly_models(jabt, jabr, modeltype = vf_model_type)[1:4:2]
+
+    # Calculate metameric uncertainty from deshifted reference (J is not used):
+    scale_factor = cri_type['scale']['cfactor']
+    scale_fcn = cri_type['scale']['fcn']
+    DEim = np.sqrt((dab_res**2).sum(axis = -1)).T
+    Rti = scale_fcn(DEim, scale_factor)
+    Rt = scale_fcn(cri_type['avg'](DEim, axis = 0), scale_factor)
+    
+    # Get hue bin metrics from VF model predictions:
+    if (scale_vf_chroma_to_sample_chroma == True) | (scale_vf_chroma_to_sample_chroma == 'per_spd'):
+        bjabr = gamut_slicer(jabt,jabr, out = 'jabr', nhbins = nhbins, start_hue = start_hue, normalize_gamut = False, normalized_chroma_ref = scalef, close_gamut = True)
+        Cr_s = (np.sqrt(bjabr[:-1,...,1]**2 + bjabr[:-1,...,2]**2)).mean(axis=0) 
+        if scale_vf_chroma_to_sample_chroma != 'per_spd':
+            Cr_s = Cr_s.mean()
+    else:
+        Cr_s = None
+    Rfhi_vf, Rcshi_vf, Rhshi_vf = _vf_hue_bin_metrics(pmodel, cri_type, model_type = vf_model_type, Cr_s = Cr_s)
+
+    # Get normalized and sliced sample data (for plotting):
+    bjabt, bjabr = gamut_slicer(jabt,jabr, out = 'jabt,jabr', nhbins = nhbins, start_hue = start_hue, normalize_gamut = True, normalized_chroma_ref = scalef, close_gamut = True)
+
+    # Pack everything in a structured array:
+    Nsamples = jabt.shape[0]
+    dtype = [(x,'f8') for x in ['cct','duv','Rf','Rg','Rt']]
+    dtype += [(x,'f8',(Nsamples,)) for x in ['Rfi','Rti']]
+    dtype += [(x,'f8',(nhbins,)) for x in ['Rfhi','Rcshi','Rhshi','Rfhi_vf','Rcshi_vf','Rhshi_vf']]
+    dtype += [(x,'f8',(nhbins+1,3)) for x in ['bjabt','bjabr']]
+    data = np.zeros((jabt.shape[1],), dtype = dtype)
+    data['cct'], data['duv'] = cct[:,0], duv[:,0]
+    data['Rf'], data['Rg'], data['Rt'] = Rf[0], Rg[0], Rt
+    data['Rfi'], data['Rti'] = Rfi.T, Rti.T
+    data['Rfhi'], data['Rcshi'], data['Rhshi'] = Rfhi.T, Rcshi.T, Rhshi.T
+    data['Rfhi_vf'], data['Rcshi_vf'], data['Rhshi_vf'] = Rfhi_vf.T, Rcshi_vf.T, Rhshi_vf.T
+    data['bjabt'], data['bjabr'] = np.transpose(bjabt,(1,0,2)), np.transpose(bjabr,(1,0,2))
+    return data
@@ -46,6 +46,10 @@ utils/init_cri_defaults_database.py
  :process_cri_type_input(): load a cri_type dict but overwrites any keys that 
                             have a non-None input in calling function.
 
+ :CompiledCriType: | cri_type dict with pre-resolved sample set, color space 
+                   | and cat parameters and cached (interpolated) spectral 
+                   | data, for fast repeated cri calculations.
+
             
 utils/DE_scalers.py
 -------------------
@@ -142,7 +146,7 @@ from luxpy import _CRI_RFL
 
 from ..utils.DE_scalers import linear_scale, log_scale, psy_scale
 
-from ..utils.init_cri_defaults_database import _CRI_TYPE_DEFAULT, _CRI_DEFAULTS, process_cri_type_input
+from ..utils.init_cri_defaults_database import _CRI_TYPE_DEFAULT, _CRI_DEFAULTS, process_cri_type_input, CompiledCriType
 
 from ..utils.helpers import (gamut_slicer,jab_to_rg, jab_to_rhi, jab_to_DEi,
                       spd_to_DEi, spd_to_rg, spd_to_cri)
@@ -157,7 +161,7 @@ from .mcri import _MCRI_DEFAULTS, spd_to_mcri
 from .cqs import _CQS_DEFAULTS, spd_to_cqs
 
 
-__all__  = ['_CRI_RFL','_CRI_TYPE_DEFAULT','_CRI_DEFAULTS']
+__all__  = ['_CRI_RFL','_CRI_TYPE_DEFAULT','_CRI_DEFAULTS','CompiledCriType']
 
 __all__ += ['gamut_slicer','jab_to_rg', 'jab_to_rhi', 'jab_to_DEi',
            'spd_to_DEi', 'spd_to_rg', 'spd_to_cri']
@@ -57,7 +57,7 @@ from luxpy import (np, _S_INTERP_TYPE, _CRI_RFL, _IESTM30, math, cam, cat,
 
 from .DE_scalers import linear_scale, log_scale, psy_scale
 
-from .init_cri_defaults_database import _CRI_TYPE_DEFAULT, _CRI_DEFAULTS, process_cri_type_input
+from .init_cri_defaults_database import _CRI_TYPE_DEFAULT, _CRI_DEFAULTS, process_cri_type_input, CompiledCriType
 
 __all__ = ['gamut_slicer','jab_to_rg', 'jab_to_rhi', 'jab_to_DEi',
            'spd_to_DEi', 'spd_to_rg', 'spd_to_cri']
@@ -127,57 +127,59 @@ def gamut_slicer(jab_test,jab_ref, out = 'jabt,jabr', nhbins = None, \
     binnr = jab_test[...,0].copy()
     DEi = jabt[...,0].copy()
     
-    # Loop over axis 1:
-    for ii in range(jab_test.shape[1]):
-          
-        # calculate hue angles:
-        ht = cam.hue_angle(jab_test[:,ii,1],jab_test[:,ii,2], htype='rad')
-        hr = cam.hue_angle(jab_ref[:,ii,1],jab_ref[:,ii,2], htype='rad')
-
-        if nhbins is None:
+    if nhbins is None:
+        # Loop over axis 1:
+        for ii in range(jab_test.shape[1]):
+              
+            # calculate hue angles:
+            ht = cam.hue_angle(jab_test[:,ii,1],jab_test[:,ii,2], htype='rad')
+            hr = cam.hue_angle(jab_ref[:,ii,1],jab_ref[:,ii,2], htype='rad')
+    
             Ir = np.argsort(hr)
             jabtii = jab_test[Ir,ii,:]
             jabrii = jab_ref[Ir,ii,:]
             nhbins = (jabtii.shape[0])
             DEi[...,ii] =  np.sqrt(np.power((jabtii - jabtii),2).sum(axis = jabtii.ndim -1))
-        else:
-            
-            #divide huecircle/data in n hue slices:
-            hbins = np.floor(((hr - start_hue*np.pi/180)/2/np.pi) * nhbins) # because of start_hue bin range can be different from 0 : n-1
-            hbins[hbins>=nhbins] = hbins[hbins>=nhbins] - nhbins # reset binnumbers to 0 : n-1 range
-            hbins[hbins < 0] = (nhbins - 2) - hbins[hbins < 0] # reset binnumbers to 0 : n-1 range
-
-            jabtii = np.zeros((nhbins,3))
-            jabrii = np.zeros((nhbins,3))
-            for i in range(nhbins):
-                if i in hbins:
-                    jabtii[i,:] = jab_test[hbins==i,ii,:].mean(axis = 0)
-                    jabrii[i,:] = jab_ref[hbins==i,ii,:].mean(axis = 0)
-                    DEi[i,ii] =  np.sqrt(np.power((jab_test[hbins==i,ii,:] - jab_ref[hbins==i,ii,:]),2).sum(axis = jab_test[hbins==i,ii,:].ndim -1)).mean(axis = 0)
-
-        if normalize_gamut == True:
-            #renormalize jabtii using jabrii:
-            Ct = np.sqrt(jabtii[:,1]**2 + jabtii[:,2]**2)
-            Cr = np.sqrt(jabrii[:,1]**2 + jabrii[:,2]**2)
-            ht = cam.hue_angle(jabtii[:,1],jabtii[:,2], htype = 'rad')
-            hr = cam.hue_angle(jabrii[:,1],jabrii[:,2], htype = 'rad')
-        
-            # calculate rescaled chroma of test:
-            C = normalized_chroma_ref*(Ct/Cr) 
+            jabt[:jabtii.shape[0],ii,:] = jabtii
+            jabr[:jabrii.shape[0],ii,:] = jabrii
+    else:
+        # calculate hue angles of all samples (axis 0) and spds (axis 1):
+        hr = cam.hue_angle(jab_ref[...,1],jab_ref[...,2], htype='rad')
         
-            # calculate normalized cart. co.: 
-            jabtii[:,1] = C*np.cos(ht)
-            jabtii[:,2] = C*np.sin(ht)
-            jabrii[:,1] = normalized_chroma_ref*np.cos(hr)
-            jabrii[:,2] = normalized_chroma_ref*np.sin(hr)
+        #divide huecircle/data in n hue slices:
+        hbins = np.floor(((hr - start_hue*np.pi/180)/2/np.pi) * nhbins) # because of start_hue bin range can be different from 0 : n-1
+        hbins[hbins>=nhbins] = hbins[hbins>=nhbins] - nhbins # reset binnumbers to 0 : n-1 range
+        hbins[hbins < 0] = (nhbins - 2) - hbins[hbins < 0] # reset binnumbers to 0 : n-1 range
+        binnr = hbins
         
-        if close_gamut == True:
-            jabtii = np.vstack((jabtii,jabtii[0,:])) # to create closed curve when plotting
-            jabrii = np.vstack((jabrii,jabrii[0,:])) # to create closed curve when plotting
-
-        jabt[:,ii,:] = jabtii
-        jabr[:,ii,:] = jabrii
-        binnr[:,ii] = hbins
+        # average jab and DEi in each hue bin of each spd (empty bins are set to zero):
+        inbin = (hbins >= 0) & (hbins < nhbins)
+        subs = (hbins + nhbins*np.arange(jab_test.shape[1])[None,:])[inbin]
+        DEij = np.sqrt(np.power((jab_test - jab_ref),2).sum(axis = jab_test.ndim - 1))
+        size = nhbins*jab_test.shape[1]
+        jabt[:nhbins] = math.accumarray(subs, jab_test[inbin], size = size, func = 'mean', fillval = 0).reshape(jab_test.shape[1],nhbins,3).transpose((1,0,2))
+        jabr[:nhbins] = math.accumarray(subs, jab_ref[inbin], size = size, func = 'mean', fillval = 0).reshape(jab_test.shape[1],nhbins,3).transpose((1,0,2))
+        DEi[:nhbins] = math.accumarray(subs, DEij[inbin], size = size, func = 'mean', fillval = 0).reshape(jab_test.shape[1],nhbins).T
+
+    if normalize_gamut == True:
+        #renormalize jabt using jabr:
+        Ct = np.sqrt(jabt[:nhbins,:,1]**2 + jabt[:nhbins,:,2]**2)
+        Cr = np.sqrt(jabr[:nhbins,:,1]**2 + jabr[:nhbins,:,2]**2)
+        ht = cam.hue_angle(jabt[:nhbins,:,1],jabt[:nhbins,:,2], htype = 'rad')
+        hr = cam.hue_angle(jabr[:nhbins,:,1],jabr[:nhbins,:,2], htype = 'rad')
+    
+        # calculate rescaled chroma of test:
+        C = normalized_chroma_ref*(Ct/Cr) 
+    
+        # calculate normalized cart. co.: 
+        jabt[:nhbins,:,1] = C*np.cos(ht)
+        jabt[:nhbins,:,2] = C*np.sin(ht)
+        jabr[:nhbins,:,1] = normalized_chroma_ref*np.cos(hr)
+        jabr[:nhbins,:,2] = normalized_chroma_ref*np.sin(hr)
+    
+    if close_gamut == True:
+        jabt[-1] = jabt[0] # to create closed curve when plotting
+        jabr[-1] = jabr[0] # to create closed curve when plotting
 
     # circle coordinates for plotting:
     hc = np.arange(360.0)*np.pi/180.0
@@ -430,6 +432,8 @@ def spd_to_jab_t_r(SPD, cri_type = _CRI_TYPE_DEFAULT, out = 'jabt,jabr', wl = No
             |   - dict: user defined model parameters 
             |     (see e.g. luxpy.cri._CRI_DEFAULTS['cierf'] 
             |     for required structure)
+            |   - CompiledCriType: pre-compiled cri_type 
+            |     (faster for repeated calls, see luxpy.cri.CompiledCriType)
             | Note that any non-None input arguments to the function will 
               override default values in cri_type dict.
             
@@ -510,13 +514,18 @@ def spd_to_jab_t_r(SPD, cri_type = _CRI_TYPE_DEFAULT, out = 'jabt,jabr', wl = No
     if wl is not None: 
         SPD = spd(data = SPD, interpolation = _S_INTERP_TYPE, kind = 'np', wl = wl)
       
-    # obtain sampleset:
-    if isinstance(sampleset,str):
-        sampleset = eval(sampleset)
+    # obtain sampleset and cmfs (pre-interpolated for compiled cri_type):
+    if isinstance(cri_type, CompiledCriType):
+        sampleset = cri_type.get_sampleset(SPD[0])
+        cmf_cct, cmf_xyz = cri_type.get_cmf(SPD[0],'cct'), cri_type.get_cmf(SPD[0],'xyz')
+    else:
+        if isinstance(sampleset,str):
+            sampleset = eval(sampleset)
+        cmf_cct, cmf_xyz = cieobs['cct'], cieobs['xyz']
     
     # A. calculate reference illuminant:
     # A.a. get xyzw:
-    xyztw = spd_to_xyz(SPD, cieobs = cieobs['cct'], rfl = None, out = 1)
+    xyztw = spd_to_xyz(SPD, cieobs = cmf_cct, rfl = None, out = 1)
 
     # A.b. get cct:
     cct, duv = xyz_to_cct(xyztw, cieobs = cieobs['cct'], out = 'cct,duv',mode = 'lut')
@@ -525,12 +534,15 @@ def spd_to_jab_t_r(SPD, cri_type = _CRI_TYPE_DEFAULT, out = 'jabt,jabr', wl = No
     Sr = cri_ref(cct, ref_type = ref_type, cieobs = cieobs['cct'], wl3 = SPD[0])
 
     # B. calculate xyz and xyzw of data (spds) and Sr:
-    xyzti, xyztw = spd_to_xyz(SPD, cieobs = cieobs['xyz'], rfl = sampleset, out = 2)
-    xyzri, xyzrw = spd_to_xyz(Sr, cieobs = cieobs['xyz'], rfl = sampleset, out = 2)
+    xyzti, xyztw = spd_to_xyz(SPD, cieobs = cmf_xyz, rfl = sampleset, out = 2)
+    xyzri, xyzrw = spd_to_xyz(Sr, cieobs = cmf_xyz, rfl = sampleset, out = 2)
 
     # C. apply chromatic adaptation for non-cam/lab cspaces:
     if catf is not None:
-        D_cat, Dtype_cat, La_cat, catmode_cat, cattype_cat, mcat_cat, xyzw_cat = [catf[x] for x in sorted(catf.keys())]
+        if isinstance(cri_type, CompiledCriType):
+            D_cat, Dtype_cat, La_cat, catmode_cat, cattype_cat, mcat_cat, xyzw_cat = cri_type.catf_pars
+        else:
+            D_cat, Dtype_cat, La_cat, catmode_cat, cattype_cat, mcat_cat, xyzw_cat = [catf[x] for x in sorted(catf.keys())]
         
         #if not isinstance(D_cat,list): D_cat = [D_cat]
         if xyzw_cat is None: #transform from xyzwt --> xyzwr
@@ -550,20 +562,17 @@ def spd_to_jab_t_r(SPD, cri_type = _CRI_TYPE_DEFAULT, out = 'jabt,jabr', wl = No
     xyztw = xyztw[None] 
     xyzrw = xyzrw[None] 
 
-    cspace_pars = cspace.copy()
-    cspace_pars.pop('type')
-    if 'xyzw' in cspace_pars.keys(): 
-        if cspace_pars['xyzw'] is None: 
-            cspace_pars['xyzw'] = xyztw # enter test whitepoint
-    jabt = colortf(xyzti, tf = cspace['type'], fwtf = cspace_pars)
+    # D.b. get cspace parameters:
+    if isinstance(cri_type, CompiledCriType):
+        cspace_type, cspace_pars = cri_type.cspace_type, cri_type.cspace_pars
+    else:
+        cspace_pars = cspace.copy()
+        cspace_type = cspace_pars.pop('type')
+    set_xyzw = ('xyzw' in cspace_pars.keys()) and (cspace_pars['xyzw'] is None)
     
-    cspace_pars = cspace.copy()
-    cspace_pars.pop('type')
-    if 'xyzw' in cspace_pars.keys(): 
-        if cspace_pars['xyzw'] is None: 
-            cspace_pars['xyzw'] = xyzrw # enter ref. whitepoint
-    jabr = colortf(xyzri, tf = cspace['type'], fwtf = cspace_pars)    
-    del cspace_pars
+    # D.c. convert (enter test and ref. whitepoints when required):
+    jabt = colortf(xyzti, tf = cspace_type, fwtf = dict(cspace_pars, xyzw = xyztw) if set_xyzw else cspace_pars)
+    jabr = colortf(xyzri, tf = cspace_type, fwtf = dict(cspace_pars, xyzw = xyzrw) if set_xyzw else cspace_pars)
 
 
     # E. Regulate output:
@@ -600,6 +609,8 @@ def spd_to_DEi(SPD, cri_type = _CRI_TYPE_DEFAULT, out = 'DEi', wl = None, \
             |   - dict: user defined model parameters 
             |     (see e.g. luxpy.cri._CRI_DEFAULTS['cierf'] 
             |     for required structure)
+            |   - CompiledCriType: pre-compiled cri_type 
+            |     (faster for repeated calls, see luxpy.cri.CompiledCriType)
             | Note that any non-None input arguments to the function will 
               override default values in cri_type dict.
         :sampleset:
@@ -792,6 +803,8 @@ def spd_to_rg(SPD, cri_type = _CRI_TYPE_DEFAULT, out = 'Rg', wl = None, \
             |   - dict: user defined model parameters 
             |     (see e.g. luxpy.cri._CRI_DEFAULTS['cierf'] 
             |     for required structure)
+            |   - CompiledCriType: pre-compiled cri_type 
+            |     (faster for repeated calls, see luxpy.cri.CompiledCriType)
             | Note that any non-None input arguments to the function will 
               override default values in cri_type dict.
         :sampleset:
@@ -971,6 +984,8 @@ def spd_to_cri(SPD, cri_type = _CRI_TYPE_DEFAULT, out = 'Rf', wl = None, \
             |   - dict: user defined model parameters 
             |     (see e.g. luxpy.cri._CRI_DEFAULTS['cierf'] 
             |     for required structure)
+            |   - CompiledCriType: pre-compiled cri_type 
+            |     (faster for repeated calls, see luxpy.cri.CompiledCriType)
             | Note that any non-None input arguments to the function will 
               override default values in cri_type dict.
         :sampleset:
@@ -20,13 +20,17 @@ Module with color fidelity and color gamut area parameter dicts
  :process_cri_type_input(): load a cri_type dict but overwrites any keys that 
                             have a non-None input in calling function
 
+ :CompiledCriType: | cri_type dict with pre-resolved sample set, color space 
+                   | and cat parameters and cached (interpolated) spectral 
+                   | data, for fast repeated cri calculations.
+
 
 .. codeauthor:: Kevin A.G. Smet (ksmet1977 at gmail.com)
 """
-from luxpy import np, math,put_args_in_db
+from luxpy import np, math, put_args_in_db, cie_interp, xyzbar, _CRI_RFL
 from .DE_scalers import linear_scale, log_scale, psy_scale
 
-__all__ = ['_CRI_TYPE_DEFAULT', '_CRI_DEFAULTS', 'process_cri_type_input']
+__all__ = ['_CRI_TYPE_DEFAULT', '_CRI_DEFAULTS', 'process_cri_type_input', 'CompiledCriType']
 
 #------------------------------------------------------------------------------
 # create default settings for different color rendition indices: (major dict has 9 keys (04-Jul-2017): sampleset [str/dict], ref_type [str], cieobs [str], avg [fcn handle], scale [dict], cspace [dict], catf [dict], rg_pars [dict], cri_specific_pars [dict])
@@ -150,7 +154,14 @@ def process_cri_type_input(cri_type, args, callerfunction = ''):
         :cri_type: 
             | dict with database of CRI model parameters.
     """
-    if isinstance(cri_type,str):
+    if isinstance(cri_type, CompiledCriType):
+        # only re-compile when there are overriding arguments:
+        overrides = {x : args[x] for x in args.keys() if (x in cri_type.keys()) and (args[x] is not None)}
+        if len(overrides) == 0:
+            return cri_type
+        else:
+            return CompiledCriType(cri_type, **overrides)
+    elif isinstance(cri_type,str):
         if (cri_type in _CRI_DEFAULTS['cri_types']):
             cri_type = _CRI_DEFAULTS[cri_type].copy()
         else:
@@ -161,3 +172,175 @@ def process_cri_type_input(cri_type, args, callerfunction = ''):
     cri_type = put_args_in_db(cri_type,args)
     return cri_type    
 
+
+#------------------------------------------------------------------------------
+class _CompiledCriTypeItem(dict):
+    """
+    Nested dict (e.g. 'cspace', 'catf') of a CompiledCriType that re-compiles
+    its owner when it is changed in place.
+    """
+    def __init__(self, owner, key, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._owner = owner
+        self._key = key
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._owner._changed(self._key)
+    
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._owner._changed(self._key)
+    
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._owner._changed(self._key)
+    
+    def setdefault(self, key, default = None):
+        value = super().setdefault(key, default)
+        self._owner._changed(self._key)
+        return value
+    
+    def pop(self, *args):
+        value = super().pop(*args)
+        self._owner._changed(self._key)
+        return value
+    
+    def popitem(self):
+        item = super().popitem()
+        self._owner._changed(self._key)
+        return item
+    
+    def clear(self):
+        super().clear()
+        self._owner._changed(self._key)
+    
+    def __reduce__(self):
+        # (pickle / deepcopy as plain dict):
+        return (dict, (dict(self),))
+
+class CompiledCriType(dict):
+    """
+    Compiled cri_type: a cri_type dict with pre-resolved data for fast 
+    repeated cri calculations (e.g. in optimization loops).
+    
+    | The sample set is resolved once (no eval of the sampleset str on every 
+      call), the color space and cat parameters are unpacked once and the 
+      sample set and CMFs are cached after interpolation to the wavelengths 
+      of the last SPD input.
+    | As it is a dict subclass, it can be used as cri_type input in all 
+      cri functions. Changing a key (item assignment, update) or changing 
+      a nested dict in place (e.g. cri_type['cspace']['type'] = 'jab_cam16')
+      re-compiles it.
+    
+    Args:
+        :cri_type:
+            | _CRI_TYPE_DEFAULT or str or dict or CompiledCriType, optional
+            | Database with CRI model parameters.
+            | (for supported types, see luxpy.cri._CRI_DEFAULTS['cri_types'])
+        :kwargs:
+            | Not-None values overwrite the values of the corresponding keys 
+              in :cri_type: (e.g. sampleset = ..., rg_pars = {...}).
+            
+    Returns:
+        :cri_type:
+            | CompiledCriType dict with following additional attributes:
+            | - sampleset: ndarray with the resolved sample set
+            | - cspace_type: str with color space type 
+            | - cspace_pars: dict with color space parameters (without 'type')
+            | - catf_pars: None or tuple with cat parameters 
+            |       (D, Dtype, La, catmode, cattype, mcat, xyzw)
+            
+    Example usage:
+        | cri_type = CompiledCriType('iesrf')
+        | for S in spds: 
+        |   Rf = spd_to_cri(S, cri_type = cri_type)
+    """
+    def __init__(self, cri_type = _CRI_TYPE_DEFAULT, **kwargs):
+        parent = cri_type if isinstance(cri_type, CompiledCriType) else None
+        if parent is not None:
+            cri_type = dict(parent)
+        cri_type = process_cri_type_input(cri_type, kwargs, callerfunction = 'cri.CompiledCriType')
+        
+        # copy nested dicts (avoid changing _CRI_DEFAULTS):
+        super().__init__({x : (_CompiledCriTypeItem(self, x, v) if isinstance(v,dict) else v) for x,v in cri_type.items()})
+        self._cache = {'wl' : None}
+        self._compile()
+        
+        # reuse cached spectral data of parent when possible:
+        if (parent is not None):
+            if (parent.sampleset is self.sampleset) & (parent['cieobs'] == self['cieobs']):
+                self._cache = parent._cache
+
+    def _compile(self):
+        """
+        Resolve sample set and unpack color space and cat parameters.
+        """
+        sampleset = self['sampleset']
+        if isinstance(sampleset,str):
+            sampleset = eval(sampleset)
+        if (getattr(self, 'sampleset', None) is not sampleset):
+            self._cache = {'wl' : None}
+        self.sampleset = sampleset
+        
+        cspace = self['cspace']
+        self.cspace_type = cspace['type']
+        self.cspace_pars = {x : cspace[x] for x in cspace.keys() if x != 'type'}
+        
+        catf = self['catf']
+        self.catf_pars = None if (catf is None) else tuple([catf[x] for x in sorted(catf.keys())])
+
+    def _changed(self, key):
+        """
+        Re-compile after a change of (a nested dict of) key.
+        """
+        if key in ['cieobs']:
+            self._cache = {'wl' : None}
+        self._compile()
+    
+    def __setitem__(self, key, value):
+        if isinstance(value, dict):
+            value = _CompiledCriTypeItem(self, key, value)
+        super().__setitem__(key, value)
+        self._changed(key)
+    
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+    
+    def copy(self):
+        return CompiledCriType(self)
+    
+    def __reduce__(self):
+        # re-compile when unpickling (e.g. when sent to worker processes):
+        return (CompiledCriType, ({x : (dict(v) if isinstance(v,dict) else v) for x,v in self.items()},))
+    
+    def _get_cache(self, wl):
+        """
+        Get cache dict for wavelengths wl (reset when wl changes).
+        """
+        if (self._cache['wl'] is None) or (not np.array_equal(self._cache['wl'], wl)):
+            self._cache.clear()
+            self._cache['wl'] = wl.copy()
+        return self._cache
+        
+    def get_sampleset(self, wl):
+        """
+        Get sample set interpolated to wavelengths wl (cached).
+        """
+        cache = self._get_cache(wl)
+        if 'sampleset' not in cache.keys():
+            cache['sampleset'] = cie_interp(data = np.atleast_2d(self.sampleset), wl_new = wl, kind = 'rfl')
+        return cache['sampleset']
+
+    def get_cmf(self, wl, key = 'xyz'):
+        """
+        Get CMFs of self['cieobs'][key] interpolated to wavelengths wl (cached).
+        """
+        cache = self._get_cache(wl)
+        cieobs = self['cieobs'][key]
+        if not isinstance(cieobs,str):
+            return cieobs
+        if ('cmf',cieobs) not in cache.keys():
+            cache[('cmf',cieobs)] = xyzbar(cieobs = cieobs, scr = 'dict', wl_new = wl, kind = 'np')
+        return cache[('cmf',cieobs)]
@@ -34,6 +34,8 @@ Functions:
  :getOOspd(): measure spectrum
  :create_dark_model(): create a model for dark counts
  :estimate_dark_from_model(): estimate dark counts for specified integration time based on model
+ :DarkModel: class with pre-fitted (per pixel) dark model for fast dark estimation
+ :get_dark_model(): get DarkModel from ndarray or file (files are parsed only once)
  
 Default parameters:
 -------------------
@@ -78,9 +80,11 @@ Notes:
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
+import os
 import tkinter
 from tkinter import messagebox
 from scipy.signal import savgol_filter
+from scipy.interpolate import CubicSpline
 import time
 
 import seabreeze
@@ -88,7 +92,8 @@ seabreeze.use("pyseabreeze")
 import seabreeze.spectrometers as sb
 
 
-__all__ = ['initOOdev','getOOspd','create_dark_model','estimate_dark_from_model','plot_spd']
+__all__ = ['initOOdev','getOOspd','create_dark_model','estimate_dark_from_model',
+           'DarkModel','get_dark_model','plot_spd']
 
 # Init default parameters
 _INT_TIME_SEC = 0.5 # default integration time
@@ -101,6 +106,7 @@ _DARK_MODEL_INT_TIMES = np.linspace(1e-6, 7.5, 5) # array with integration times
 _SAVGOL_WINDOW = 1/20.0 # window for smoothing of dark measurements
 _SAVGOL_ORDER = 3 # order of savgol filter
 _VERBOSITY = 1 # verbosity (0: nothing, 1: text, 2: text + graphs)
+_DARK_MODEL_CACHE = {} # cache with DarkModels read from file: {(filename, kind): (mtime, DarkModel)}
 
 def initOOdev(devnr = 0, verbosity = _VERBOSITY):
     """
@@ -192,7 +198,7 @@ def create_dark_model(spec, dark_model_int_times = _DARK_MODEL_INT_TIMES, \
                       savgol_window = _SAVGOL_WINDOW, \
                       correct_dark_counts = _CORRECT_DARK_COUNTS, \
                       correct_nonlinearity = _CORRECT_NONLINEARITY, \
-                      verbosity = _VERBOSITY, auto_close = True):
+                      verbosity = _VERBOSITY, auto_close = True, kind = None):
     """
     Create a dark model to account for readout noise and dark light.
     
@@ -228,6 +234,11 @@ def create_dark_model(spec, dark_model_int_times = _DARK_MODEL_INT_TIMES, \
         :auto_close:
             | True, optional
             | Close spectrometer after measurement.
+        :kind:
+            | None or str, optional
+            | None: return ndarray with dark model.
+            | else: return DarkModel fitted with this kind 
+            |       ('interp', 'linear' or 'spline', see DarkModel).
             
     Returns:
         :dark_model: 
@@ -235,6 +246,7 @@ def create_dark_model(spec, dark_model_int_times = _DARK_MODEL_INT_TIMES, \
             |   first column (from row 1 onwards): integration times (secs)
             |   second column onwards: dark spectra (cnts, with wavelengths
             |   on row 0). 
+            | or DarkModel (if :kind: is not None).
         
     """
     # Ask user response:
@@ -319,6 +331,9 @@ def create_dark_model(spec, dark_model_int_times = _DARK_MODEL_INT_TIMES, \
     if auto_close == True:
         spec.close()
         spec = None
+    
+    if kind is not None:
+        dark_model = DarkModel(dark_model, kind = kind)
         
     return dark_model
 
@@ -361,7 +376,7 @@ def estimate_dark_from_model(int_time, dark_model):
         :int_time: 
             | integration time in seconds
         :dark_model: 
-            | ndarray with dark model
+            | ndarray with dark model or DarkModel
             |   first column (from row 1 onwards): integration times (secs)
             |   second column onwards: dark spectra (cnts, with wavelengths
             |   on row 0). 
@@ -369,8 +384,12 @@ def estimate_dark_from_model(int_time, dark_model):
     Returns:
         :returns:
             | dark spectrum (row 0: wavelengths, row 1: counts)
+            | (for a DarkModel and an ndarray with integration times: 
+            |  row 1 onwards: counts for each integration time)
     """
-    if dark_model.shape[0] > 2: # contains array with dark model
+    if isinstance(dark_model, DarkModel):
+        return np.vstack((dark_model.wl, dark_model.estimate(int_time)))
+    elif dark_model.shape[0] > 2: # contains array with dark model
         dark_its_arr = dark_model[1:,0] # integration times
         dark_cnts_arr = dark_model[1:,1:] # dark counts (first axis of dark_model are wavelengths)
         p1,p2 = _find_two_closest(int_time, dark_its_arr)
@@ -385,6 +404,159 @@ def estimate_dark_from_model(int_time, dark_model):
     else:
         raise Exception('dark_model does not contain a dark model (.shape[0] > 2) or spectrum (.shape[0] == 2)!')
 
+class DarkModel:
+    """
+    Dark model with dark counts pre-fitted (per pixel) vs integration time.
+    
+    | The dark model data is parsed only once and the model coefficients of 
+      all pixels are determined at initialization, so estimating the dark 
+      spectrum for an integration time is a single vectorized evaluation.
+    
+    Args:
+        :dark_model:
+            | ndarray or str or DarkModel
+            | - ndarray-format for model:
+            |    first column (from row 1 onwards): integration times (secs)
+            |    second column onwards: dark spectra (cnts, with wavelengths
+            |    on row 0). 
+            | - ndarray-format for dark spectrum:
+            |    row 0: wavelengths and row 1: dark spectrum in counts.
+            | - str: filename of cvs-file with model or dark counts.
+        :kind:
+            | 'interp' or str, optional
+            | Model fitted to the dark counts of each pixel:
+            |   - 'interp': linear interpolation between the two closest 
+            |               integration times (same as estimate_dark_from_model).
+            |   - 'linear': least-squares straight line 
+            |               (offset + dark current * integration time).
+            |   - 'spline': cubic spline.
+            | Outside the range of integration times the model is extrapolated.
+            | For a dark spectrum, :kind: is ignored (spectrum is returned 
+            | for any integration time).
+            
+    Attributes:
+        :wl: 
+            | ndarray with wavelengths.
+        :int_times:
+            | ndarray with integration times (None for a dark spectrum).
+        :dark_cnts:
+            | ndarray with dark counts (.shape = (N_int_times, N_wl))
+    """
+    def __init__(self, dark_model, kind = 'interp'):
+        if isinstance(dark_model, DarkModel):
+            dark_model = dark_model.to_array()
+        elif isinstance(dark_model, str):
+            dark_model = pd.read_csv(dark_model, sep =',', header = None).values
+        dark_model = np.asarray(dark_model, dtype = float)
+        if kind not in ('interp','linear','spline'):
+            raise Exception("DarkModel(): Unknown kind: '{:s}' (options: 'interp', 'linear', 'spline')".format(kind))
+        self.kind = kind
+        
+        if dark_model.shape[0] > 2: # contains array with dark model
+            p = np.argsort(dark_model[1:,0])
+            self.wl = dark_model[0,1:]
+            self.int_times = dark_model[1:,0][p]
+            self.dark_cnts = dark_model[1:,1:][p]
+            if kind == 'interp':
+                # The two closest integration times are always neighbours, 
+                # and switch from (k, k+1) to (k+1, k+2) halfway t[k] and t[k+2]:
+                self._breaks = (self.int_times[:-2] + self.int_times[2:])/2
+                self._ddark = np.diff(self.dark_cnts, axis = 0)
+                self._dint_times = np.diff(self.int_times)
+            elif kind == 'linear':
+                self._coeffs = np.polyfit(self.int_times, self.dark_cnts, 1)
+            else:
+                self._spline = CubicSpline(self.int_times, self.dark_cnts, axis = 0, extrapolate = True)
+        elif dark_model.shape[0] == 2: # contains array with dark spectrum
+            self.wl = dark_model[0]
+            self.int_times = None
+            self.dark_cnts = dark_model[1:]
+        else:
+            raise Exception('dark_model does not contain a dark model (.shape[0] > 2) or spectrum (.shape[0] == 2)!')
+    
+    def estimate(self, int_time):
+        """
+        Estimate the dark counts for the specified integration time(s).
+        
+        Args:
+            :int_time:
+                | float or ndarray with integration times in seconds.
+                
+        Returns:
+            :dark:
+                | ndarray with dark counts 
+                | (.shape = (N_wl,) for a single integration time,
+                |  or (N_int_times, N_wl) for an ndarray with integration times)
+        """
+        int_time = np.asarray(int_time, dtype = float)
+        t = np.atleast_1d(int_time).flatten()
+        if self.int_times is None:
+            dark = np.repeat(self.dark_cnts, t.shape[0], axis = 0)
+        elif self.kind == 'interp':
+            k = np.searchsorted(self._breaks, t, side = 'left')
+            dark = self.dark_cnts[k] + (t - self.int_times[k])[:,None]*self._ddark[k]/self._dint_times[k][:,None]
+        elif self.kind == 'linear':
+            dark = self._coeffs[1] + t[:,None]*self._coeffs[0]
+        else:
+            dark = self._spline(t)
+        return dark[0] if (int_time.ndim == 0) else dark
+    
+    __call__ = estimate
+    
+    def to_array(self):
+        """
+        Return ndarray with dark model (or dark spectrum) data.
+        """
+        if self.int_times is None:
+            return np.vstack((self.wl, self.dark_cnts))
+        else:
+            return np.hstack((np.vstack((np.nan,self.int_times[:,None])),\
+                              np.vstack((self.wl,self.dark_cnts))))
+    
+    def save(self, filename, float_format = '%1.4f'):
+        """
+        Write dark model data to cvs-file (readable by DarkModel()).
+        """
+        pd.DataFrame(self.to_array()).to_csv(filename, index = False, header = False, float_format = float_format)
+    
+    def __repr__(self):
+        if self.int_times is None:
+            return 'DarkModel(dark spectrum, N_wl = {:1.0f})'.format(self.wl.shape[0])
+        return "DarkModel(kind = '{:s}', int_times = {}, N_wl = {:1.0f})".format(self.kind, self.int_times, self.wl.shape[0])
+
+def get_dark_model(dark_model, kind = None):
+    """
+    Get DarkModel from ndarray, file or DarkModel.
+    
+    Args:
+        :dark_model:
+            | ndarray or str (filename) or DarkModel (see DarkModel)
+        :kind:
+            | None or str, optional
+            | Kind of model (see DarkModel).
+            | None: DarkModel input is returned as is, else 'interp' is used.
+    
+    Returns:
+        :dark_model:
+            | DarkModel
+            
+    Note:
+        | DarkModels read from file are cached, so a file is only parsed again
+          when it was modified.
+    """
+    if isinstance(dark_model, DarkModel) and ((kind is None) or (kind == dark_model.kind)):
+        return dark_model
+    if kind is None:
+        kind = 'interp'
+    if isinstance(dark_model, str):
+        filename = os.path.abspath(dark_model)
+        mtime = os.path.getmtime(filename)
+        key = (filename, kind)
+        if (key not in _DARK_MODEL_CACHE) or (_DARK_MODEL_CACHE[key][0] != mtime):
+            _DARK_MODEL_CACHE[key] = (mtime, DarkModel(filename, kind = kind))
+        return _DARK_MODEL_CACHE[key][1]
+    return DarkModel(dark_model, kind = kind)
+
 
 def _correct_for_dark(spec, cnts, int_time_sec, method = 'dark_model.dat', \
                       savgol_window = _SAVGOL_WINDOW, \
@@ -402,14 +574,16 @@ def _correct_for_dark(spec, cnts, int_time_sec, method = 'dark_model.dat', \
         :int_time_sec:
             | integration time of light spectrum measurement
         :method:
-            | 'dark_model.dat' or str or ndarray, optional
+            | 'dark_model.dat' or str or ndarray or DarkModel, optional
             | If str: 
             |   - 'none': don't perform dark correction
             |   - 'measure': perform a dark measurement with integration time
             |                specified in :int_time_sec:.
             |   - 'dark_model.dat' or other filename. Read cvs-file with 
-            |       model or dark counts.
-            | else: method should contain an ndarray with the dark model or dark cnts.
+            |       model or dark counts (file is only parsed once, 
+            |       see get_dark_model).
+            | else: method should contain a DarkModel or an ndarray with the 
+            |       dark model or dark cnts.
             |        - ndarray-format for model:
             |           first column (from row 1 onwards): integration times (secs)
             |           second column onwards: dark spectra (cnts, with wavelengths
@@ -440,9 +614,9 @@ def _correct_for_dark(spec, cnts, int_time_sec, method = 'dark_model.dat', \
         :returns:
             | ndarray with dark corrected light spectrum in counts.
     """
-    if method == 'none':
+    if isinstance(method,str) and (method == 'none'):
         return cnts
-    elif method == 'measure':
+    elif isinstance(method,str) and (method == 'measure'):
             # Determine odd window_length of savgol filter for smoothing (if 0: no smoothing):
             if savgol_window > 0:
                 if isinstance(savgol_window,int):
@@ -466,9 +640,7 @@ def _correct_for_dark(spec, cnts, int_time_sec, method = 'dark_model.dat', \
             messagebox.showinfo("Dark Measurement","Dark measurement completed. Press Ok to continue with measurement.")
             root.withdraw()
     else:
-        if isinstance(method,str):
-            dark_model = pd.read_csv(method, sep =',', header = None).values
-        dark_cnts = estimate_dark_from_model(int_time_sec, dark_model)[1] #take second row (first are wavelengths) 
+        dark_cnts = get_dark_model(method).estimate(int_time_sec)
     return cnts - dark_cnts
 
 def _find_opt_int_time(spec, int_time_sec, \
@@ -659,14 +831,16 @@ def getOOspd(spec = None, devnr = 0, int_time_sec = _INT_TIME_SEC, \
             | Set board temperature on TEC supported spectrometers.
             | NOT YET IMPLEMENTED (13/07/2018)
         :dark_cnts:
-            | 'dark_model.dat' or str or ndarray, optional
+            | 'dark_model.dat' or str or ndarray or DarkModel, optional
             | If str: 
             |   - 'none': don't perform dark correction
             |   - 'measure': perform a dark measurement with integration time
             |                specified in :int_time_sec:.
             |   - 'dark_model.dat' or other filename. Read cvs-file with 
-            |       model or dark counts.
-            | else: method should contain an ndarray with the dark model or dark cnts.
+            |       model or dark counts (file is only parsed once, 
+            |       see get_dark_model).
+            | else: method should contain a DarkModel or an ndarray with the 
+            |       dark model or dark cnts.
             |        - ndarray-format for model:
             |           first column (from row 1 onwards): integration times (secs)
             |           second column onwards: dark spectra (cnts, with wavelengths
@@ -23,12 +23,23 @@ Module for hyper spectral image simulation
 
  :_HYPSPCIM_DEFAULT_IMAGE: path + filename to default image
 
+ :RflIndex: Spectral reconstruction index: holds the cKDTree of the color 
+            coordinates of a reflectance set under a reference spectrum 
+            (built once, can be cached to disk) for batched reflectance 
+            estimation of xyz values.
+
+ :get_rfl_index(): Get (cached) RflIndex for a reflectance set, reference 
+                   spectrum, cmf set and color space.
+
  :xyz_to_rfl(): approximate spectral reflectance of xyz based on k nearest 
                 neighbour interpolation of samples from a standard reflectance 
                 set.
 
  :render_image(): Render image under specified light source spd.
 
+ :render_image_batch(): Render image under a batch of light source spds 
+                        (reflectances are estimated only once).
+
 
 .. codeauthor:: Kevin A.G. Smet (ksmet1977 at gmail.com)
 """
@@ -7,33 +7,242 @@ Module for hyper spectral image simulation
 
  :_HYPSPCIM_DEFAULT_IMAGE: path + filename to default image
 
+ :RflIndex: Spectral reconstruction index: holds the cKDTree of the color 
+            coordinates of a reflectance set under a reference spectrum 
+            (built once, can be cached to disk) for batched reflectance 
+            estimation of xyz values.
+
+ :get_rfl_index(): Get (cached) RflIndex for a reflectance set, reference 
+                   spectrum, cmf set and color space.
+
  :xyz_to_rfl(): approximate spectral reflectance of xyz based on k nearest 
                 neighbour interpolation of samples from a standard reflectance 
                 set.
 
  :render_image(): Render image under specified light source spd.
 
+ :render_image_batch(): Render image under a batch of light source spds 
+                        (reflectances are estimated only once).
+
 
 .. codeauthor:: Kevin A.G. Smet (ksmet1977 at gmail.com)
 """
 
-from luxpy import (warnings, np, plt, skimsave, cKDTree, cat, colortf, _PKG_PATH, _SEP, _CIEOBS, 
-                   _CIE_ILLUMINANTS, _CRI_RFL, _EPS, spd_to_xyz,plot_color_data)
+from luxpy import (os, warnings, np, plt, skimsave, cKDTree, cat, colortf, odict, _PKG_PATH, _SEP, _CIEOBS, 
+                   _CIE_ILLUMINANTS, _CRI_RFL, _EPS, spd_to_xyz,plot_color_data, unique_colors)
+import hashlib
 from luxpy.toolboxes.spdbuild import spdbuilder as spb
 
 # from skimage.io import imsave
 # from matplotlib.pyplot import imread
 
-__all__ =['_HYPSPCIM_PATH','_HYPSPCIM_DEFAULT_IMAGE','render_image']             
+__all__ =['_HYPSPCIM_PATH','_HYPSPCIM_DEFAULT_IMAGE','RflIndex','get_rfl_index','render_image','render_image_batch']             
 
 _HYPSPCIM_PATH = _PKG_PATH + _SEP + 'hypspcim' + _SEP
 _HYPSPCIM_DEFAULT_IMAGE = _PKG_PATH + _SEP + 'toolboxes' + _SEP + 'hypspcim' +  _SEP + 'data' + _SEP + 'testimage1.jpg'
 
 
+_RFL_INDEX_CACHE = odict() # in-memory cache of RflIndex objects
+_RFL_INDEX_CACHE_SIZE = 8
+
+def _rfl_index_key(rfl, refspd, cieobs, cspace, cspace_tf):
+    """
+    Get hash key (hexdigest) of the parameters defining a RflIndex.
+    """
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(rfl, dtype = float).tobytes())
+    h.update(np.ascontiguousarray(refspd, dtype = float).tobytes())
+    if isinstance(cieobs, str):
+        h.update(cieobs.encode())
+    else:
+        h.update(np.ascontiguousarray(cieobs, dtype = float).tobytes())
+    h.update(cspace.encode())
+    for key in sorted(cspace_tf.keys()):
+        value = cspace_tf[key]
+        h.update(key.encode())
+        h.update(repr(value.tolist() if isinstance(value, np.ndarray) else value).encode())
+    return h.hexdigest()
+
+class RflIndex():
+    """
+    Spectral reconstruction index for estimating reflectances of xyz values.
+    
+    | Holds the reflectance set, the lab-type color coordinates of the set 
+      under the reference spectrum and the cKDTree of these coordinates, so
+      they only need to be calculated once for repeated reflectance 
+      estimations (e.g. when rendering image batches or video frames).
+    
+    Args:
+        :rfl: 
+            | None or ndarray, optional
+            | Reflectance set for color coordinate to rfl mapping.
+            | None defaults to the IES TM30 4880 set (5 nm).
+        :refspd: 
+            | None, optional
+            | Reference spectrum for color coordinate to rfl mapping.
+            | None defaults to D65.
+        :cieobs:
+            | _CIEOBS, optional
+            | CMF set used for calculation of xyz from spectral data.
+        :cspace:
+            | 'ipt',  optional
+            | Color space for color coordinate to rfl mapping.
+        :cspace_tf:
+            | {}, optional
+            | Dict with parameters for xyz_to_... and ..._to_xyz transform.
+    """
+    def __init__(self, rfl = None, refspd = None, cieobs = _CIEOBS, cspace = 'ipt', cspace_tf = {}, 
+                 _lab_rr = None, _xyz_wr = None):
+        # get rfl set:
+        if rfl is None: # use IESTM30['4880'] set 
+            rfl = _CRI_RFL['ies-tm30']['4880']['5nm']
+            
+        # get Ref spd:
+        if refspd is None:
+            refspd = _CIE_ILLUMINANTS['D65'].copy()
+        
+        self.rfl = rfl
+        self.refspd = refspd
+        self.cieobs = cieobs
+        self.cspace = cspace
+        self.key = _rfl_index_key(rfl, refspd, cieobs, cspace, cspace_tf)
+        
+        # Calculate lab-type coordinates of standard rfl set under refspd:
+        if (_lab_rr is None) | (_xyz_wr is None):
+            xyz_rr, _xyz_wr = spd_to_xyz(refspd, relative = True, rfl = rfl, cieobs = cieobs, out = 2)
+        self.xyz_wr = _xyz_wr
+        self.cspace_tf = cspace_tf.copy()
+        self.cspace_tf['xyzw'] = _xyz_wr # put correct white point in param. dict
+        if _lab_rr is None:
+            _lab_rr = colortf(xyz_rr, tf = cspace, fwtf = self.cspace_tf, bwtf = self.cspace_tf)[:,0,:]
+        self.lab_rr = _lab_rr
+        
+        # Construct cKDTree:
+        self.tree = cKDTree(self.lab_rr, copy_data = True)
+        
+    def __len__(self):
+        return self.lab_rr.shape[0]
+    
+    def xyz_to_lab(self, xyz):
+        """
+        Convert xyz to lab-type values under refspd.
+        """
+        return colortf(xyz, tf = self.cspace, fwtf = self.cspace_tf, bwtf = self.cspace_tf)
+    
+    def query(self, xyz, k_neighbours = 4, chunk_size = None):
+        """
+        Estimate reflectances of xyz using k nearest neighbour interpolation
+        (inverse distance weighting) of samples of the reflectance set.
+        
+        Args:
+            :xyz: 
+                | ndarray with tristimulus values of target points.
+            :k_neighbours:
+                | 4 or int, optional
+                | Number of nearest neighbours for reflectance interpolation.
+            :chunk_size:
+                | None, optional
+                | If not None: query (distinct) colors in batches of 
+                  :chunk_size: to limit memory use.
+                  
+        Returns:
+            :rfl_est:
+                | ndarray with estimated reflectance spectra 
+                  (first row: wavelengths).
+        """
+        return self.query_lab(self.xyz_to_lab(xyz), k_neighbours = k_neighbours, chunk_size = chunk_size)
+    
+    def query_lab(self, lab, k_neighbours = 4, chunk_size = None):
+        """
+        Estimate reflectances of lab-type values (under refspd, see query()).
+        """
+        # Only query distinct colors:
+        lab_u, lab_indices = unique_colors(lab.reshape(-1,3), return_inverse = True)
+        chunk_size = lab_u.shape[0] if chunk_size is None else int(chunk_size)
+        rfl_est_u = np.empty((lab_u.shape[0], self.rfl.shape[1]))
+        for i in range(0, lab_u.shape[0], max(chunk_size, 1)):
+            d, inds = self.tree.query(lab_u[i:i + chunk_size], k = k_neighbours)
+            if k_neighbours  > 1:
+                w = (1.0 / d**2)[:,:,None] # inverse distance weigthing
+                rfl_est_u[i:i + chunk_size] = np.sum(w * self.rfl[inds+1,:], axis=1) / np.sum(w, axis=1)
+            else:
+                rfl_est_u[i:i + chunk_size] = self.rfl[inds+1,:]
+        return np.vstack((self.rfl[0], rfl_est_u[lab_indices]))
+    
+    def save(self, filename):
+        """
+        Save index to (.npz) file (the cKDTree is rebuilt on loading).
+        """
+        cieobs = np.array(self.cieobs) if isinstance(self.cieobs, str) else self.cieobs
+        cspace_tf = self.cspace_tf.copy()
+        cspace_tf.pop('xyzw')
+        np.savez(filename, rfl = self.rfl, refspd = self.refspd, cieobs = cieobs,
+                 cspace = np.array(self.cspace), cspace_tf = np.array([cspace_tf], dtype = object),
+                 lab_rr = self.lab_rr, xyz_wr = self.xyz_wr, key = np.array(self.key))
+    
+    @classmethod
+    def load(cls, filename):
+        """
+        Load index from (.npz) file saved with RflIndex.save().
+        """
+        data = np.load(filename, allow_pickle = True)
+        cieobs = str(data['cieobs']) if (data['cieobs'].ndim == 0) else data['cieobs']
+        return cls(rfl = data['rfl'], refspd = data['refspd'], cieobs = cieobs, 
+                   cspace = str(data['cspace']), cspace_tf = data['cspace_tf'][0],
+                   _lab_rr = data['lab_rr'], _xyz_wr = data['xyz_wr'])
+
+def get_rfl_index(rfl = None, refspd = None, cieobs = _CIEOBS, cspace = 'ipt', cspace_tf = {}, cache_dir = None):
+    """
+    Get (cached) spectral reconstruction index for xyz to rfl mapping.
+    
+    | Indices are cached in memory (the most recently used ones are kept) 
+      with as key a hash of the input parameters.
+    
+    Args:
+        :rfl, refspd, cieobs, cspace, cspace_tf: 
+            | see RflIndex
+        :cache_dir:
+            | None, optional
+            | If not None: directory in which the index is also cached 
+              on disk (as 'rflindex_<hash>.npz'; also saved when the index 
+              is found in the memory cache, but not yet on disk).
+            
+    Returns:
+        :rfl_index:
+            | RflIndex object.
+    """
+    if rfl is None: 
+        rfl = _CRI_RFL['ies-tm30']['4880']['5nm']
+    if refspd is None:
+        refspd = _CIE_ILLUMINANTS['D65']
+    key = _rfl_index_key(rfl, refspd, cieobs, cspace, cspace_tf)
+    filename = None if cache_dir is None else os.path.join(cache_dir, 'rflindex_' + key + '.npz')
+    
+    if key in _RFL_INDEX_CACHE:
+        _RFL_INDEX_CACHE.move_to_end(key)
+        rfl_index = _RFL_INDEX_CACHE[key]
+        if (filename is not None) and (not os.path.exists(filename)):
+            rfl_index.save(filename)
+        return rfl_index
+    
+    if (filename is not None) and os.path.exists(filename):
+        rfl_index = RflIndex.load(filename)
+    else:
+        rfl_index = RflIndex(rfl = rfl, refspd = refspd.copy(), cieobs = cieobs, cspace = cspace, cspace_tf = cspace_tf)
+        if filename is not None:
+            rfl_index.save(filename)
+    
+    _RFL_INDEX_CACHE[key] = rfl_index
+    while len(_RFL_INDEX_CACHE) > _RFL_INDEX_CACHE_SIZE:
+        _RFL_INDEX_CACHE.popitem(last = False)
+    return rfl_index
+
+
 def xyz_to_rfl(xyz, rfl = None, out = 'rfl_est', \
                  refspd = None, D = None, cieobs = _CIEOBS, \
                  cspace = 'ipt', cspace_tf = {},\
-                 k_neighbours = 4, verbosity = 0):
+                 k_neighbours = 4, verbosity = 0, \
+                 rfl_index = None, cache_dir = None):
     """
     Approximate spectral reflectance of xyz based on k nearest neighbour 
     interpolation of samples from a standard reflectance set.
@@ -67,6 +276,14 @@ def xyz_to_rfl(xyz, rfl = None, out = 'rfl_est', \
             | 0, optional
             | If > 0: make a plot of the color coordinates of original and 
               rendered image pixels.
+        :rfl_index:
+            | None, optional
+            | RflIndex to use for the mapping (overrides :rfl:, :refspd:, 
+              :cieobs:, :cspace: and :cspace_tf:).
+            | If None: get (cached) index with get_rfl_index().
+        :cache_dir:
+            | None, optional
+            | Directory for disk cache of index (see get_rfl_index()).
 
     Returns:
         :returns: 
@@ -74,43 +291,24 @@ def xyz_to_rfl(xyz, rfl = None, out = 'rfl_est', \
             | ndarrays with estimated reflectance spectra.
     """
 
-    # get rfl set:
-    if rfl is None: # use IESTM30['4880'] set 
-        rfl = _CRI_RFL['ies-tm30']['4880']['5nm']
-        
-    # get Ref spd:
-    if refspd is None:
-        refspd = _CIE_ILLUMINANTS['D65'].copy()
-
-        
-    # Calculate lab-type coordinates of standard rfl set under refspd:
-    xyz_rr, xyz_wr = spd_to_xyz(refspd, relative = True, rfl = rfl, cieobs = cieobs, out = 2)
-    cspace_tf_copy = cspace_tf.copy()
-    cspace_tf_copy['xyzw'] = xyz_wr # put correct white point in param. dict
-    lab_rr = colortf(xyz_rr, tf = cspace, fwtf = cspace_tf_copy, bwtf = cspace_tf_copy)[:,0,:]
+    # Get spectral reconstruction index (cKDTree of lab-type coordinates of 
+    # standard rfl set under refspd):
+    if rfl_index is None:
+        rfl_index = get_rfl_index(rfl = rfl, refspd = refspd, cieobs = cieobs, 
+                                  cspace = cspace, cspace_tf = cspace_tf, cache_dir = cache_dir)
+    refspd, cieobs, cspace = rfl_index.refspd, rfl_index.cieobs, rfl_index.cspace
     
     # Convert xyz to lab-type values under refspd:
-    lab = colortf(xyz, tf = cspace, fwtf = cspace_tf_copy, bwtf = cspace_tf_copy)
-    
-    # Find rfl (cfr. lab_rr) from rfl set that results in 'near' metameric 
-    # color coordinates for each value in lab_ur (i.e. smallest DE):
-    # Construct cKDTree:
-    tree = cKDTree(lab_rr, copy_data = True)
-    
-    # Interpolate rfls using k nearest neightbours and inverse distance weigthing:
-    d, inds = tree.query(lab, k = k_neighbours )
-    if k_neighbours  > 1:
-        w = (1.0 / d**2)[:,:,None] # inverse distance weigthing
-        rfl_est = np.sum(w * rfl[inds+1,:], axis=1) / np.sum(w, axis=1)
-    else:
-        rfl_est = rfl[inds+1,:].copy()
-    rfl_est = np.vstack((rfl[0],rfl_est))
+    lab = rfl_index.xyz_to_lab(xyz)
+    
+    # Find rfl from rfl set that results in 'near' metameric color coordinates 
+    # for each value in lab (i.e. smallest DE) and interpolate rfls using 
+    # k nearest neightbours and inverse distance weigthing:
+    rfl_est = rfl_index.query_lab(lab, k_neighbours = k_neighbours)
         
     if (verbosity > 0) | ('xyz_est' in out.split(',')) | ('lab_est' in out.split(',')) | ('DEi_ab' in out.split(',')) | ('DEa_ab' in out.split(',')):
         xyz_est, _ = spd_to_xyz(refspd, rfl = rfl_est, relative = True, cieobs = cieobs, out = 2)
-        cspace_tf_copy = cspace_tf.copy()
-        cspace_tf_copy['xyzw'] = xyz_wr # put correct white point in param. dict
-        lab_est = colortf(xyz_est, tf = cspace, fwtf = cspace_tf_copy)[:,0,:]
+        lab_est = colortf(xyz_est, tf = cspace, fwtf = rfl_index.cspace_tf)[:,0,:]
         DEi_ab = np.sqrt(((lab_est[:,1:3]-lab[:,1:3])**2).sum(axis=1))
         DEa_ab = DEi_ab.mean()
 
@@ -129,13 +327,115 @@ def xyz_to_rfl(xyz, rfl = None, out = 'rfl_est', \
     else:
         return eval(out)
 
+def _render_colors(rgb_u, spd = None, rfl = None, refspd = None, D = None, cieobs = _CIEOBS,\
+                   cspace = 'ipt', cspace_tf = {}, k_neighbours = 4, verbosity = 0, rfl_index = None):
+    """
+    Estimate reflectances of (unique) srgb values under refspd and calculate 
+    the srgb values of the rendered colors under the test spd (and refspd).
+    
+    Returns:
+        :returns:
+            | rgbti, rgbri, rfl_est
+            | ndarrays with srgb values (range 0-1) under test spd and refspd, 
+              and estimated reflectances (first row wavelengths).
+    """
+    # Get spectral reconstruction index under assumed refspd:
+    if rfl_index is None:
+        rfl_index = get_rfl_index(rfl = rfl, refspd = refspd, cieobs = cieobs, 
+                                  cspace = cspace, cspace_tf = cspace_tf)
+    xyz_wr = rfl_index.xyz_wr
+
+    # Convert rgb_u to xyz values:
+    xyz_ur = colortf(rgb_u, tf = 'srgb>xyz')
+    
+    # Estimate rfl's for xyz_ur:
+    rfl_est, xyzri = xyz_to_rfl(xyz_ur, out = 'rfl_est,xyz_est', D = D, \
+                 k_neighbours = k_neighbours, verbosity = verbosity, \
+                 rfl_index = rfl_index)
+    
+    # Get default test spd if none supplied:
+    if spd is None:
+        spd = _CIE_ILLUMINANTS['F4']
+        
+    # calculate xyz values under test spd:
+    xyzti, xyztw = spd_to_xyz(spd, rfl = rfl_est, cieobs = rfl_index.cieobs, out = 2)
+    
+    # Chromatic adaptation from test spd to refspd:
+    if D is not None:
+        xyzti = cat.apply(xyzti, xyzw1 = xyztw, xyzw2 = xyz_wr, D = D)
+    
+    # Convert xyzti under test spd and xyzri under refspd to srgb:
+    rgbti = (colortf(xyzti, tf = 'srgb')/255).reshape(-1,3)
+    rgbri = (colortf(xyzri, tf = 'srgb')/255).reshape(-1,3)
+    return rgbti, rgbri, rfl_est
+
+def _render_image_tiled(img, tile_size = 256, tile_dir = None, out = 'img_ren,img_ref', **kwargs):
+    """
+    Render image in tiles of :tile_size: rows (see render_image()).
+    
+    | Rendered colors (and estimated reflectances) are cached and reused 
+      across tiles: only colors not encountered in previous tiles are processed.
+    | Output images (float32) are written tile by tile to .npy files in 
+      :tile_dir: (numpy.memmap's are returned), or kept in memory if None.
+    """
+    H, W = img.shape[:2]
+    outs = out.split(',')
+    def alloc(name, shape):
+        if tile_dir is None:
+            return np.empty(shape, dtype = np.float32)
+        else:
+            return np.lib.format.open_memmap(os.path.join(tile_dir, name + '.npy'), mode = 'w+', dtype = np.float32, shape = shape)
+    imgs = dict([(name, None) for name in ['img_ren', 'img_ref', 'img_hyp']])
+    
+    # Initialize cache with rendered colors:
+    keys_c = None 
+    
+    for r0 in range(0, H, tile_size):
+        # Get unique rgb values and positions in tile:
+        tile = img[r0:r0 + tile_size]
+        rgb_u, rgb_indices = unique_colors(tile.reshape(tile.shape[0]*tile.shape[1],3), return_inverse = True)
+        rgb_u = rgb_u*1.0 # *1.0: make float
+        rgb_u[rgb_u==0] = _EPS # avoid division by zero for pure blacks.
+        keys_u = np.ascontiguousarray(rgb_u).view(np.dtype((np.void, rgb_u.itemsize*3))).ravel()
+        
+        # Process colors not yet in cache:
+        is_new = np.ones(keys_u.shape, dtype = bool)
+        if keys_c is not None:
+            pos = np.clip(np.searchsorted(keys_c, keys_u), 0, keys_c.shape[0] - 1)
+            is_new = keys_c[pos] != keys_u
+        if is_new.any():
+            rgbti, rgbri, rfl_est = _render_colors(rgb_u[is_new], **kwargs)
+            if keys_c is None:
+                keys_c, rgbt_c, rgbr_c, rfl_c = keys_u[is_new], rgbti, rgbri, rfl_est[1:]
+            else:
+                keys_c = np.hstack((keys_c, keys_u[is_new]))
+                rgbt_c, rgbr_c = np.vstack((rgbt_c, rgbti)), np.vstack((rgbr_c, rgbri))
+                rfl_c = np.vstack((rfl_c, rfl_est[1:])) if ('img_hyp' in outs) else rfl_c
+            order = np.argsort(keys_c)
+            keys_c, rgbt_c, rgbr_c = keys_c[order], rgbt_c[order], rgbr_c[order]
+            rfl_c = rfl_c[order] if ('img_hyp' in outs) else rfl_c[:0]
+        pos = np.searchsorted(keys_c, keys_u)[rgb_indices]
+        
+        # Reconstruct original locations for rendered image rgbs and write tile:
+        r1 = r0 + tile.shape[0]
+        for name, data in [('img_ren', rgbt_c), ('img_ref', rgbr_c), ('img_hyp', rfl_c)]:
+            if name in outs:
+                if imgs[name] is None:
+                    imgs[name] = alloc(name, (H, W, data.shape[1]))
+                imgs[name][r0:r1] = data[pos].reshape(tile.shape[0], W, data.shape[1])
+                if tile_dir is not None:
+                    imgs[name].flush()
+    
+    return imgs['img_ren'], imgs['img_ref'], imgs['img_hyp']
+
 def render_image(img = None, spd = None, rfl = None, out = 'img_hyp', \
                  refspd = None, D = None, cieobs = _CIEOBS, \
                  cspace = 'ipt', cspace_tf = {},\
                  k_neighbours = 4, show = True,
                  verbosity = 0, show_ref_img = True,\
                  stack_test_ref = 12,\
-                 write_to_file = None):
+                 write_to_file = None, tile_size = None, tile_dir = None,\
+                 rfl_index = None):
     """
     Render image under specified light source spd.
     
@@ -193,6 +493,22 @@ def render_image(img = None, spd = None, rfl = None, out = 'img_hyp', \
             |   - 1: only show/write test
             |   - 2: only show/write ref
             |   - 0: show both, write test
+        :tile_size:
+            | None, optional
+            | If not None: render image in tiles of :tile_size: rows to limit
+              memory use. Rendered colors are cached and reused across tiles.
+        :tile_dir:
+            | None, optional
+            | Only when :tile_size: is not None: directory to which the
+              rendered images ('img_ren.npy', 'img_ref.npy' and 'img_hyp.npy')
+              are written tile by tile (returned as numpy.memmap's).
+              If None: images are kept in memory (float32).
+        :rfl_index:
+            | None, optional
+            | RflIndex (see get_rfl_index()) to use for the color coordinate 
+              to rfl mapping (overrides :rfl:, :refspd:, :cieobs:, :cspace: 
+              and :cspace_tf:). 
+            | If None: an index is built (or taken from the in-memory cache).
 
     Returns:
         :returns: 
@@ -210,55 +526,37 @@ def render_image(img = None, spd = None, rfl = None, out = 'img_hyp', \
         img = plt.imread(_HYPSPCIM_DEFAULT_IMAGE)
     
     
-    # Convert to 2D format:
-    rgb = img.reshape(img.shape[0]*img.shape[1],3)*1.0 # *1.0: make float
-    rgb[rgb==0] = _EPS # avoid division by zero for pure blacks.
-
-    
-    # Get unique rgb values and positions:
-    rgb_u, rgb_indices = np.unique(rgb, return_inverse=True, axis = 0)
-
+    if tile_size is not None:
+        # Render image in tiles (memory-bounded):
+        tile_out = ['img_ren'] + (['img_ref'] if show_ref_img == True else []) + (['img_hyp'] if 'img_hyp' in out.split(',') else [])
+        img_ren, img_ref, img_hyp = _render_image_tiled(img, tile_size = tile_size, tile_dir = tile_dir, out = ','.join(tile_out),\
+                                                        spd = spd, rfl = rfl, refspd = refspd, D = D, cieobs = cieobs, \
+                                                        cspace = cspace, cspace_tf = cspace_tf,\
+                                                        k_neighbours = k_neighbours, verbosity = verbosity,\
+                                                        rfl_index = rfl_index)
         
-    # get Ref spd:
-    if refspd is None:
-        refspd = _CIE_ILLUMINANTS['D65'].copy()
-
-    # Convert rgb_u to xyz and lab-type values under assumed refspd:
-    xyz_wr = spd_to_xyz(refspd, cieobs = cieobs, relative = True)
-    xyz_ur = colortf(rgb_u, tf = 'srgb>xyz')
-    
-    # Estimate rfl's for xyz_ur:
-    rfl_est, xyzri = xyz_to_rfl(xyz_ur, rfl = rfl, out = 'rfl_est,xyz_est', \
-                 refspd = refspd, D = D, cieobs = cieobs, \
-                 cspace = cspace, cspace_tf = cspace_tf,\
-                 k_neighbours = k_neighbours, verbosity = verbosity)
-    
-    
-    
-    # Get default test spd if none supplied:
-    if spd is None:
-        spd = _CIE_ILLUMINANTS['F4']
+    else:
+        # Get unique rgb values and positions:
+        rgb_u, rgb_indices = unique_colors(img.reshape(img.shape[0]*img.shape[1],3), return_inverse = True)
+        rgb_u = rgb_u*1.0 # *1.0: make float
+        rgb_u[rgb_u==0] = _EPS # avoid division by zero for pure blacks.
         
-    # calculate xyz values under test spd:
-    xyzti, xyztw = spd_to_xyz(spd, rfl = rfl_est, cieobs = cieobs, out = 2)
-    
-    # Chromatic adaptation from test spd to refspd:
-    if D is not None:
-        xyzti = cat.apply(xyzti, xyzw1 = xyztw, xyzw2 = xyz_wr, D = D)
-    
-    # Convert xyzti under test spd to srgb:
-    rgbti = colortf(xyzti, tf = 'srgb')/255
-    
-    # Reconstruct original locations for rendered image rgbs:
-    img_ren = rgbti[rgb_indices]
-    img_ren.shape = img.shape # reshape back to 3D size of original
+        # Estimate rfl's for rgb_u and render under test spd and refspd:
+        rgbti, rgb_ref, rfl_est = _render_colors(rgb_u, spd = spd, rfl = rfl, refspd = refspd, D = D, cieobs = cieobs, \
+                                                 cspace = cspace, cspace_tf = cspace_tf,\
+                                                 k_neighbours = k_neighbours, verbosity = verbosity,\
+                                                 rfl_index = rfl_index)
+        
+        # Reconstruct original locations for rendered image rgbs:
+        img_ren = rgbti[rgb_indices]
+        img_ren.shape = img.shape # reshape back to 3D size of original
      
     
     # For output:
     if show_ref_img == True:
-        rgb_ref = colortf(xyzri, tf = 'srgb')/255
-        img_ref = rgb_ref[rgb_indices]
-        img_ref.shape = img.shape # reshape back to 3D size of original
+        if tile_size is None:
+            img_ref = rgb_ref[rgb_indices]
+            img_ref.shape = img.shape # reshape back to 3D size of original
         img_str = 'Rendered (under ref. spd)'
         img = img_ref
     else:
@@ -303,7 +601,7 @@ def render_image(img = None, spd = None, rfl = None, out = 'img_hyp', \
             plt.title(img_str)
             plt.axis('off')
       
-    if 'img_hyp' in out.split(','):
+    if ('img_hyp' in out.split(',')) & (tile_size is None):
         # Create hyper_spectral image:
         rfl_image_2D = rfl_est[rgb_indices+1,:] # create array with all rfls required for each pixel
         img_hyp = rfl_image_2D.reshape(img.shape[0],img.shape[1],rfl_image_2D.shape[1])
@@ -319,6 +617,156 @@ def render_image(img = None, spd = None, rfl = None, out = 'img_hyp', \
         
     
 
+def render_image_batch(img = None, spds = None, rfl = None, out = 'img_ren', \
+                       refspd = None, D = None, cieobs = _CIEOBS, \
+                       cspace = 'ipt', cspace_tf = {},\
+                       k_neighbours = 4, write_to_file = None, \
+                       write_to_dir = None, img_format = 'png', \
+                       rfl_index = None):
+    """
+    Render image under a batch of light source spds.
+    
+    | The reflectances of the (unique) image colors are estimated only once,
+      after which the rendered colors under all spds are calculated 
+      in a single spectral contraction.
+    
+    Args:
+        :img: 
+            | None or str or ndarray with uint8 rgb image.
+            | None load a default image.
+        :spds: 
+            | ndarray, optional
+            | Light source spectra for rendering 
+            | (.shape = (N+1, number of wavelengths))
+            | None defaults to F4.
+        :rfl: 
+            | ndarray, optional
+            | Reflectance set for color coordinate to rfl mapping.
+        :out: 
+            | 'img_ren' or str, optional
+            |  (other options: 'img_ref': rendered image under :refspd:, 
+            |   'img_hyp': hyperspectral image)
+        :refspd:
+            | None, optional
+            | Reference spectrum for color coordinate to rfl mapping.
+            | None defaults to D65 (srgb has a D65 white point)
+        :D: 
+            | None, optional
+            | Degree of (von Kries) adaptation from spds to refspd. 
+            | float or ndarray with one value for each spd in :spds:.
+            | None: no chromatic adaptation.
+        :cieobs:
+            | _CIEOBS, optional
+            | CMF set for calculation of xyz from spectral data.
+        :cspace:
+            | 'ipt',  optional
+            | Color space for color coordinate to rfl mapping.
+        :cspace_tf:
+            | {}, optional
+            | Dict with parameters for xyz_to_cspace and cspace_to_xyz transform.
+        :k_neighbours:
+            | 4 or int, optional
+            | Number of nearest neighbours for reflectance spectrum interpolation.
+            | Neighbours are found using scipy.cKDTree
+        :write_to_file:
+            | None, optional
+            | If not None: write stack of rendered images to this .npy file
+              (float32; a numpy.memmap is returned as img_ren).
+        :write_to_dir:
+            | None, optional
+            | If not None: write rendered images to this directory as 
+              'img_ren_000.<img_format>', 'img_ren_001.<img_format>', ...
+              (and the image rendered under the refspd as 'img_ref.<img_format>')
+        :img_format:
+            | 'png', optional
+            | Image file format for :write_to_dir:.
+        :rfl_index:
+            | None, optional
+            | RflIndex (see get_rfl_index()) to use for the color coordinate 
+              to rfl mapping (overrides :rfl:, :refspd:, :cieobs:, :cspace: 
+              and :cspace_tf:). 
+
+    Returns:
+        :returns: 
+            | img_ren
+            | ndarray with stack of rendered images 
+              (.shape = (N, img.shape[0], img.shape[1], 3))
+    """
+    # Get image:
+    if img is not None:
+        if isinstance(img,str):
+            img = plt.imread(img) # use matplotlib.pyplot's imread
+    else:
+        img = plt.imread(_HYPSPCIM_DEFAULT_IMAGE)
+    outs = out.split(',')
+    
+    # Get unique rgb values and positions:
+    rgb_u, rgb_indices = unique_colors(img.reshape(img.shape[0]*img.shape[1],3), return_inverse = True)
+    rgb_u = rgb_u*1.0 # *1.0: make float
+    rgb_u[rgb_u==0] = _EPS # avoid division by zero for pure blacks.
+    
+    # Estimate rfl's for rgb_u under refspd (once for all spds):
+    if rfl_index is None:
+        rfl_index = get_rfl_index(rfl = rfl, refspd = refspd, cieobs = cieobs, 
+                                  cspace = cspace, cspace_tf = cspace_tf)
+    xyz_wr = rfl_index.xyz_wr
+    xyz_ur = colortf(rgb_u, tf = 'srgb>xyz')
+    rfl_est, xyzri = xyz_to_rfl(xyz_ur, out = 'rfl_est,xyz_est', \
+                                k_neighbours = k_neighbours, rfl_index = rfl_index)
+    
+    # Get default test spd if none supplied:
+    if spds is None:
+        spds = _CIE_ILLUMINANTS['F4']
+    spds = np.atleast_2d(spds)
+    N = spds.shape[0] - 1
+    
+    # Calculate xyz values under all test spds (.shape = (Nu, N, 3)):
+    xyzti, xyztw = spd_to_xyz(spds, rfl = rfl_est, cieobs = rfl_index.cieobs, out = 2)
+    
+    # Chromatic adaptation from test spds to refspd:
+    if D is not None:
+        D = np.atleast_1d(D)
+        if D.size == 1:
+            xyzti = cat.apply(xyzti, xyzw1 = xyztw, xyzw2 = xyz_wr, D = D[0])
+        else:
+            for i in range(N):
+                xyzti[:,i:i+1,:] = cat.apply(xyzti[:,i:i+1,:], xyzw1 = xyztw[i:i+1], xyzw2 = xyz_wr, D = D[i])
+    
+    # Convert to srgb (.shape = (N, Nu, 3)):
+    rgbti = np.transpose(colortf(xyzti, tf = 'srgb')/255, axes = (1,0,2))
+    
+    # Reconstruct original locations for rendered image rgbs:
+    if write_to_file is not None:
+        img_ren = np.lib.format.open_memmap(write_to_file, mode = 'w+', dtype = np.float32, shape = (N,) + img.shape)
+    else:
+        img_ren = np.empty((N,) + img.shape)
+    for i in range(N):
+        img_ren[i] = rgbti[i][rgb_indices].reshape(img.shape)
+    if write_to_file is not None:
+        img_ren.flush()
+    
+    if ('img_ref' in outs) | (write_to_dir is not None):
+        img_ref = (colortf(xyzri, tf = 'srgb')/255).reshape(-1,3)[rgb_indices].reshape(img.shape)
+        
+    if write_to_dir is not None:
+        to_uint8 = lambda x: (np.clip(x, 0, 1)*255).round().astype(np.uint8)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for i in range(N):
+                skimsave(os.path.join(write_to_dir, 'img_ren_{:03d}.{}'.format(i, img_format)), to_uint8(img_ren[i]))
+            skimsave(os.path.join(write_to_dir, 'img_ref.{}'.format(img_format)), to_uint8(img_ref))
+    
+    if 'img_hyp' in outs:
+        # Create hyper_spectral image:
+        img_hyp = rfl_est[rgb_indices+1,:].reshape(img.shape[0],img.shape[1],rfl_est.shape[1])
+
+    # Setup output:
+    if out == 'img_ren':
+        return img_ren
+    else:
+        return eval(out)
+        
+
 if __name__ == '__main__':
     plt.close('all')
     S = spb.spd_builder(peakwl = [460,525,590],fwhm=[20,40,20],target=4000, tar_type = 'cct') 
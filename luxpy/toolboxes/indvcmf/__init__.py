@@ -48,6 +48,10 @@ Module for Individual Observer lms-CMFs (Asano, 2016)
                       color matching functions (cone fundamentals) for a
                       certain age and field size.
 
+ :iterMonteCarloObs(): Generator of Monte-Carlo generated individual observer
+                       color matching functions (cone fundamentals) in chunks
+                       of observers.
+
  :getCatObs(): Generate cone fundamentals for categorical observers.
 
  :get_lms_to_xyz_matrix(): Calculate lms to xyz conversion matrix for a 
@@ -56,6 +60,11 @@ Module for Individual Observer lms-CMFs (Asano, 2016)
  :lmsb_to_xyzb(): Convert from LMS cone fundamentals to XYZ CMF.
 
  :add_to_cmf_dict(): Add set of cmfs to _CMF dict.
+
+ :observer_metamerism_stats(): Calculate (streaming) observer metamerism 
+                               statistics of chromaticity and color difference
+                               for a block of spectra over a population of 
+                               observers.
  
 
 
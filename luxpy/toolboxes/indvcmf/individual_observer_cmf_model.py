@@ -32,6 +32,10 @@ Module for Individual Observer lms-CMFs (Asano, 2016)
                       color matching functions (cone fundamentals) for a
                       certain age and field size.
 
+ :iterMonteCarloObs(): Generator of Monte-Carlo generated individual observer
+                       color matching functions (cone fundamentals) in chunks
+                       of observers.
+
  :getCatObs(): Generate cone fundamentals for categorical observers.
 
  :get_lms_to_xyz_matrix(): Calculate lms to xyz conversion matrix for a 
@@ -40,6 +44,11 @@ Module for Individual Observer lms-CMFs (Asano, 2016)
  :lmsb_to_xyzb(): Convert from LMS cone fundamentals to XYZ CMF.
 
  :add_to_cmf_dict(): Add set of cmfs to _CMF dict.
+
+ :observer_metamerism_stats(): Calculate (streaming) observer metamerism 
+                               statistics of chromaticity and color difference
+                               for a block of spectra over a population of 
+                               observers.
  
 
 
@@ -72,12 +81,13 @@ https://www.rit.edu/cos/colorscience/re_AsanoObserverFunctions.php
 
 .. codeauthor:: Kevin A.G. Smet (ksmet1977 at gmail.com)
 """
-from luxpy import np, pd, interpolate, math, _PKG_PATH, _SEP, _CMF, dictkv,  xyzbar, spd, getdata, getwlr
+from luxpy import (np, pd, interpolate, math, _PKG_PATH, _SEP, _CMF, dictkv,  xyzbar, spd, getdata, getwlr, getwld,
+                   xyz_to_Yxy, xyz_to_Yuv, xyz_to_lab)
 
 from luxpy import plt
 
 __all__ = ['_INDVCMF_DATA_PATH','_INDVCMF_DATA','_INDVCMF_STD_DEV_ALL_PARAM','_INDVCMF_CATOBSPFCTR', '_INDVCMF_M_2d', '_INDVCMF_M_10d']
-__all__ +=['cie2006cmfsEx','getMonteCarloParam','genMonteCarloObs','getCatObs']
+__all__ +=['cie2006cmfsEx','getMonteCarloParam','genMonteCarloObs','iterMonteCarloObs','getCatObs','observer_metamerism_stats']
 
 
 _INDVCMF_DATA_PATH = _PKG_PATH + _SEP + 'toolboxes' + _SEP + 'indvcmf' + _SEP + 'data' + _SEP  
@@ -138,6 +148,49 @@ _INDVCMF_M_10d = np.array([[0.4499, -0.2630, 0.0460],
 _WL_CRIT = 620 # Asano: 620 nm: wavelenght at which interpolation fails for S-cones
 _WL = getwlr([390,780,5]) # wavelength range of specrtal data in _INDVCMF_DATA
 
+# Caches with grid-specific base tables and categorical observer cmfs:
+_INDVCMF_CACHE = {'LMSa_splines' : None, 'wl_interp' : {}, 'catobs' : {}}
+
+def _get_LMSa_splines():
+    """
+    Get (cached) cubic splines through the (unshifted) LMSa data.
+    """
+    if _INDVCMF_CACHE['LMSa_splines'] is None:
+        _INDVCMF_CACHE['LMSa_splines'] = [interpolate.make_interp_spline(_WL, _INDVCMF_DATA['LMSa'][i], k = 3) for i in range(3)]
+    return _INDVCMF_CACHE['LMSa_splines']
+
+def _get_wl_interp_matrix(wl):
+    """
+    Get (cached) matrix for cubic interpolation (and CIE-conform 
+    extrapolation) of spectral data on _WL to wavelengths wl 
+    (.shape = (number of wavelengths in wl, number of wavelengths in _WL)).
+    Returns None when wl equals _WL.
+    """
+    if np.array_equal(wl, _WL):
+        return None
+    key = np.asarray(wl, dtype = float).tobytes()
+    if key not in _INDVCMF_CACHE['wl_interp']:
+        # (cubic spline interpolation is linear in the data):
+        W = interpolate.make_interp_spline(_WL, np.eye(_WL.shape[0]), k = 3, axis = 0)(wl)
+        
+        #extrapolate by replicating closest known (in source data!) value (conform CIE2004 recommendation) 
+        W[wl < _WL[0]] = np.eye(_WL.shape[0])[0]
+        W[wl > _WL[-1]] = np.eye(_WL.shape[0])[-1]
+        _INDVCMF_CACHE['wl_interp'][key] = W
+    return _INDVCMF_CACHE['wl_interp'][key]
+
+def _interp_to_wl(data, wl):
+    """
+    Cubic interpolation of data (.shape = (..., number of wavelengths in _WL))
+    to wavelengths wl (negative values are clipped to zero).
+    """
+    W = _get_wl_interp_matrix(wl)
+    if W is None:
+        return data
+    data = np.dot(data, W.T)
+    data[data < 0] = 0
+    return data
+
 def cie2006cmfsEx(age = 32,fieldsize = 10, wl = None,\
                   var_od_lens = 0, var_od_macula = 0, \
                   var_od_L = 0, var_od_M = 0, var_od_S = 0,\
@@ -223,55 +276,120 @@ def cie2006cmfsEx(age = 32,fieldsize = 10, wl = None,\
          4. `Asano's Individual Colorimetric Observer Model 
          <https://www.rit.edu/cos/colorscience/re_AsanoObserverFunctions.php>`_
     """
+    # Area-normalized cone fundamentals on _WL (and extra output):
+    LMS, trans_lens, trans_macula, sens_photopig = _cie2006cmfsEx_batch(age = age, fieldsize = fieldsize, wl = None,\
+                                                                        var_od_lens = var_od_lens, var_od_macula = var_od_macula,\
+                                                                        var_od_L = var_od_L, var_od_M = var_od_M, var_od_S = var_od_S,\
+                                                                        var_shft_L = var_shft_L, var_shft_M = var_shft_M, var_shft_S = var_shft_S,\
+                                                                        out = 'LMS,trans_lens,trans_macula,sens_photopig')
+    LMS, sens_photopig = LMS[0], sens_photopig[0]
+    LMSa = _INDVCMF_DATA['LMSa'] 
+
+    # Add wavelengths:
+    LMS = np.vstack((_WL,LMS))
+    
+    if ('xyz' in out.lower().split(',')):
+        LMS = lmsb_to_xyzb(LMS, fieldsize, out = 'xyz', allow_negative_values = allow_negative_values)
+        out = out.replace('xyz','LMS').replace('XYZ','LMS')
+    if ('lms' in out.lower().split(',')):
+        out = out.replace('lms','LMS')
+   
+    # Interpolate/extrapolate (using cached interpolation matrix):
+    if wl is not None:
+        wl = getwlr(wl)
+        LMS = np.vstack((wl, _interp_to_wl(LMS[1:], wl)))
+    LMS = spd(LMS, interpolation = None, norm_type = 'area')
+    
+    if (out == 'LMS'):
+        return LMS
+    elif (out == 'LMS,trans_lens,trans_macula,sens_photopig'):
+        return LMS,trans_lens, trans_macula, sens_photopig
+    elif (out == 'LMS,trans_lens,trans_macula,sens_photopig,LMSa'):
+        return LMS, trans_lens, trans_macula, sens_photopig, LMSa
+    else:
+        return eval(out)
+
+def _cie2006cmfsEx_batch(age = 32, fieldsize = 10, wl = None,\
+                         var_od_lens = 0, var_od_macula = 0, \
+                         var_od_L = 0, var_od_M = 0, var_od_S = 0,\
+                         var_shft_L = 0, var_shft_M = 0, var_shft_S = 0,\
+                         out = 'LMS'):
+    """
+    Generate area-normalized individual observer cone fundamentals for a 
+    batch of observers at once (vectorized version of cie2006cmfsEx()).
+    
+    | The peak wavelength shifts are applied by evaluating a single cubic 
+      spline (per cone type) of the unshifted data at the shifted wavelengths.
+    
+    Args:
+        :age, var_od_lens, ..., var_shft_S: 
+            | float or ndarray with one value per observer 
+              (.shape = (n_obs,)), see cie2006cmfsEx().
+        :fieldsize:
+            | 10, optional
+            | Field size of stimulus in degrees (between 2° and 10°).
+        :wl: 
+            | None, optional
+            | Interpolation/extraplation of :LMS: output to specified wavelengths.
+            | None: output original _WL = np.array([390,780,5])
+        :out: 
+            | 'LMS' or str, optional
+            | Determines output (e.g. 'LMS,trans_lens,trans_macula,sens_photopig').
+            
+    Returns:
+        :LMS:
+            | ndarray with area-normalized cone fundamentals 
+              (.shape = (n_obs, 3, number of wavelengths); 
+              no wavelengths added).
+            
+            | [- 'trans_lens': ndarray with lens transmission 
+            |      (.shape = (n_obs, number of wavelengths in _WL))
+            |  - 'trans_macula': ndarray with macula transmission 
+            |      (.shape = (n_obs, number of wavelengths in _WL))
+            |  - 'sens_photopig' : ndarray with photopigment sens. 
+            |      (.shape = (n_obs, 3, number of wavelengths in _WL))]
+    """
     fs = fieldsize
-    rmd = _INDVCMF_DATA['rmd'].copy() 
-    LMSa = _INDVCMF_DATA['LMSa'].copy() 
-    docul = _INDVCMF_DATA['docul'].copy() 
+    (age, var_od_lens, var_od_macula, var_od_L, var_od_M, var_od_S, 
+     var_shft_L, var_shft_M, var_shft_S) = np.broadcast_arrays(*[np.atleast_1d(np.asarray(x, dtype = float)) for x in 
+                                                                 (age, var_od_lens, var_od_macula, 
+                                                                  var_od_L, var_od_M, var_od_S, 
+                                                                  var_shft_L, var_shft_M, var_shft_S)])
+    rmd = _INDVCMF_DATA['rmd'] 
+    LMSa = _INDVCMF_DATA['LMSa']
+    docul = _INDVCMF_DATA['docul'] 
     
     # field size corrected macular density:
     pkOd_Macula = 0.485*np.exp(-fs/6.132) * (1 + var_od_macula/100) # varied peak optical density of macula
-    corrected_rmd = rmd*pkOd_Macula
+    corrected_rmd = rmd*pkOd_Macula[:,None]
     
     # age corrected lens/ocular media density: 
-    if (age <= 60):
-        correct_lomd = docul[:1] * (1 + 0.02*(age-32)) + docul[1:2]
-    else:
-        correct_lomd = docul[:1] * (1.56 + 0.0667*(age-60)) + docul[1:2]
-    correct_lomd = correct_lomd * (1 + var_od_lens/100) # varied overall optical density of lens
-    
-    # Peak Wavelength Shift:
-    wl_shifted = np.empty(LMSa.shape)
-    wl_shifted[0] = _WL + var_shft_L 
-    wl_shifted[1] = _WL + var_shft_M 
-    wl_shifted[2] = _WL + var_shft_S 
+    age_f = np.where(age <= 60, 1 + 0.02*(age-32), 1.56 + 0.0667*(age-60))
+    correct_lomd = docul[:1] * age_f[:,None] + docul[1:2]
+    correct_lomd = correct_lomd * (1 + var_od_lens/100)[:,None] # varied overall optical density of lens
     
-    LMSa_shft = np.empty(LMSa.shape)
-    kind = 'cubic'
-    LMSa_shft[0] = interpolate.interp1d(wl_shifted[0],LMSa[0], kind = kind, bounds_error = False, fill_value = "extrapolate")(_WL)
-    LMSa_shft[1] = interpolate.interp1d(wl_shifted[1],LMSa[1], kind = kind, bounds_error = False, fill_value = "extrapolate")(_WL)
-    LMSa_shft[2] = interpolate.interp1d(wl_shifted[2],LMSa[2], kind = kind, bounds_error = False, fill_value = "extrapolate")(_WL)
-#    LMSa[2,np.where(_WL >= _WL_CRIT)] = 0 #np.nan # Not defined above 620nm
-#    LMSa_shft[2,np.where(_WL >= _WL_CRIT)] = 0
-    
-    ssw = np.hstack((0,np.sign(np.diff(LMSa_shft[2,:])))) #detect poor interpolation (sign switch due to instability)
-    LMSa_shft[2,np.where((ssw >= 0) & (_WL > 560))] = np.nan
+    # Peak Wavelength Shift (spline through (_WL + shft, LMSa) evaluated 
+    # at _WL equals spline through (_WL, LMSa) evaluated at _WL - shft):
+    LMSa_splines = _get_LMSa_splines()
+    LMSa_shft = np.empty((age.shape[0],) + LMSa.shape)
+    for i, shft in enumerate((var_shft_L, var_shft_M, var_shft_S)):
+        LMSa_shft[:,i,:] = LMSa_splines[i](_WL[None,:] - shft[:,None])
     
+    ssw = np.sign(np.diff(LMSa_shft[:,2,:], axis = 1)) #detect poor interpolation (sign switch due to instability)
+    ssw = np.hstack((np.zeros((ssw.shape[0],1)), ssw))
+    LMSa_shft[:,2,:][(ssw >= 0) & (_WL > 560)] = np.nan
     
     # corrected LMS (no age correction):
-    pkOd_L = (0.38 + 0.54*np.exp(-fs/1.333)) * (1 + var_od_L/100) # varied peak optical density of L-cone
-    pkOd_M = (0.38 + 0.54*np.exp(-fs/1.333)) * (1 + var_od_M/100) # varied peak optical density of M-cone
-    pkOd_S = (0.30 + 0.45*np.exp(-fs/1.333)) * (1 + var_od_S/100) # varied peak optical density of S-cone
-    
-    alpha_lms = 0. * LMSa_shft
-    alpha_lms[0] = 1 - 10**(-pkOd_L*(10**LMSa_shft[0]))
-    alpha_lms[1] = 1 - 10**(-pkOd_M*(10**LMSa_shft[1]))
-    alpha_lms[2] = 1 - 10**(-pkOd_S*(10**LMSa_shft[2]))
+    pkOd_LMS = np.vstack(((0.38 + 0.54*np.exp(-fs/1.333)) * (1 + var_od_L/100), # varied peak optical density of L-cone
+                          (0.38 + 0.54*np.exp(-fs/1.333)) * (1 + var_od_M/100), # varied peak optical density of M-cone
+                          (0.30 + 0.45*np.exp(-fs/1.333)) * (1 + var_od_S/100))).T # varied peak optical density of S-cone
+    alpha_lms = 1 - 10**(-pkOd_LMS[:,:,None]*(10**LMSa_shft))
     
     # this fix is required because the above math fails for alpha_lms[2,:]==0
-    alpha_lms[2,np.where(_WL >= _WL_CRIT)] = 0 
+    alpha_lms[:,2,_WL >= _WL_CRIT] = 0 
     
     # Corrected to Corneal Incidence:
-    lms_barq = alpha_lms * (10**(-corrected_rmd - correct_lomd))*np.ones(alpha_lms.shape)
+    lms_barq = alpha_lms * (10**(-corrected_rmd - correct_lomd))[:,None,:]
 
     # Corrected to Energy Terms:
     lms_bar = lms_barq * _WL
@@ -280,37 +398,22 @@ def cie2006cmfsEx(age = 32,fieldsize = 10, wl = None,\
     lms_bar[np.isnan(lms_bar)] = 0
     
     # normalized:
-    LMS = 100 * lms_bar / np.nansum(lms_bar, axis = 1, keepdims = True)
-
+    LMS = 100 * lms_bar / np.nansum(lms_bar, axis = 2, keepdims = True)
     
-    # Output extra:
-    trans_lens = 10**(-correct_lomd) 
-    trans_macula = 10**(-corrected_rmd) 
-    sens_photopig = alpha_lms * _WL 
-
-    # Add wavelengths:
-    LMS = np.vstack((_WL,LMS))
+    # Interpolate/extrapolate (cfr. cie_interp(..., kind = 'cubic')):
+    wl = _WL if (wl is None) else getwlr(wl)
+    LMS = _interp_to_wl(LMS, wl)
     
-    if ('xyz' in out.lower().split(',')):
-        LMS = lmsb_to_xyzb(LMS, fieldsize, out = 'xyz', allow_negative_values = allow_negative_values)
-        out = out.replace('xyz','LMS').replace('XYZ','LMS')
-    if ('lms' in out.lower().split(',')):
-        out = out.replace('lms','LMS')
-   
-    # Interpolate/extrapolate:
-    if wl is None:
-        interpolation = None
-    else:
-        interpolation = 'cubic'
-    LMS = spd(LMS, wl = wl, interpolation = interpolation, norm_type = 'area')
+    # Area normalization (cfr. spd(..., norm_type = 'area')):
+    LMS = LMS / (np.sum(LMS, axis = 2, keepdims = True)*getwld(wl))
     
-    if (out == 'LMS'):
+    if out == 'LMS':
         return LMS
-    elif (out == 'LMS,trans_lens,trans_macula,sens_photopig'):
-        return LMS,trans_lens, trans_macula, sens_photopig
-    elif (out == 'LMS,trans_lens,trans_macula,sens_photopig,LMSa'):
-        return LMS, trans_lens, trans_macula, sens_photopig, LMSa
     else:
+        # Output extra (no interpolation):
+        trans_lens = 10**(-correct_lomd) 
+        trans_macula = 10**(-corrected_rmd) 
+        sens_photopig = alpha_lms * _WL 
         return eval(out)
 
 def getMonteCarloParam(n_obs = 1, stdDevAllParam = _INDVCMF_STD_DEV_ALL_PARAM.copy()):
@@ -364,7 +467,87 @@ def getUSCensusAgeDist():
 
     return list_Age    
 
-def genMonteCarloObs(n_obs = 1, fieldsize = 10, list_Age = [32], out = 'LMS', wl = None, allow_negative_values = False):
+def _getMonteCarloObsParam(n_obs = 1, list_Age = [32]):
+    """
+    Get random ages and normally-distributed physiological factors for a 
+    population of n_obs observers (see genMonteCarloObs()).
+    """
+    # Get Normally-distributed Physiological Factors:
+    vAll = getMonteCarloParam(n_obs = n_obs) 
+     
+    if list_Age is 'us_census':
+        list_Age = getUSCensusAgeDist()
+    
+    # Generate Random Ages with the same probability density distribution 
+    # as color matching experiment:
+    sz_interval = 1 
+    list_AgeRound = np.round(np.array(list_Age)/sz_interval ) * sz_interval
+    h = math.histogram(list_AgeRound, bins = np.unique(list_AgeRound), bin_center = True)[0]
+    p = h/h.sum() # probability density distribution
+
+    var_age = np.random.choice(np.unique(list_AgeRound), \
+                               size = n_obs, replace = True,\
+                               p = p)
+    return var_age, vAll
+
+def _getMonteCarloObsLMS(var_age, vAll, fieldsize = 10, wl = None):
+    """
+    Get cone fundamentals (.shape = (3, number of wavelengths, n_obs)) for 
+    observers with ages var_age and physiological factors vAll.
+    """
+    LMS = _cie2006cmfsEx_batch(age = var_age, fieldsize = fieldsize, wl = wl,\
+                               var_od_lens = vAll['od_lens'], var_od_macula = vAll['od_macula'], \
+                               var_od_L = vAll['od_L'], var_od_M = vAll['od_M'], var_od_S = vAll['od_S'],\
+                               var_shft_L = vAll['shft_L'], var_shft_M = vAll['shft_M'], var_shft_S = vAll['shft_S'])
+    return np.transpose(LMS, axes = (1,2,0))
+
+def iterMonteCarloObs(n_obs = 1, fieldsize = 10, list_Age = [32], out = 'LMS', wl = None, allow_negative_values = False, chunk_size = 1000):
+    """
+    Generator of Monte-Carlo generated individual observer cone fundamentals 
+    (or cmfs) in chunks of observers.
+    
+    | Only the functions of the current chunk of observers are held in memory,
+      enabling the (streaming) processing of large observer populations.
+    
+    Args: 
+        :n_obs, fieldsize, list_Age, wl, allow_negative_values: 
+            | see genMonteCarloObs()
+        :out: 
+            | 'LMS' or str, optional
+            | Determines output for each chunk (see genMonteCarloObs()).
+        :chunk_size:
+            | 1000, optional
+            | Number of observers in each chunk.
+    
+    Returns:
+        :returns: 
+            | generator yielding for each chunk: LMS [,var_age, vAll] 
+            |   - LMS: ndarray with LMS functions of chunk of observers
+            |          (.shape = (4, number of wavelengths, chunk_size)).
+            |   - var_age: ndarray with observer ages of chunk.
+            |   - vAll: dict with physiological factors of chunk.
+    """
+    # Set requested wavelength range:
+    if wl is not None:
+        wl = getwlr(wl3 = wl)
+    else:
+        wl = _WL
+        
+    listout = out.lower().split(',')
+    for k in range(0, n_obs, chunk_size):
+        n = min(chunk_size, n_obs - k)
+        var_age, vAll = _getMonteCarloObsParam(n_obs = n, list_Age = list_Age)
+        LMS = np.empty((3+1, wl.shape[0], n))
+        LMS[0] = wl[:,None]
+        LMS[1:] = _getMonteCarloObsLMS(var_age, vAll, fieldsize = fieldsize, wl = wl)
+        if ('xyz' in listout):
+            LMS = lmsb_to_xyzb(LMS, fieldsize, out = 'xyz', allow_negative_values = allow_negative_values)
+        if ('var_age' in listout) | ('vall' in listout):
+            yield LMS, var_age, vAll
+        else:
+            yield LMS
+
+def genMonteCarloObs(n_obs = 1, fieldsize = 10, list_Age = [32], out = 'LMS', wl = None, allow_negative_values = False, chunk_size = 10000):
     """
     Monte-Carlo generation of individual observer cone fundamentals.
     
@@ -392,6 +575,10 @@ def genMonteCarloObs(n_obs = 1, fieldsize = 10, list_Age = [32], out = 'LMS', wl
             | Cone fundamentals or color matching functions 
             |   should not have negative values.
             |     If False: X[X<0] = 0.
+        :chunk_size:
+            | 10000, optional
+            | Number of observers for which the cone fundamentals are 
+              calculated at once (vectorized).
     
     Returns:
         :returns: 
@@ -427,43 +614,22 @@ def genMonteCarloObs(n_obs = 1, fieldsize = 10, list_Age = [32], out = 'LMS', wl
     scale_factors = dict(zip(list(stdDevAllParam.keys()), scale_factors))
     stdDevAllParam = {k : v*scale_factors[k] for (k,v) in stdDevAllParam.items()}
 
-    # Get Normally-distributed Physiological Factors:
-    vAll = getMonteCarloParam(n_obs = n_obs) 
-     
-    if list_Age is 'us_census':
-        list_Age = getUSCensusAgeDist()
-    
-    # Generate Random Ages with the same probability density distribution 
-    # as color matching experiment:
-    sz_interval = 1 
-    list_AgeRound = np.round(np.array(list_Age)/sz_interval ) * sz_interval
-    h = math.histogram(list_AgeRound, bins = np.unique(list_AgeRound), bin_center = True)[0]
-    p = h/h.sum() # probability density distribution
-
-    var_age = np.random.choice(np.unique(list_AgeRound), \
-                               size = n_obs, replace = True,\
-                               p = p)
+    # Get Normally-distributed Physiological Factors and Random Ages:
+    var_age, vAll = _getMonteCarloObsParam(n_obs = n_obs, list_Age = list_Age)
     
     # Set requested wavelength range:
     if wl is not None:
         wl = getwlr(wl3 = wl)
     else:
         wl = _WL
-        
+    
+    # Calculate cone fundamentals in chunks of observers: 
     LMS_All = np.nan*np.ones((3+1, wl.shape[0],n_obs))
-    for k in range(n_obs):
-        t_LMS, t_trans_lens, t_trans_macula, t_sens_photopig = cie2006cmfsEx(age = var_age[k], fieldsize = fieldsize, wl = wl,\
-                                                                          var_od_lens = vAll['od_lens'][k], var_od_macula = vAll['od_macula'][k], \
-                                                                          var_od_L = vAll['od_L'][k], var_od_M = vAll['od_M'][k], var_od_S = vAll['od_S'][k],\
-                                                                          var_shft_L = vAll['shft_L'][k], var_shft_M = vAll['shft_M'][k], var_shft_S = vAll['shft_S'][k],\
-                                                                          out = 'LMS,trans_lens,trans_macula,sens_photopig')                                    
-        LMS_All[:,:,k] = t_LMS
-        
-#        listout = out.split(',')
-#        if ('trans_lens' in listout) | ('trans_macula' in listout) | ('trans_photopig' in listout):
-#            trans_lens[:,k] = t_trans_lens
-#            trans_macula[:,k] = t_trans_macula 
-#            sens_photopig[:,:,k] = t_sens_photopig 
+    LMS_All[0] = wl[:,None]
+    for k in range(0, n_obs, chunk_size):
+        LMS_All[1:,:,k:k + chunk_size] = _getMonteCarloObsLMS(var_age[k:k + chunk_size], \
+                                                              dict([(key, v[k:k + chunk_size]) for (key,v) in vAll.items()]),\
+                                                              fieldsize = fieldsize, wl = wl)
 
     if n_obs == 1:
         LMS_All = np.squeeze(LMS_All, axis = 2)
@@ -546,29 +712,27 @@ def getCatObs(n_cat = 10, fieldsize = 2, out = 'LMS', wl = None, allow_negative_
         wl = getwlr(wl3 = wl)
     else:
         wl = _WL
-
-    LMS_All = np.nan*np.ones((3+1,_WL.shape[0],n_cat)) 
-    for k in range(n_cat):
-        t_LMS = cie2006cmfsEx(age = var_age[k],fieldsize = fieldsize, wl = wl,\
-                              var_od_lens = vAll['od_lens'][k],\
-                              var_od_macula = vAll['od_macula'][k],\
-                              var_od_L = vAll['od_L'][k],\
-                              var_od_M = vAll['od_M'][k],\
-                              var_od_S = vAll['od_S'][k],\
-                              var_shft_L = vAll['shft_L'][k],\
-                              var_shft_M = vAll['shft_M'][k],\
-                              var_shft_S = vAll['shft_S'][k],\
-                              out = 'LMS')
-        
-        LMS_All[:,:,k] = t_LMS 
     
-    LMS_All[np.where(LMS_All < 0)] = 0
-    
-    if n_cat == 1:
-        LMS_All = np.squeeze(LMS_All, axis = 2)
+    # Get cmfs from cache (or calculate and cache them):
+    is_xyz = ('xyz' in out.lower().split(','))
+    key = (n_cat, fieldsize, wl.tobytes(), is_xyz, allow_negative_values)
+    if key not in _INDVCMF_CACHE['catobs']:
+        LMS_All = np.nan*np.ones((3+1,wl.shape[0],n_cat)) 
+        LMS_All[0] = wl[:,None]
+        LMS_All[1:] = _getMonteCarloObsLMS(var_age[:n_cat], dict([(k, v[:n_cat]) for (k,v) in vAll.items()]), \
+                                           fieldsize = fieldsize, wl = wl)
+        
+        LMS_All[np.where(LMS_All < 0)] = 0
+        
+        if n_cat == 1:
+            LMS_All = np.squeeze(LMS_All, axis = 2)
+        
+        if is_xyz:
+            LMS_All = lmsb_to_xyzb(LMS_All, fieldsize, out = 'xyz', allow_negative_values = allow_negative_values)
+        _INDVCMF_CACHE['catobs'][key] = LMS_All
+    LMS_All = _INDVCMF_CACHE['catobs'][key].copy()
 	
-    if ('xyz' in out.lower().split(',')):
-        LMS_All = lmsb_to_xyzb(LMS_All, fieldsize, out = 'xyz', allow_negative_values = allow_negative_values)
+    if is_xyz:
         out = out.replace('xyz','LMS').replace('XYZ','LMS')
     if ('lms' in out.lower().split(',')):
         out = out.replace('lms','LMS')
@@ -671,6 +835,182 @@ def add_to_cmf_dict(bar = None, cieobs = 'indv', K = 683, M = np.eye(3)):
     #return _CMF
     
     
+#------------------------------------------------------------------------------
+class _OnlineStats():
+    """
+    Online (streaming) accumulator of mean, covariance, min, max and 
+    (reservoir-sampled) percentiles of samples of shape (..., d).
+    """
+    def __init__(self, percentiles = [5,50,95], reservoir_size = 10000, seed = None):
+        self.percentiles = percentiles
+        self.reservoir_size = reservoir_size
+        self.rng = np.random.RandomState(seed)
+        self.n = 0
+        self.mean = None
+        
+    def update(self, X):
+        """
+        Update statistics with chunk of samples X (.shape = (n, ..., d)).
+        """
+        X = np.asarray(X, dtype = float)
+        n_b = X.shape[0]
+        if n_b == 0:
+            return self
+        mean_b = X.mean(axis = 0)
+        dX = X - mean_b
+        M2_b = np.einsum('n...i,n...j->...ij', dX, dX)
+        if self.n == 0:
+            self.mean, self.M2 = mean_b, M2_b
+            self.min, self.max = X.min(axis = 0), X.max(axis = 0)
+            self.reservoir = np.empty((self.reservoir_size,) + X.shape[1:])
+        else:
+            # Merge with statistics of previous samples (Chan et al.):
+            n = self.n + n_b
+            delta = mean_b - self.mean
+            self.mean = self.mean + delta*n_b/n
+            self.M2 = self.M2 + M2_b + delta[...,:,None]*delta[...,None,:]*self.n*n_b/n
+            self.min, self.max = np.minimum(self.min, X.min(axis = 0)), np.maximum(self.max, X.max(axis = 0))
+        
+        # Reservoir sampling (for percentiles):
+        t = self.n + np.arange(n_b) # sample indices
+        fill = t < self.reservoir_size
+        self.reservoir[t[fill]] = X[fill]
+        j = (self.rng.rand((~fill).sum())*(t[~fill] + 1)).astype(int)
+        keep = j < self.reservoir_size
+        self.reservoir[j[keep]] = X[~fill][keep]
+        
+        self.n += n_b
+        return self
+        
+    def get(self):
+        """
+        Get dict with statistics.
+        """
+        cov = self.M2/(self.n - 1) if self.n > 1 else self.M2*np.nan
+        std = np.sqrt(np.diagonal(cov, axis1 = -2, axis2 = -1))
+        prctl = np.percentile(self.reservoir[:min(self.n, self.reservoir_size)], self.percentiles, axis = 0)
+        return {'n' : self.n, 'mean' : self.mean, 'cov' : cov, 'std' : std, 
+                'min' : self.min, 'max' : self.max, 'percentiles' : prctl}
+
+def observer_metamerism_stats(spds, pairs = None, white = None, obs = None, \
+                              n_obs = 1000, chunk_size = 1000, \
+                              fieldsize = 10, list_Age = [32], \
+                              xyzbar_ref = None, cspace = 'Yuv', \
+                              percentiles = [5,50,95], reservoir_size = 10000, \
+                              seed = None):
+    """
+    Calculate observer metamerism statistics of chromaticity and color 
+    difference for a block of spectra by streaming them through a 
+    population of (Monte-Carlo generated) individual observers.
+    
+    | Observer cmfs are processed in chunks: the statistics (mean, covariance, 
+      min, max and percentiles) are accumulated online, so neither the cmfs 
+      of all observers nor all results are held in memory at once.
+    | Percentiles are estimated from a random sample (reservoir) 
+      of at most :reservoir_size: observers.
+    
+    Args:
+        :spds:
+            | ndarray with spectra (e.g. display primaries or metameric pairs)
+            | (.shape = (N+1, number of wavelengths))
+        :pairs:
+            | None or list of (i,j) index tuples, optional
+            | If not None: calculate for each observer the color difference 
+              between spectra i and j in :spds: (e.g. metameric pairs).
+            | If None: calculate the color difference of each spectrum as 
+              seen by each observer and by the reference observer.
+        :white:
+            | None or ndarray with spectrum, optional
+            | White (on the wavelengths of :spds:) for relative colorimetry 
+              (Yw = 100) and CIELAB calculations.
+            | None: equal-energy white.
+        :obs:
+            | None or iterable, optional
+            | Iterable (e.g. generator) of chunks of observer xyz cmfs 
+              on the wavelengths of :spds: (.shape = (4, number of wavelengths, 
+              number of observers in chunk)).
+            | None: generate :n_obs: observers with iterMonteCarloObs().
+        :n_obs:
+            | 1000, optional
+            | Number of observers to generate (only when :obs: is None).
+        :chunk_size:
+            | 1000, optional
+            | Number of observers in a chunk (only when :obs: is None).
+        :fieldsize, list_Age:
+            | 10, [32], optional
+            | see genMonteCarloObs().
+        :xyzbar_ref:
+            | None or ndarray, optional
+            | CMFs of the reference observer (on the wavelengths of :spds:).
+            | None: CIE 2006 xyz cmfs (age 32) for :fieldsize: 
+              (see cie2006cmfsEx()).
+        :cspace:
+            | 'Yuv' or 'Yxy', optional
+            | Chromaticity diagram for the chromaticity statistics.
+        :percentiles:
+            | [5,50,95], optional
+            | Percentiles to calculate.
+        :reservoir_size:
+            | 10000, optional
+            | Maximum number of observer results stored for percentiles.
+        :seed:
+            | None or int, optional
+            | Seed for the random reservoir sampling.
+            
+    Returns:
+        :stats:
+            | dict with keys:
+            |   - 'n_obs': number of observers
+            |   - 'xyz_ref': relative tristimulus values of :spds: for the 
+            |                reference observer (.shape = (N,3))
+            |   - 'chrom': dict with statistics ('mean', 'cov', 'std', 'min', 
+            |              'max', 'percentiles') of the chromaticity coordinates
+            |              (.shape of 'mean' = (N,2))
+            |   - 'DEab': dict with statistics ('mean', 'std', 'min', 'max', 
+            |             'percentiles') of the CIELAB color differences
+            |             (.shape of 'mean' = (number of pairs or N,))
+    """
+    spds = np.atleast_2d(spds)
+    wl = spds[0]
+    if white is None:
+        white = np.ones(wl.shape)
+    if pairs is not None:
+        pairs = np.atleast_2d(pairs)
+    if obs is None:
+        obs = iterMonteCarloObs(n_obs = n_obs, fieldsize = fieldsize, list_Age = list_Age, out = 'xyz', wl = wl, chunk_size = chunk_size)
+    xyz_to_chrom = xyz_to_Yxy if (cspace == 'Yxy') else xyz_to_Yuv
+    
+    def get_xyz(bar):
+        # Relative tristimulus values of spds and white (.shape = (Nobs,N,3), (Nobs,1,3)):
+        xyz = np.einsum('sw,cwn->nsc', spds[1:], bar[1:])
+        xyzw = np.einsum('w,cwn->nc', white, bar[1:])[:,None,:]
+        return 100*xyz/xyzw[...,1:2], 100*xyzw/xyzw[...,1:2]
+    
+    # Reference observer:
+    if xyzbar_ref is None:
+        xyzbar_ref = cie2006cmfsEx(fieldsize = fieldsize, wl = wl, out = 'xyz')
+    xyz_ref, xyzw_ref = get_xyz(xyzbar_ref[...,None])
+    lab_ref = xyz_to_lab(xyz_ref, xyzw = xyzw_ref)
+    
+    # Stream observer chunks through the spectra and accumulate statistics:
+    stats_chrom = _OnlineStats(percentiles = percentiles, reservoir_size = reservoir_size, seed = seed)
+    stats_DE = _OnlineStats(percentiles = percentiles, reservoir_size = reservoir_size, seed = seed)
+    for bar in obs:
+        xyz, xyzw = get_xyz(bar)
+        stats_chrom.update(xyz_to_chrom(xyz)[...,1:])
+        lab = xyz_to_lab(xyz, xyzw = xyzw)
+        if pairs is not None:
+            DE = np.sqrt(((lab[:,pairs[:,0]] - lab[:,pairs[:,1]])**2).sum(axis = -1))
+        else:
+            DE = np.sqrt(((lab - lab_ref)**2).sum(axis = -1))
+        stats_DE.update(DE[...,None])
+    
+    stats = {'n_obs' : stats_chrom.n, 'xyz_ref' : xyz_ref[0], 'chrom' : stats_chrom.get()}
+    stats_DE = stats_DE.get()
+    stats['DEab'] = dict([(k, stats_DE[k][...,0]) for k in ('mean', 'std', 'min', 'max', 'percentiles')])
+    return stats
+    
+
 if __name__ == '__main__':
     
     outcmf = 'lms'
@@ -21,6 +21,20 @@ Module for reading and writing IES and LDT files.
 
  :read_lamp_data: Read in light intensity distribution and other lamp data from LDT or IES files.
 
+ :read_lamp_data_dir: Read in all LDT and IES files in a directory (tree) into a single table.
+
+ :LidStore: Binary (memory-mapped) store of parsed LDT and IES files.
+
+ :set_lid_store: Set default LidStore used by read_lamp_data().
+
+ :get_lid_grid: Get sorted, periodic (C, gamma) grid with (absolute) luminous intensities of a LID.
+
+ :interpolate_lid: Interpolate luminous intensities of a LID at arbitrary (C, gamma) directions.
+
+ :lid_illuminance: Calculate (point-by-point) illuminances on (large) grids of points for one or more luminaires.
+
+ :lid_zonal_lumens: Calculate zonal lumen summary of a LID.
+
     Notes:
         1.Only basic support. Writing is not yet implemented.
         2.Reading IES files is based on Blender's ies2cycles.py
@@ -31,3 +45,6 @@ Module for reading and writing IES and LDT files.
 """
 from .io_lid_files import *
 __all__ = io_lid_files.__all__
+
+from .lid_photometry import *
+__all__ += lid_photometry.__all__
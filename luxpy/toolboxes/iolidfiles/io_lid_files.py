@@ -21,6 +21,12 @@ Module for reading / writing LID data from IES and LDT files.
 
  :read_lamp_data: Read in light intensity distribution and other lamp data from LDT or IES files.
 
+ :read_lamp_data_dir: Read in all LDT and IES files in a directory (tree) into a single table.
+
+ :LidStore: Binary (memory-mapped) store of parsed LDT and IES files.
+
+ :set_lid_store: Set default LidStore used by read_lamp_data().
+
     Notes:
         1.Only basic support. Writing is not yet implemented.
         2.Reading IES files is based on Blender's ies2cycles.py
@@ -30,12 +36,19 @@ Module for reading / writing LID data from IES and LDT files.
 .. codeauthor:: Kevin A.G. Smet (ksmet1977 at gmail.com)
 """
 import os
+import pickle
+import hashlib
+import collections
 import numpy as np
+import pandas as pd
+from luxpy import parallel_map
 
-__all__ =['read_lamp_data']
+__all__ =['read_lamp_data','read_lamp_data_dir','LidStore','set_lid_store']
 
+_LID_STORE = {'default' : None, 'open' : {}} # default and opened LidStores
 
-def read_lamp_data(filename, multiplier = 1.0, verbosity = 0, normalize = 'I0', only_common_keys = False):
+
+def read_lamp_data(filename, multiplier = 1.0, verbosity = 0, normalize = 'I0', only_common_keys = False, store = None):
     """
     Read in light intensity distribution and other lamp data from LDT or IES files.
     
@@ -58,6 +71,15 @@ def read_lamp_data(filename, multiplier = 1.0, verbosity = 0, normalize = 'I0',
             | and such of LID.
             | read_lid_lamp_data(?) for print of common keys and return
             |                       empty dict with common keys.
+        :store:
+            | None, optional
+            | LidStore (or path to one) to get the (parsed) file data from.
+            | If the file is not in the store or its content has changed, 
+            | the file is parsed.
+            | None: use default store (see set_lid_store(); none by default).
+            | False: do not use any store.
+            | Arrays obtained from the store are (writable) copies of the 
+              memory-mapped store data (see LidStore.get() for read-only views).
    
     Returns:
         :lid: dict with IES or LDT file data.
@@ -87,8 +109,17 @@ def read_lamp_data(filename, multiplier = 1.0, verbosity = 0, normalize = 'I0',
         print(common_keys)
         return dict(zip(common_keys,[np.nan]*len(common_keys))) 
     
+    # get lid from store:
+    if store is None:
+        store = _LID_STORE['default']
+    lid = None
+    if (store is not None) & (store is not False):
+        lid = _open_lid_store(store).get(filename, multiplier = multiplier, normalize = normalize, copy = True)
+    
     file_ext = filename[-3:].lower()
-    if file_ext == 'ies':
+    if lid is not None:
+        lid['filename'] = filename
+    elif file_ext == 'ies':
         lid = read_IES_lamp_data(filename, multiplier = multiplier, \
                                  verbosity = verbosity, normalize = normalize)
     elif file_ext == 'ldt':
@@ -101,6 +132,443 @@ def read_lamp_data(filename, multiplier = 1.0, verbosity = 0, normalize = 'I0',
     
     return lid
     
+def _find_lamp_data_files(path, exts = ('ies','ldt'), recursive = True):
+    """
+    Get sorted list of files in path (tree) with extensions in exts.
+    """
+    exts = tuple(ext.lower() for ext in exts)
+    filenames = []
+    for root, dirs, files in os.walk(path):
+        filenames += [os.path.join(root, file) for file in files if file[-3:].lower() in exts]
+        if recursive == False:
+            break
+    return sorted(filenames)
+
+def _read_lamp_data_files(filenames, kwargs):
+    """
+    Read in a list of LDT or IES files (worker function of read_lamp_data_dir).
+    
+    Returns a list with (lid, error message) tuples.
+    """
+    lids = []
+    for filename in filenames:
+        try:
+            lid = read_lamp_data(filename, **kwargs)
+            lids.append((lid, None if (lid is not None) else 'unable to read file'))
+        except Exception as e:
+            lids.append((None, '{}: {}'.format(type(e).__name__, e)))
+    return lids
+
+def read_lamp_data_dir(path, exts = ('ies','ldt'), recursive = True, multiplier = 1.0, 
+                       verbosity = 0, normalize = 'I0', only_common_keys = False,
+                       executor = 'process', max_workers = None, chunk_size = 64,
+                       store = None):
+    """
+    Read in all LDT and IES files in a directory (tree) into a single table.
+    
+    Args:
+        :path:
+            | Directory with LDT and/or IES files.
+        :exts:
+            | ('ies','ldt'), optional
+            | File extensions (case insensitive) of files to read.
+        :recursive:
+            | True, optional
+            | If True: also read files in all subdirectories of :path:.
+        :multiplier, verbosity, normalize, only_common_keys:
+            | see read_lamp_data()
+        :executor:
+            | 'process' or None or 'thread' or concurrent.futures.Executor, optional
+            | Executor used to read the files in parallel (see luxpy.parallel_map()).
+            | None: read files serially in the current process.
+        :max_workers:
+            | None or int, optional
+            | Number of workers of a newly created :executor:.
+        :chunk_size:
+            | 64, optional
+            | Number of files read by a worker per task.
+        :store:
+            | None, optional
+            | LidStore (or path to one) to get the (parsed) file data from
+            | (see read_lamp_data()). Workers memory-map the store, so the 
+            | candela arrays are not duplicated across worker processes.
+   
+    Returns:
+        :lids: 
+            | pandas.DataFrame with one row per file (in sorted filename order)
+            | and columns:
+            |   ['filename', 'file_type', 'name', 'lumens_per_lamp', 
+            |    'candela_mult', 'intensity', 'Iv0', 'n_theta', 'n_phi', 
+            |    'lid', 'error']
+            | with 'lid' the dict returned by read_lamp_data() (None for 
+            | files that could not be read, see 'error' for the reason).
+    """
+    filenames = _find_lamp_data_files(path, exts = exts, recursive = recursive)
+    kwargs = {'multiplier' : multiplier, 'verbosity' : verbosity, 
+              'normalize' : normalize, 'only_common_keys' : only_common_keys,
+              'store' : _LID_STORE['default'] if (store is None) else store}
+    chunks = [filenames[i:i + chunk_size] for i in range(0, len(filenames), chunk_size)]
+    lids = parallel_map(_read_lamp_data_files, chunks, [kwargs]*len(chunks), 
+                        executor = executor, max_workers = max_workers)
+    lids = [lid for chunk in lids for lid in chunk]
+    return _lid_table(filenames, lids)
+
+def _lid_table(filenames, lids):
+    """
+    Summarize list of (lid, error message) tuples in a pandas.DataFrame.
+    """
+    columns = ['filename', 'file_type', 'name', 'lumens_per_lamp', 'candela_mult', 
+               'intensity', 'Iv0', 'n_theta', 'n_phi', 'lid', 'error']
+    rows = []
+    for filename, (lid, error) in zip(filenames, lids):
+        if lid is None:
+            lid = {}
+        values = lid.get('map', {}).get('values', np.zeros((0,0)))
+        rows.append([filename, filename[-3:].lower(), lid.get('name', None), 
+                     lid.get('lumens_per_lamp', np.nan), lid.get('candela_mult', np.nan),
+                     lid.get('intensity', np.nan), lid.get('Iv0', np.nan),
+                     values.shape[1], values.shape[0], 
+                     lid if (error is None) else None, error])
+    return pd.DataFrame(rows, columns = columns)
+
+
+#------------------------------------------------------------------------------
+# Binary (memory-mapped) store of parsed LDT and IES files:
+#------------------------------------------------------------------------------
+_LID_PARSER_VERSION = 2 # increase when parsed output changes (invalidates LidStore entries)
+
+_LidArrayRef = collections.namedtuple('_LidArrayRef', ['offset','size','shape']) # reference to array in data file of LidStore
+
+def _lid_store_options(multiplier, normalize):
+    """
+    Get options (incl. parser version) that LidStore entries must match.
+    """
+    return (float(multiplier), normalize, _LID_PARSER_VERSION)
+
+def _file_hash(filename):
+    """
+    Get sha1 hash of file content.
+    """
+    with open(filename, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+def _split_lid(lid, arrays, offset, ids):
+    """
+    Replace (float) arrays in (nested) lid dict by references to the 
+    concatenated array data (arrays shared by several keys are stored once).
+    """
+    meta = {}
+    for key, value in lid.items():
+        if isinstance(value, dict):
+            meta[key], offset = _split_lid(value, arrays, offset, ids)
+        elif isinstance(value, np.ndarray) and (value.dtype.kind == 'f') and (value.ndim > 0):
+            if id(value) not in ids:
+                ids[id(value)] = _LidArrayRef(offset, value.size, value.shape)
+                arrays.append(value.ravel())
+                offset += value.size
+            meta[key] = ids[id(value)]
+        else:
+            meta[key] = value
+    return meta, offset
+
+def _join_lid(meta, data, copy = False, arrays = None):
+    """
+    Rebuild (nested) lid dict from meta data and (memory-mapped) array data
+    (views or, if copy, copies; arrays shared by several keys stay shared).
+    """
+    arrays = {} if arrays is None else arrays
+    lid = {}
+    for key, value in meta.items():
+        if isinstance(value, dict):
+            lid[key] = _join_lid(value, data, copy = copy, arrays = arrays)
+        elif isinstance(value, _LidArrayRef):
+            if value not in arrays:
+                arrays[value] = data[value.offset:(value.offset + value.size)].reshape(value.shape)
+                if copy == True:
+                    arrays[value] = arrays[value].copy()
+            lid[key] = arrays[value]
+        else:
+            lid[key] = value
+    return lid
+
+def _open_lid_store(store):
+    """
+    Get (per process cached) LidStore for path (or return LidStore).
+    """
+    if isinstance(store, LidStore):
+        return store
+    path = os.path.abspath(store)
+    if path not in _LID_STORE['open']:
+        _LID_STORE['open'][path] = LidStore(path)
+    return _LID_STORE['open'][path]
+
+def set_lid_store(store = None):
+    """
+    Set default LidStore used by read_lamp_data() and read_lamp_data_dir().
+    
+    Args:
+        :store:
+            | None, optional
+            | LidStore or path to one.
+            | None: don't use a default store.
+            
+    Returns:
+        :store:
+            | LidStore (or None)
+    """
+    _LID_STORE['default'] = None if (store is None) else _open_lid_store(store)
+    return _LID_STORE['default']
+
+class LidStore(object):
+    """
+    Binary store of parsed LDT and IES files.
+    
+    | The (float) arrays of all parsed files (candela values, angles, maps) 
+      are concatenated in a single binary float64 file 
+      (:path:/lid_data.bin) that is memory-mapped when read, so loading 
+      a full catalog is fast and the array data is shared (not duplicated) 
+      by processes reading from the same store.
+    | The remaining (meta) data of each file is kept in an index 
+      (:path:/lid_index.pkl) together with a (sha1) hash of the file content
+      and the options (multiplier, normalize, parser version) used when 
+      parsing the file: entries are only used when the hash and options 
+      match (i.e. they are invalidated when the file or parser changes).
+    | Data of updated files is appended to the data file; use compact() to 
+      remove data that is no longer referenced.
+      
+    Args:
+        :path:
+            | Directory of the store (created when updated for the first time).
+        
+    Note:
+        Arrays returned by get() and table() are read-only (memory-mapped) 
+        views (read_lamp_data() returns copies).
+    """
+    _DATA_FILE = 'lid_data.bin'
+    _INDEX_FILE = 'lid_index.pkl'
+    
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.reload()
+        
+    def __reduce__(self):
+        # re-open (cached) store from path when unpickled (e.g. in worker processes):
+        return (_open_lid_store, (self.path,))
+        
+    def __len__(self):
+        return len(self.index['entries'])
+    
+    def __contains__(self, filename):
+        return os.path.abspath(filename) in self.index['entries']
+    
+    @property
+    def filenames(self):
+        """ Sorted list with filenames of files in store. """
+        return sorted(self.index['entries'].keys())
+    
+    def reload(self):
+        """ 
+        (Re-)load index and memory-map data file. 
+        """
+        index_file = os.path.join(self.path, self._INDEX_FILE)
+        if os.path.exists(index_file):
+            with open(index_file, 'rb') as file:
+                self.index = pickle.load(file)
+        else:
+            self.index = {'version' : 1, 'size' : 0, 'entries' : {}}
+        data_file = os.path.join(self.path, self._DATA_FILE)
+        if self.index['size'] > 0:
+            self.data = np.memmap(data_file, dtype = np.float64, mode = 'r', shape = (self.index['size'],)).view(np.ndarray)
+        else:
+            self.data = np.zeros((0,))
+        return self
+    
+    def _save_index(self):
+        """
+        Write index to disk (atomic replace).
+        """
+        index_file = os.path.join(self.path, self._INDEX_FILE)
+        with open(index_file + '.tmp', 'wb') as file:
+            pickle.dump(self.index, file, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(index_file + '.tmp', index_file)
+    
+    def _data_file_size(self):
+        """
+        Number of (complete) float64 values in data file.
+        """
+        data_file = os.path.join(self.path, self._DATA_FILE)
+        return (os.path.getsize(data_file)//8) if os.path.exists(data_file) else 0
+    
+    def is_valid(self, filename, multiplier = 1.0, normalize = 'I0', file_hash = None):
+        """
+        Check whether store holds valid (up-to-date) data for filename, 
+        parsed with options multiplier and normalize.
+        """
+        entry = self.index['entries'].get(os.path.abspath(filename), None)
+        if (entry is None) or (entry['options'] != _lid_store_options(multiplier, normalize)):
+            return False
+        if file_hash is None:
+            file_hash = _file_hash(filename)
+        return entry['hash'] == file_hash
+            
+    def get(self, filename, multiplier = 1.0, normalize = 'I0', validate = True, copy = False):
+        """
+        Get lid dict of filename from store.
+        
+        Args:
+            :filename:
+                | Filename of IES or LDT file.
+            :multiplier, normalize:
+                | see read_lamp_data()
+            :validate:
+                | True, optional
+                | If True: check hash of current file content.
+            :copy:
+                | False, optional
+                | If False: arrays are read-only views of the (memory-mapped) 
+                  store data, else writable copies.
+                
+        Returns:
+            :lid:
+                | dict with IES or LDT file data (see read_lamp_data()),
+                | or None if the store holds no valid data for the file.
+        """
+        if validate == True:
+            if not self.is_valid(filename, multiplier = multiplier, normalize = normalize):
+                return None
+        else:
+            entry = self.index['entries'].get(os.path.abspath(filename), None)
+            if (entry is None) or (entry['options'] != _lid_store_options(multiplier, normalize)):
+                return None
+        return _join_lid(self.index['entries'][os.path.abspath(filename)]['lid'], self.data, copy = copy)
+    
+    def update(self, path, exts = ('ies','ldt'), recursive = True, multiplier = 1.0, 
+               normalize = 'I0', verbosity = 0, executor = 'process', 
+               max_workers = None, chunk_size = 64, block_size = 4096):
+        """
+        Parse new and changed LDT and IES files and add them to the store.
+        
+        Args:
+            :path:
+                | Directory with LDT and/or IES files or list of filenames.
+            :exts, recursive:
+                | see read_lamp_data_dir() (only used when :path: is a directory)
+            :multiplier, normalize, verbosity:
+                | see read_lamp_data()
+            :executor, max_workers, chunk_size:
+                | see read_lamp_data_dir()
+            :block_size:
+                | 4096, optional
+                | Number of files parsed before their data is appended 
+                  to the data file (limits memory use).
+                
+        Returns:
+            :errors:
+                | dict with error messages for files that could not be read.
+        """
+        if isinstance(path, str):
+            filenames = _find_lamp_data_files(path, exts = exts, recursive = recursive)
+        else:
+            filenames = list(path)
+        hashes = [_file_hash(filename) for filename in filenames]
+        stale = [(filename, file_hash) for (filename, file_hash) in zip(filenames, hashes) 
+                 if not self.is_valid(filename, multiplier = multiplier, normalize = normalize, file_hash = file_hash)]
+        
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        kwargs = {'multiplier' : multiplier, 'verbosity' : verbosity, 
+                  'normalize' : normalize, 'store' : False}
+        errors = {}
+        for b in range(0, len(stale), block_size):
+            block = stale[b:b + block_size]
+            chunks = [[filename for (filename, file_hash) in block[i:i + chunk_size]] for i in range(0, len(block), chunk_size)]
+            lids = parallel_map(_read_lamp_data_files, chunks, [kwargs]*len(chunks), 
+                                executor = executor, max_workers = max_workers)
+            lids = [lid for chunk in lids for lid in chunk]
+            
+            # split lids in meta data and (appended) array data 
+            # (offsets from actual data file size, which can be larger than 
+            # the size in the index when an earlier update was interrupted):
+            arrays = []
+            offset = self._data_file_size()
+            start = offset
+            entries = {}
+            for (filename, file_hash), (lid, error) in zip(block, lids):
+                if error is not None:
+                    errors[filename] = error
+                    continue
+                meta, offset = _split_lid(lid, arrays, offset, {})
+                entries[os.path.abspath(filename)] = {'hash' : file_hash, 'lid' : meta,
+                                                      'options' : _lid_store_options(multiplier, normalize)}
+            if len(arrays) > 0:
+                data_file = os.path.join(self.path, self._DATA_FILE)
+                with open(data_file, 'r+b' if os.path.exists(data_file) else 'wb') as file:
+                    file.seek(8*start) # (overwrite incomplete trailing value, if any)
+                    np.hstack(arrays).astype(np.float64).tofile(file)
+            self.index['size'] = offset
+            self.index['entries'].update(entries)
+            self._save_index()
+        self.reload()
+        return errors
+    
+    def compact(self):
+        """
+        Rewrite data file with only the array data referenced by the index.
+        """
+        data = self.data
+        arrays = []
+        refs = {}
+        def remap(meta, offset):
+            for key, value in meta.items():
+                if isinstance(value, dict):
+                    offset = remap(value, offset)
+                elif isinstance(value, _LidArrayRef):
+                    if value not in refs: # keep arrays shared by several keys shared
+                        refs[value] = _LidArrayRef(offset, value.size, value.shape)
+                        arrays.append(np.array(data[value.offset:(value.offset + value.size)]))
+                        offset += value.size
+                    meta[key] = refs[value]
+            return offset
+        offset = 0
+        for entry in self.index['entries'].values():
+            offset = remap(entry['lid'], offset)
+        data_file = os.path.join(self.path, self._DATA_FILE)
+        with open(data_file + '.tmp', 'wb') as file:
+            if len(arrays) > 0:
+                np.hstack(arrays).astype(np.float64).tofile(file)
+        self.data = np.zeros((0,)) # release memory-map before replacing file
+        del data
+        os.replace(data_file + '.tmp', data_file)
+        self.index['size'] = offset
+        self._save_index()
+        return self.reload()
+    
+    def table(self, validate = False):
+        """
+        Get all files in store as a table.
+        
+        Args:
+            :validate:
+                | False, optional
+                | If True: check hashes of current file contents
+                  (invalid entries have an error message and lid = None).
+        
+        Returns:
+            :lids:
+                | pandas.DataFrame (see read_lamp_data_dir()).
+        """
+        filenames = self.filenames
+        lids = []
+        for filename in filenames:
+            entry = self.index['entries'][filename]
+            lid = _join_lid(entry['lid'], self.data)
+            lid['filename'] = filename
+            if (validate == True) and ((not os.path.exists(filename)) or (_file_hash(filename) != entry['hash'])):
+                lids.append((None, 'store entry out of date'))
+            else:
+                lids.append((lid, None))
+        return _lid_table(filenames, lids)
+
 def displaymsg(code, message, verbosity = 1):
     """
     Display messages (used by read_IES_lamp_data).  
@@ -153,8 +621,10 @@ def read_IES_lamp_data(filename, multiplier = 1.0, verbosity = 0, normalize = 'I
     file = open(filename, 'rt', encoding='cp1252')
     content = file.read()
     file.close()
-    s, content = content.split('\n', 1)
-
+    
+    # split content into lines (single pass):
+    lines = content.split('\n')
+    s = lines[0]
 
     if s in version_table:
         version = version_table[s]
@@ -164,22 +634,30 @@ def read_IES_lamp_data(filename, multiplier = 1.0, verbosity = 0, normalize = 'I
 
     keywords = dict()
 
-    while content and not content.startswith('TILT='):
-        s, content = content.split('\n', 1)
-
+    i = 1
+    while (i < len(lines)) and not lines[i].startswith('TILT='):
+        s = lines[i]
         if s.startswith('['):
             endbracket = s.find(']')
             if endbracket != -1:
                 keywords[s[1:endbracket]] = s[endbracket + 1:].strip()
+        i += 1
 
-    s, content = content.split('\n', 1)
-
-    if not s.startswith('TILT'):
-        displaymsg('ERROR' "TILT keyword not found, check your IES file", verbosity = verbosity)
+    if (i >= len(lines)) or not lines[i].startswith('TILT'):
+        displaymsg('ERROR', "TILT keyword not found, check your IES file", verbosity = verbosity)
         return None
+    tilt = lines[i][5:].strip()
 
-    # fight against ill-formed files
-    file_data = content.replace(',', ' ').split()
+    # fight against ill-formed files + convert all numbers at once:
+    file_data = np.fromstring(' '.join(lines[i+1:]).replace(',', ' '), sep = ' ')
+    
+    # skip lamp-to-luminaire geometry and tilt angles & multiplying factors:
+    if tilt == 'INCLUDE':
+        file_data = file_data[2 + 2*int(file_data[1]):]
+    
+    if file_data.shape[0] < 13:
+        displaymsg('ERROR', "Not enough data values, check your IES file", verbosity = verbosity)
+        return None
 
     lamps_num = int(file_data[0])
     if lamps_num != 1:
@@ -210,9 +688,9 @@ def read_IES_lamp_data(filename, multiplier = 1.0, verbosity = 0, normalize = 'I
 
     input_watts = float(file_data[12])
 
-    v_angs = [float(s) for s in file_data[13:13 + v_angles_num]]
-    h_angs = [float(s) for s in file_data[13 + v_angles_num:
-                                          13 + v_angles_num + h_angles_num]]
+    v_angs = file_data[13:13 + v_angles_num]
+    h_angs = file_data[13 + v_angles_num:
+                       13 + v_angles_num + h_angles_num]
 
     if v_angs[0] == 0 and v_angs[-1] == 90:
         lamp_cone_type = 'TYPE90'
@@ -239,27 +717,21 @@ def read_IES_lamp_data(filename, multiplier = 1.0, verbosity = 0, normalize = 'I
     # read candela values
     offset = 13 + len(v_angs) + len(h_angs)
     candela_num = len(v_angs) * len(h_angs)
-    candela_values = [float(s) for s in file_data[offset:offset + candela_num]]
+    candela_values = file_data[offset:offset + candela_num]
+    if candela_values.shape[0] < candela_num:
+        displaymsg('ERROR', "Not enough candela values, check your IES file", verbosity = verbosity)
+        return None
 
     # reshape 1d array to 2d array
-    candela_2d = list(zip(*[iter(candela_values)] * len(v_angs)))
+    candela_2d = candela_values.reshape(len(h_angs), len(v_angs))
 
     # check if angular offsets are the same
-    v_d = [v_angs[i] - v_angs[i - 1] for i in range(1, len(v_angs))]
-    h_d = [h_angs[i] - h_angs[i - 1] for i in range(1, len(h_angs))]
-
-    v_same = all(abs(v_d[i] - v_d[i - 1]) < 0.001 for i in range(1, len(v_d)))
-    h_same = all(abs(h_d[i] - h_d[i - 1]) < 0.001 for i in range(1, len(h_d)))
+    v_same = bool((np.abs(np.diff(v_angs, n = 2)) < 0.001).all())
+    h_same = bool((np.abs(np.diff(h_angs, n = 2)) < 0.001).all())
 
     if not h_same:
         displaymsg('INFO', "Different offsets for horizontal angles!", verbosity = verbosity)
         
-    # normalize candela values
-    maxval = max([max(row) for row in candela_2d])
-    candela_2d = [[val / maxval for val in row] for row in candela_2d]
-    intensity = maxval * multiplier * candela_mult
-    #intensity = max(500, min(intensity, 5000)) #???
-
     # Summarize in dict():
     IES = {'filename': filename}
     IES['name'] = name
@@ -283,9 +755,9 @@ def read_IES_lamp_data(filename, multiplier = 1.0, verbosity = 0, normalize = 'I
     IES['candela_2d'] = np.asarray(candela_2d)
     IES['v_same'] = v_same
     IES['h_same'] = h_same
-    IES['intensity'] = intensity
     
-    # normalize candela values to max = 1 or I0 = 1:
+    # normalize candela values to max = 1 or I0 = 1 
+    # (intensity: absolute luminous intensity corresponding to 1):
     IES = _normalize_candela_2d(IES, normalize = normalize, multiplier = multiplier)
 
     # complete lid to full theta[0-180] and phi [0-360]
@@ -301,15 +773,15 @@ def _complete_ies_lid(IES, lamp_h_type = 'TYPE90'):
     # Create full theta (0-180) and phi (0-360) sets
     IES['theta'] = IES['v_angs']
     if IES['lamp_h_type'] == 'TYPE90':
-        IES['values'] = np.matlib.repmat(IES['candela_2d'],4,1)
+        IES['values'] = np.tile(IES['candela_2d'],(4,1))
         IES['phi'] = np.hstack((IES['h_angs'], IES['h_angs'] + 90, IES['h_angs'] + 180, IES['h_angs']+270))
     elif IES['lamp_h_type'] == 'TYPE180':
-        IES['values'] = np.matlib.repmat(IES['candela_2d'],2,1)
+        IES['values'] = np.tile(IES['candela_2d'],(2,1))
         IES['phi'] = np.hstack((IES['h_angs'], IES['h_angs'] + 180))
     else:
         IES['values'] = IES['candela_2d']
         IES['phi'] = IES['h_angs']
-    IES['map']['thetas'] =  IES['theta']
+    IES['map'] = {'thetas' : IES['theta']}
     IES['map']['phis'] = IES['phi']
     IES['map']['values'] = IES['values']
     return IES
@@ -347,75 +819,54 @@ def read_ldt_lamp_data(filename, multiplier = 1.0, normalize = 'I0'):
     LDT = {'filename' : filename}
     LDT['version'] = None
     with open(filename) as file:
-        c = 0
-        cangles = []
-        tangles = []
-        candela_values = []
-        for line in file:
-            if c == 0: # manufacturer
-                LDT['manufacturer'] = line.rstrip()
-            elif c == 1: # type indicator: 1: point with symm. around vert. axis, 2: line luminaire, 3: point with other symm.
-                if np.float(line) == 1.0:
-                    LDT['Ityp'] = 'point source with symm. around vert. axis'
-                elif np.float(line) == 2.0:
-                    LDT['Ityp'] = 'line luminaire'
-                elif np.float(line) == 3.0:
-                    LDT['Ityp'] = 'point source with other symm.'
-            elif c == 2: # symm. indicator
-                if np.float(line) == 0.0:
-                    LDT['Isym'] = (0, 'no symmetry')
-                elif np.float(line) == 1.0:
-                    LDT['Isym'] = (1, 'symmetry about the vertical axis')
-                elif np.float(line) == 2.0:
-                    LDT['Isym'] = (2, 'symmetry to plane C0-C180')
-                elif np.float(line) == 3.0:
-                    LDT['Isym'] = (3, 'symmetry to plane C90-C270')
-                elif np.float(line) == 4.0:
-                    LDT['Isym'] = (4, 'symmetry to plane C0-C180 and to plane C90-C270')
-            elif c == 3: # Number Mc of C-planes between 0 and 360 degrees 
-                LDT['Mc'] = np.float(line)
-            elif c == 4: # Distance Dc between C-planes (Dc = 0 for non-equidistantly available C-planes)
-                LDT['Dc'] = np.float(line)
-            elif c == 5: # Number Ng of luminous intensities in each C-plane
-                LDT['Ng'] = np.float(line)
-            elif c == 6: # Distance Dg between luminous intensities per C-plane (Dg = 0 for non-equidistantly available luminous intensities in C-planes)
-                LDT['Dg'] = np.float(line)
-            elif c == 8: # luminaire name
-                LDT['name'] = line.rstrip()
-            elif c == 23: # conversion factor
-                LDT['candela_mult'] = np.float(line)
-            elif c == 24: # Tilt angle
-                LDT['tilt'] = np.float(line)
-            elif c == 26: # number of lamps
-                LDT['lamps_num'] = np.float(line)
-            elif c == 28: # total luminous flux
-                LDT['tflux'] = np.float(line)
-                LDT['lumens_per_lamp'] = LDT['tflux']
-            elif c == 29: # cct/cri
-                LDT['cct/cri'] = line.rstrip()
-            elif (c >= 42) & (c <= (42 + LDT['Mc'] - 1)): # start of C-angles
-                cangles.append(np.float(line))
-            elif (c >= 42 + LDT['Mc']) & (c <= (42 + LDT['Mc'] + LDT['Ng'] - 1)): # start of t-angles
-                tangles.append(np.float(line))
-            elif (c >= (42 + LDT['Mc'] + LDT['Ng'])) & (c <= (42 + LDT['Mc'] + LDT['Ng'] + LDT['Mc']*LDT['Ng'] - 1)):
-                candela_values.append(np.float(line))
-            c += 1
-            
-        candela_values = np.array(candela_values)
-        LDT['candela_values'] = np.array(candela_values)
-        candela_2d = np.array(candela_values).reshape((-1,np.int(LDT['Ng'])))
-        LDT['h_angs'] = np.array(cangles)[:candela_2d.shape[0]]
-        LDT['v_angs'] = np.array(tangles)
-        LDT['candela_2d'] = np.array(candela_2d)
-        
-        # normalize candela values to max = 1 or I0 = 1:
-        LDT = _normalize_candela_2d(LDT, normalize = normalize, multiplier = multiplier)
+        lines = file.read().split('\n')
+    
+    # header (first 42 lines):
+    Ityps = {1.0 : 'point source with symm. around vert. axis',
+             2.0 : 'line luminaire',
+             3.0 : 'point source with other symm.'}
+    Isyms = {0.0 : (0, 'no symmetry'),
+             1.0 : (1, 'symmetry about the vertical axis'),
+             2.0 : (2, 'symmetry to plane C0-C180'),
+             3.0 : (3, 'symmetry to plane C90-C270'),
+             4.0 : (4, 'symmetry to plane C0-C180 and to plane C90-C270')}
+    LDT['manufacturer'] = lines[0].rstrip()
+    if float(lines[1]) in Ityps: # type indicator: 1: point with symm. around vert. axis, 2: line luminaire, 3: point with other symm.
+        LDT['Ityp'] = Ityps[float(lines[1])]
+    if float(lines[2]) in Isyms: # symm. indicator
+        LDT['Isym'] = Isyms[float(lines[2])]
+    LDT['Mc'] = float(lines[3]) # Number Mc of C-planes between 0 and 360 degrees 
+    LDT['Dc'] = float(lines[4]) # Distance Dc between C-planes (Dc = 0 for non-equidistantly available C-planes)
+    LDT['Ng'] = float(lines[5]) # Number Ng of luminous intensities in each C-plane
+    LDT['Dg'] = float(lines[6]) # Distance Dg between luminous intensities per C-plane (Dg = 0 for non-equidistantly available luminous intensities in C-planes)
+    LDT['name'] = lines[8].rstrip() # luminaire name
+    LDT['candela_mult'] = float(lines[23]) # conversion factor
+    LDT['tilt'] = float(lines[24]) # Tilt angle
+    LDT['lamps_num'] = float(lines[26]) # number of lamps
+    LDT['tflux'] = float(lines[28]) # total luminous flux
+    LDT['lumens_per_lamp'] = LDT['tflux']
+    LDT['cct/cri'] = lines[29].rstrip() # cct/cri
+
+    # C-angles, t-angles and candela values (convert all numbers at once):
+    Mc, Ng = int(LDT['Mc']), int(LDT['Ng'])
+    data = np.fromstring(' '.join(lines[42:(42 + Mc + Ng + Mc*Ng)]), sep = ' ')
+    cangles = data[:Mc]
+    tangles = data[Mc:(Mc + Ng)]
+    candela_values = data[(Mc + Ng):]
+    LDT['candela_values'] = candela_values
+    candela_2d = candela_values.reshape((-1,Ng))
+    LDT['h_angs'] = cangles[:candela_2d.shape[0]]
+    LDT['v_angs'] = tangles
+    LDT['candela_2d'] = candela_2d
+    
+    # normalize candela values to max = 1 or I0 = 1:
+    LDT = _normalize_candela_2d(LDT, normalize = normalize, multiplier = multiplier)
 
-        # complete lid to full theta[0-180] and phi [0-360]
-        LDT = _complete_ldt_lid(LDT, Isym = LDT['Isym'][0])
-        
-        LDT['Iv0'] = LDT['intensity']/1000*LDT['tflux'] #lid in cd/klm 
-        return LDT
+    # complete lid to full theta[0-180] and phi [0-360]
+    LDT = _complete_ldt_lid(LDT, Isym = LDT['Isym'][0])
+    
+    LDT['Iv0'] = LDT['intensity']/1000*LDT['tflux'] #lid in cd/klm 
+    return LDT
 
     
 def _complete_ldt_lid(LDT, Isym = 4):
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+########################################################################
+# <LUXPY: a Python package for lighting and color science.>
+# Copyright (C) <2017>  <Kevin A.G. Smet> (ksmet1977 at gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+"""
+Module for photometric calculations with LIDs read from IES and LDT files.
+==========================================================================
+
+ :get_lid_grid: Get sorted, periodic (C, gamma) grid with (absolute)
+                luminous intensities of a LID (see read_lamp_data()).
+
+ :interpolate_lid: Interpolate luminous intensities of a LID at arbitrary
+                   (C, gamma) directions.
+
+ :lid_illuminance: Calculate (point-by-point) illuminances on (large) grids
+                   of points for one or more (rotated, tilted) luminaires.
+
+ :lid_zonal_lumens: Calculate zonal lumen summary of a LID.
+
+    Notes:
+        1. Angles are in degrees: C is the azimuth (C0 along the luminaire
+           x-axis, C90 along the y-axis), gamma is the angle with the
+           downward vertical (nadir: gamma = 0).
+        2. Intensities are absolute (cd) when absolute == True:
+           IES: map values x 'intensity';
+           LDT: map values x 'intensity' x 'tflux'/1000 (cd/klm -> cd).
+
+.. codeauthor:: Kevin A.G. Smet (ksmet1977 at gmail.com)
+"""
+import numpy as np
+from .io_lid_files import read_lamp_data
+
+__all__ = ['get_lid_grid','interpolate_lid','lid_illuminance','lid_zonal_lumens']
+
+
+def get_lid_grid(lid, absolute = True):
+    """
+    Get sorted, periodic (C, gamma) grid with luminous intensities of a LID.
+
+    Args:
+        :lid:
+            | dict with LID data (see read_lamp_data()) or IES/LDT filename.
+        :absolute:
+            | True, optional
+            | If True: return absolute luminous intensities (cd),
+            | else return normalized values (as in lid['map']['values']).
+
+    Returns:
+        :grid:
+            | tuple (Cs, gammas, I) with:
+            |  - Cs: sorted C-angles, extended with the last (first) C-plane
+            |        at C - 360 (C + 360) for periodic interpolation.
+            |  - gammas: sorted gamma-angles.
+            |  - I: ndarray with luminous intensities
+            |       (.shape = (Cs.shape[0], gammas.shape[0]))
+    """
+    if isinstance(lid, str):
+        lid = read_lamp_data(lid)
+    thetas = np.asarray(lid['map']['thetas'], dtype = float)
+    phis = np.mod(np.asarray(lid['map']['phis'], dtype = float), 360.0)
+    values = np.asarray(lid['map']['values'], dtype = float)
+    if absolute == True:
+        scale = lid['intensity']
+        if lid['filename'][-3:].lower() == 'ldt':
+            scale = scale*lid['tflux']/1000 # cd/klm -> cd
+        values = values*scale
+
+    # sort and remove duplicate angles (keep first occurrence):
+    phis, idx_phi = np.unique(phis, return_index = True)
+    thetas, idx_theta = np.unique(thetas, return_index = True)
+    values = values[idx_phi][:,idx_theta]
+
+    # periodic extension of C-planes:
+    phis = np.hstack((phis[-1:] - 360.0, phis, phis[:1] + 360.0))
+    values = np.vstack((values[-1:], values, values[:1]))
+    return phis, thetas, values
+
+def _interpolate_grid(grid, C, gamma):
+    """
+    Bilinear interpolation of (C, gamma) grid (intensities are zero outside
+    the gamma range of the grid).
+    """
+    phis, thetas, values = grid
+    C = np.mod(C, 360.0)
+    i = np.clip(np.searchsorted(phis, C, side = 'right') - 1, 0, phis.shape[0] - 2)
+    wc = (C - phis[i])/(phis[i + 1] - phis[i])
+    if thetas.shape[0] > 1:
+        j = np.clip(np.searchsorted(thetas, gamma, side = 'right') - 1, 0, thetas.shape[0] - 2)
+        wg = np.clip((gamma - thetas[j])/(thetas[j + 1] - thetas[j]), 0, 1)
+    else:
+        j, wg = np.zeros(np.shape(gamma), dtype = int), np.zeros(np.shape(gamma))
+    I = (1 - wc)*((1 - wg)*values[i,j] + wg*values[i,np.minimum(j + 1, thetas.shape[0] - 1)]) + \
+        wc*((1 - wg)*values[i + 1,j] + wg*values[i + 1,np.minimum(j + 1, thetas.shape[0] - 1)])
+    return np.where((gamma < thetas[0]) | (gamma > thetas[-1]), 0.0, I)
+
+def interpolate_lid(lid, C, gamma, absolute = True):
+    """
+    Interpolate luminous intensities of a LID at arbitrary (C, gamma) directions.
+
+    Args:
+        :lid:
+            | dict with LID data (see read_lamp_data()), IES/LDT filename
+            | or grid (see get_lid_grid()).
+        :C:
+            | ndarray with C-angles (degrees).
+        :gamma:
+            | ndarray with gamma-angles (degrees), same shape as C
+            | (or broadcastable).
+        :absolute:
+            | True, optional
+            | If True: return absolute luminous intensities (cd).
+
+    Returns:
+        :I:
+            | ndarray with (bilinearly) interpolated luminous intensities.
+            | Intensities outside the gamma range of the LID are zero.
+    """
+    grid = lid if isinstance(lid, tuple) else get_lid_grid(lid, absolute = absolute)
+    C, gamma = np.broadcast_arrays(np.asarray(C, dtype = float), np.asarray(gamma, dtype = float))
+    return _interpolate_grid(grid, C, gamma)
+
+def _rotation_matrices(rotation, tilt, n):
+    """
+    Get rotation matrices (luminaire -> world coordinates) for rotations
+    about the vertical z-axis and tilts about the luminaire y-axis (C90-C270).
+    """
+    rz = np.deg2rad(np.asarray(rotation, dtype = float)*np.ones(n))
+    ty = -np.deg2rad(np.asarray(tilt, dtype = float)*np.ones(n)) # positive tilt: nadir towards C0
+    Rz = np.zeros((n,3,3))
+    Rz[:,0,0], Rz[:,0,1], Rz[:,1,0], Rz[:,1,1], Rz[:,2,2] = np.cos(rz), -np.sin(rz), np.sin(rz), np.cos(rz), 1.0
+    Ry = np.zeros((n,3,3))
+    Ry[:,0,0], Ry[:,0,2], Ry[:,2,0], Ry[:,2,2], Ry[:,1,1] = np.cos(ty), np.sin(ty), -np.sin(ty), np.cos(ty), 1.0
+    return np.einsum('nij,njk->nik', Rz, Ry)
+
+def lid_illuminance(lids, positions, points, normals = [0.0, 0.0, 1.0],
+                    rotation = 0.0, tilt = 0.0, scale = 1.0, chunk_size = 100000):
+    """
+    Calculate (point-by-point) illuminances on (large) grids of points
+    for one or more (rotated, tilted) luminaires.
+
+    | E = sum_luminaires scale * I(C, gamma) * cos(incidence) / d**2
+
+    Args:
+        :lids:
+            | dict with LID data (see read_lamp_data()), IES/LDT filename,
+            | grid (see get_lid_grid()) or list of these (one per luminaire).
+            | A single LID is used for all luminaires.
+        :positions:
+            | ndarray with luminaire positions (.shape = (n_lum, 3)).
+        :points:
+            | ndarray (or list) with positions of points (.shape = (N, 3)).
+            | Units should be those of :positions: (illuminance is in lux
+              for positions in m).
+        :normals:
+            | [0.0, 0.0, 1.0], optional
+            | Normal(s) of receiving surface (.shape = (3,) or (N,3)).
+            | Default: horizontal work plane.
+        :rotation:
+            | 0.0, optional
+            | Rotation (degrees) of luminaire(s) about vertical (z) axis
+              (scalar or one value per luminaire).
+        :tilt:
+            | 0.0, optional
+            | Tilt (degrees) of luminaire(s) about the luminaire y-axis
+              (C90-C270 axis; applied before rotation); a positive tilt
+              turns the nadir (gamma = 0) towards the C0-direction
+              (scalar or one value per luminaire).
+        :scale:
+            | 1.0, optional
+            | Scale factor (e.g. dimming, maintenance factor) for intensities
+              (scalar or one value per luminaire).
+        :chunk_size:
+            | 100000, optional
+            | Number of points processed at once (limits memory use).
+
+    Returns:
+        :E:
+            | ndarray with illuminances (.shape = (N,)).
+    """
+    positions = np.atleast_2d(np.asarray(positions, dtype = float))
+    n_lum = positions.shape[0]
+    if not isinstance(lids, list):
+        lids = [lids]*n_lum
+
+    # get grids (once per distinct lid):
+    grids = {}
+    for lid in lids:
+        if id(lid) not in grids:
+            grids[id(lid)] = lid if isinstance(lid, tuple) else get_lid_grid(lid, absolute = True)
+    R = _rotation_matrices(rotation, tilt, n_lum)
+    scale = np.asarray(scale, dtype = float)*np.ones(n_lum)
+
+    normals = np.asarray(normals, dtype = float)
+    if not isinstance(points, np.ndarray):
+        points = np.asarray(points, dtype = float)
+    points = np.atleast_2d(points) # (ndarrays, e.g. memmaps, are converted per chunk)
+    E = np.zeros(points.shape[0])
+    for s in range(0, points.shape[0], chunk_size):
+        pts = np.asarray(points[s:s + chunk_size], dtype = float)
+        nrm = normals[s:s + chunk_size] if (normals.ndim > 1) else normals[None,:]
+        nrm = nrm/np.linalg.norm(nrm, axis = -1, keepdims = True)
+        for k in range(n_lum):
+            d = pts - positions[k] # from luminaire to points
+            d2 = (d**2).sum(axis = 1)
+            dn = np.sqrt(d2)
+            dn[dn == 0] = np.inf # no contribution for points at luminaire position
+            u = np.dot(d, R[k])/dn[:,None] # direction in luminaire coordinates
+            gamma = np.rad2deg(np.arccos(np.clip(-u[:,2], -1.0, 1.0)))
+            C = np.rad2deg(np.arctan2(u[:,1], u[:,0]))
+            cos_inc = np.clip(-(d*nrm).sum(axis = 1)/dn, 0.0, None)
+            E[s:s + chunk_size] += scale[k]*_interpolate_grid(grids[id(lids[k])], C, gamma)*cos_inc/np.where(d2 > 0, d2, 1.0)
+    return E
+
+def lid_zonal_lumens(lid, zones = None, dC = 1.0, dgamma = 1.0):
+    """
+    Calculate zonal lumen summary of a LID.
+
+    | Zonal flux: Phi = integral( I(C, gamma) * sin(gamma) dgamma dC )
+
+    Args:
+        :lid:
+            | dict with LID data (see read_lamp_data()), IES/LDT filename
+            | or grid (see get_lid_grid()).
+        :zones:
+            | None, optional
+            | Gamma-angles (degrees) of zone edges.
+            | None defaults to 10° zones: [0, 10, ..., 180].
+        :dC:
+            | 1.0, optional
+            | C-angle step (degrees) of integration grid.
+        :dgamma:
+            | 1.0, optional
+            | Maximum gamma-angle step (degrees) of integration grid.
+
+    Returns:
+        :summary:
+            | dict with keys:
+            |  - 'zones': ndarray with zones (.shape = (n_zones, 2))
+            |  - 'lumens': ndarray with zonal fluxes (lm)
+            |  - 'cumulative': ndarray with cumulative zonal fluxes (lm)
+            |  - 'fraction': ndarray with zonal fluxes relative to total flux
+            |  - 'total', 'downward' (0°-90°), 'upward' (90°-180°): fluxes (lm)
+    """
+    grid = lid if isinstance(lid, tuple) else get_lid_grid(lid, absolute = True)
+    zones = np.arange(0.0, 181.0, 10.0) if (zones is None) else np.asarray(zones, dtype = float)
+
+    # integration grid (including zone edges and 90°):
+    gammas = np.unique(np.hstack((np.arange(0.0, 180.0, dgamma), 180.0, zones, 90.0)))
+    gammas_mid = (gammas[:-1] + gammas[1:])/2
+    n_C = int(np.ceil(360.0/dC))
+    Cs_mid = (np.arange(n_C) + 0.5)*360.0/n_C
+
+    # flux per gamma band (sin(gamma) dgamma integrated exactly):
+    I = _interpolate_grid(grid, Cs_mid[:,None], gammas_mid[None,:])
+    band = I.sum(axis = 0)*(2*np.pi/n_C)*(np.cos(np.deg2rad(gammas[:-1])) - np.cos(np.deg2rad(gammas[1:])))
+
+    # sum bands in zones:
+    idx = np.searchsorted(zones, gammas_mid) - 1
+    inzone = (idx >= 0) & (idx < zones.shape[0] - 1)
+    lumens = np.bincount(idx[inzone], weights = band[inzone], minlength = zones.shape[0] - 1)
+    total = band.sum()
+    return {'zones' : np.vstack((zones[:-1], zones[1:])).T,
+            'lumens' : lumens,
+            'cumulative' : np.cumsum(lumens),
+            'fraction' : lumens/total if (total > 0) else lumens*np.nan,
+            'total' : total,
+            'downward' : band[gammas_mid < 90.0].sum(),
+            'upward' : band[gammas_mid > 90.0].sum()}
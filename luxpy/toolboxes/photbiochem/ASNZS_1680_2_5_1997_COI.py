@@ -25,16 +25,21 @@ Module for calculation of cyanosis index (AS/NZS 1680.2.5:1997)
                    oxygenated blood
  :spd_to_COI_ASNZS1680: Calculate the Cyanosis Observartion Index (COI) 
                         [ASNZS 1680.2.5-1995] 
+ :get_COI_ref_table: Get (cached) table with tristimulus values of blood under
+                     blackbody radiators as a function of CCT.
+ :spd_to_COI_ASNZS1680_batch: Calculate the Cyanosis Observartion Index (COI) 
+                              [ASNZS 1680.2.5-1995] for large sets of spectra.
 
 Reference:
     AS/NZS1680.2.5 (1997). INTERIOR LIGHTING PART 2.5: HOSPITAL AND MEDICAL TASKS.
 
 .. codeauthor:: Kevin A.G. Smet (ksmet1977 at gmail.com)
 """
-from luxpy import np, math, deltaE, _PKG_PATH, _SEP, _CIE_ILLUMINANTS, getdata, spd_to_xyz, blackbody, xyz_to_cct
+from luxpy import np, math, odict, deltaE, _PKG_PATH, _SEP, _EPS, _BB, _CIE_ILLUMINANTS, getdata, spd_to_xyz, blackbody, xyz_to_cct, xyzbar, cie_interp, getwld
 
 
-__all__ = ['_COI_RFL_BLOOD','_COI_CIEOBS','_COI_CSPACE','spd_to_COI_ASNZS1680']
+__all__ = ['_COI_RFL_BLOOD','_COI_CIEOBS','_COI_CSPACE','spd_to_COI_ASNZS1680',
+           'get_COI_ref_table','spd_to_COI_ASNZS1680_batch']
 
 
 # Reflectance spectra of 100% and 50% oxygenated blood
@@ -46,6 +51,10 @@ _COI_CSPACE = 'lab'
 
 _COI_REF = blackbody(4000, )
 
+_COI_REF_CCT = 4000.0 # CCT of blackbody reference illuminant
+
+_COI_CACHE = {'kernels' : odict(), 'ref_tables' : odict(), 'max_size' : 16}
+
 def spd_to_COI_ASNZS1680(S = None, tf = _COI_CSPACE, cieobs = _COI_CIEOBS, out = 'COI,cct', extrapolate_rfl = False):
     """
     Calculate the Cyanosis Observation Index (COI) [ASNZS 1680.2.5-1995].
@@ -122,6 +131,219 @@ def spd_to_COI_ASNZS1680(S = None, tf = _COI_CSPACE, cieobs = _COI_CIEOBS, out =
     else:
         return eval(out)
 
+
+#------------------------------------------------------------------------------
+def _cache_get(cache, key, fcn):
+    """
+    Get value for key from odict cache (calculate using fcn() when missing).
+    """
+    if key in cache:
+        return cache[key]
+    value = fcn()
+    cache[key] = value
+    while len(cache) > _COI_CACHE['max_size']:
+        cache.popitem(last = False)
+    return value
+
+def _crop_wl(wl, extrapolate_rfl = False):
+    """
+    Get indices of wavelengths within the range of the blood reflectances.
+    """
+    if extrapolate_rfl == False: # _COI_RFL do not cover the full 360-830nm range.
+        return np.where((wl >= _COI_RFL_BLOOD[0].min()) & (wl <= _COI_RFL_BLOOD[0].max()))[0]
+    else:
+        return np.arange(wl.shape[0])
+    
+def _get_COI_kernels(wl, cieobs = _COI_CIEOBS):
+    """
+    Get (cached) blood reflectance kernels for wavelengths wl.
+    
+    | The kernel combines the blood reflectances (interpolated as in 
+      spd_to_xyz(), with a unit reflectance prepended for the source itself), 
+      the wavelength spacing and the CMFs, such that the (unnormalized) 
+      tristimulus values of the source and of the blood under the source 
+      are obtained by a single matrix product: np.dot(S, kernel.T)
+      (kernel.shape = ((1 + number of rfls)*3, number of wavelengths)).
+    """
+    wl = np.asarray(wl, dtype = float)
+    key = (wl.tobytes(), cieobs)
+    def fcn():
+        cmf = xyzbar(cieobs = cieobs, scr = 'dict', wl_new = wl, kind = 'np')[1:]*getwld(wl)
+        rfl = cie_interp(data = _COI_RFL_BLOOD, wl_new = wl, kind = 'rfl')[1:]
+        rfl = np.vstack((np.ones((1,wl.shape[0])), rfl))
+        return (rfl[:,None,:]*cmf[None,:,:]).reshape(rfl.shape[0]*3, wl.shape[0])
+    return _cache_get(_COI_CACHE['kernels'], key, fcn)
+
+def _spd_to_xyz_blood(S, kernel):
+    """
+    Calculate relative (Yw = 100) xyz of blood and of the source for spectra S 
+    (S.shape = (number of spectra, number of wavelengths), no wl row).
+    
+    Returns xyz (.shape = (number of rfls, number of spectra, 3)) and 
+    xyzw (.shape = (number of spectra, 3)).
+    """
+    xyz = np.dot(S, kernel.T).reshape(S.shape[0], -1, 3)
+    xyz = xyz*(100.0/xyz[:,:1,1:2])
+    return np.transpose(xyz[:,1:,:],(1,0,2)), xyz[:,0,:]
+
+def _blackbodies(ccts, wl):
+    """
+    Calculate blackbody spectra (normalized at 560 nm, as blackbody()) 
+    for an array of ccts (no wl row).
+    """
+    def fSr(x, cct):
+        return (1/np.pi)*_BB['c1']*((x*1.0e-9)**(-5))*(_BB['n']**(-2.0))*(np.exp(_BB['c2']*((_BB['n']*x*1.0e-9*(cct+_EPS))**(-1.0)))-1.0)**(-1.0)
+    ccts = np.asarray(ccts, dtype = float).ravel()[:,None]
+    return fSr(wl[None,:], ccts)/fSr(560.0, ccts)
+
+def get_COI_ref_table(wl = None, cieobs = _COI_CIEOBS, cct_min = 1000.0, cct_max = 25000.0, cct_step = 10.0):
+    """
+    Get (cached) table with relative tristimulus values of 100% and 50% 
+    oxygenated blood (and of the source) under blackbody radiators 
+    as a function of CCT.
+    
+    Args:
+        :wl:
+            | None, optional
+            | Wavelengths of the blackbody radiators.
+            | None defaults to the wavelength range of _COI_RFL_BLOOD.
+        :cieobs: 
+            | _COI_CIEOBS, optional
+            | CMF set to use. 
+        :cct_min, cct_max, cct_step:
+            | 1000.0, 25000.0, 10.0, optional
+            | Uniform CCT grid of the table.
+            
+    Returns:
+        :table:
+            | dict with keys:
+            |  - 'cct': ndarray with CCTs (.shape = (number of ccts,))
+            |  - 'xyz': ndarray with relative xyz of blood 
+            |           (.shape = (number of rfls, number of ccts, 3))
+            |  - 'xyzw': ndarray with relative xyz of the blackbodies
+            |           (.shape = (number of ccts, 3))
+            
+    Note:
+        Tristimulus values for a set of CCTs can be obtained in O(1) per CCT 
+        using linear interpolation on the uniform CCT grid 
+        (see spd_to_COI_ASNZS1680_batch() with cct_ref = None).
+    """
+    if wl is None:
+        wl = _COI_RFL_BLOOD[0]
+    wl = np.asarray(wl, dtype = float)
+    key = (wl.tobytes(), cieobs, float(cct_min), float(cct_max), float(cct_step))
+    def fcn():
+        ccts = np.arange(int(round((cct_max - cct_min)/cct_step)) + 1)*cct_step + cct_min
+        xyz, xyzw = _spd_to_xyz_blood(_blackbodies(ccts, wl), _get_COI_kernels(wl, cieobs = cieobs))
+        return {'cct' : ccts, 'xyz' : xyz, 'xyzw' : xyzw}
+    return _cache_get(_COI_CACHE['ref_tables'], key, fcn)
+
+def _lookup_COI_ref_table(table, ccts):
+    """
+    Get relative xyz of blood and blackbodies for ccts by (O(1)) linear 
+    interpolation in the uniform CCT grid of the reference table.
+    """
+    cct_grid = table['cct']
+    f = np.clip((np.asarray(ccts, dtype = float).ravel() - cct_grid[0])/(cct_grid[1] - cct_grid[0]), 0, cct_grid.shape[0] - 1)
+    i0 = np.floor(f).astype(int)
+    i1 = np.minimum(i0 + 1, cct_grid.shape[0] - 1)
+    w = (f - i0)[:,None]
+    xyz = table['xyz'][:,i0,:]*(1 - w) + table['xyz'][:,i1,:]*w
+    xyzw = table['xyzw'][i0,:]*(1 - w) + table['xyzw'][i1,:]*w
+    return xyz, xyzw
+
+def spd_to_COI_ASNZS1680_batch(S = None, tf = _COI_CSPACE, cieobs = _COI_CIEOBS, out = 'COI,cct', extrapolate_rfl = False, cct_ref = _COI_REF_CCT, chunk_size = 1000):
+    """
+    Calculate the Cyanosis Observation Index (COI) [ASNZS 1680.2.5-1995] 
+    for large sets of spectra.
+    
+    | Equivalent to spd_to_COI_ASNZS1680(), but the blood reflectance kernels 
+      (interpolated reflectances x CMFs x dl) and the tristimulus values of 
+      the reference are calculated only once for the wavelength grid of S 
+      (and cached), CCTs are calculated in a vectorized way and the spectra 
+      are processed in chunks (S can be a numpy.memmap).
+    
+    Args:
+        :S:
+            | ndarray with light source spectra (first row are wavelengths).
+        :tf:
+            | _COI_CSPACE, optional
+            | Color space in which to calculate the COI.
+            | Default is CIELAB.
+        :cieobs: 
+            | _COI_CIEOBS, optional
+            | CMF set to use. 
+            | Default is '1931_2'.
+        :out: 
+            | 'COI,cct' or str, optional
+            | Determines output.
+        :extrapolate_rfl:
+            | False, optional
+            | If False: 
+            |  limit the wavelength range of the source to that of the standard
+            |  reflectance spectra for the 50% and 100% oxygenated blood.
+        :cct_ref:
+            | _COI_REF_CCT (4000 K), optional
+            | CCT of blackbody reference illuminant. 
+            | If None: use a blackbody with the same CCT as the source, whose
+            |  blood tristimulus values are obtained from the (cached) 
+            |  reference table (see get_COI_ref_table()).
+            | Note that the standard uses a fixed 4000 K reference.
+        :chunk_size:
+            | 1000, optional
+            | Number of spectra processed at once.
+            
+    Returns:
+        :COI:
+            | ndarray with cyanosis indices for input sources.
+        :cct:
+            | ndarray with correlated color temperatures.
+    """
+    if S is None: #use default
+        S = _CIE_ILLUMINANTS['F4']
+    
+    wl = np.asarray(S[0], dtype = float)
+    idx_wl = _crop_wl(wl, extrapolate_rfl = extrapolate_rfl)
+    wl = wl[idx_wl]
+    kernel = _get_COI_kernels(wl, cieobs = cieobs)
+    
+    # Calculate xyz of blood under fixed reference:
+    if cct_ref is not None:
+        xyzr, xyzwr = _spd_to_xyz_blood(_blackbodies(cct_ref, wl), kernel)
+    else:
+        table = get_COI_ref_table(wl = wl, cieobs = cieobs)
+    
+    n = S.shape[0] - 1
+    COI = np.empty((n,1))
+    cct = np.empty((n,1))
+    for s in range(0, n, chunk_size):
+        St = np.asarray(S[1 + s: 1 + s + chunk_size])[:,idx_wl]
+        
+        # Calculate xyz of blood under test source:
+        xyzt, xyzwt = _spd_to_xyz_blood(St, kernel)
+
+        # Calculate cct:
+        if ('cct' in out.split(',')) | (cct_ref is None):
+            cct[s:s + chunk_size] = xyz_to_cct(xyzwt, cieobs = cieobs, out = 'cct')
+
+        # Calculate xyz of blood under reference with same cct as source: 
+        if cct_ref is None:
+            xyzr, xyzwr = _lookup_COI_ref_table(table, cct[s:s + chunk_size])
+
+        # Calculate color difference between blood under test and ref.
+        DEi = deltaE.DE_cspace(xyzt, xyzr, xyzwt = xyzwt, xyzwr = xyzwr, tf = tf)
+    
+        # Calculate Cyanosis Observation Index:
+        COI[s:s + chunk_size] = np.nanmean(DEi, axis = 0)[:,None]
+
+    # manage output:
+    if out == 'COI':
+        return COI
+    elif out == 'COI,cct':
+        return COI, cct
+    else:
+        return eval(out)
+
     
 if __name__ == '__main__':
     # test
@@ -93,10 +93,37 @@ Module for calculation of cyanosis index (AS/NZS 1680.2.5:1997)
                    oxygenated blood
  :spd_to_COI_ASNZS1680: Calculate the Cyanosis Observartion Index (COI) 
                         [ASNZS 1680.2.5-1995] 
+ :get_COI_ref_table: Get (cached) table with tristimulus values of blood under
+                     blackbody radiators as a function of CCT.
+ :spd_to_COI_ASNZS1680_batch: Calculate the Cyanosis Observartion Index (COI) 
+                              [ASNZS 1680.2.5-1995] for large sets of spectra.
 
 Reference:
     AS/NZS1680.2.5 (1997). INTERIOR LIGHTING PART 2.5: HOSPITAL AND MEDICAL TASKS.
 
+
+Module for batch calculation of photobiological metrics
+=======================================================
+
+ :PhotoBioMetrics: Prepared photobiological metrics object: the action
+                   spectra and (LRC) efficiency functions are resampled
+                   once to the wavelength grid of the spectra, after which
+                   α-opic irradiances, equivalent illuminances,
+                   (α-opic) equivalent daylight illuminances (EDI),
+                   efficacies of luminous radiation (ELR),
+                   Circadian Light (CLa) and Circadian Stimulus (CS)
+                   are calculated for batches of spectra in a single pass.
+
+ :PhotoBioDose: Streaming accumulator of (cumulative and windowed) α-opic,
+                EDI and circadian (CS, CLa) doses for time series of spectra.
+
+ :iter_spectra_chunks(): Generator of chunks of timestamped spectra from
+                         (memory-mapped) arrays.
+
+ :iter_photobio_dose(): Generator of per-sample photobiological metrics and
+                        running/windowed doses for a stream of chunks of
+                        timestamped spectra.
+
 .. codeauthor:: Kevin A.G. Smet (ksmet1977 at gmail.com)
 """
 from .cie_tn003_2015 import *
@@ -107,3 +134,6 @@ __all__ += ASNZS_1680_2_5_1997_COI.__all__
 
 from .circadian_CS_CLa_lrc import *
 __all__ += circadian_CS_CLa_lrc.__all__
+
+from .photobio_metrics import *
+__all__ += photobio_metrics.__all__
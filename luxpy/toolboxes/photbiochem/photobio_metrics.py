@@ -0,0 +1,404 @@
+# -*- coding: utf-8 -*-
+########################################################################
+# <LUXPY: a Python package for lighting and color science.>
+# Copyright (C) <2017>  <Kevin A.G. Smet> (ksmet1977 at gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+"""
+Module for batch calculation of photobiological metrics
+=======================================================
+
+ :PhotoBioMetrics: Prepared photobiological metrics object: the action
+                   spectra and (LRC) efficiency functions are resampled
+                   once to the wavelength grid of the spectra, after which
+                   α-opic irradiances, equivalent illuminances,
+                   (α-opic) equivalent daylight illuminances (EDI),
+                   efficacies of luminous radiation (ELR),
+                   Circadian Light (CLa) and Circadian Stimulus (CS)
+                   are calculated for batches of spectra in a single pass.
+
+ :PhotoBioDose: Streaming accumulator of (cumulative and windowed) α-opic,
+                EDI and circadian (CS, CLa) doses for time series of spectra.
+
+ :iter_spectra_chunks(): Generator of chunks of timestamped spectra from
+                         (memory-mapped) arrays.
+
+ :iter_photobio_dose(): Generator of per-sample photobiological metrics and
+                        running/windowed doses for a stream of chunks of
+                        timestamped spectra.
+
+.. codeauthor:: Kevin A.G. Smet (ksmet1977 at gmail.com)
+"""
+from luxpy import (np, interpolate, _CIEOBS, _CIE_ILLUMINANTS, spd, getwlr, getwld,
+                   vlbar, cie_interp, spd_to_power)
+from .cie_tn003_2015 import _ACTIONSPECTRA, Km_correction_factor, spd_to_aopicE
+from .circadian_CS_CLa_lrc import _LRC_CLA_CS_CONST
+
+__all__ = ['PhotoBioMetrics','PhotoBioDose','iter_spectra_chunks','iter_photobio_dose']
+
+_LRC_EFF_FCNS = ['Vphotl', 'Vscotl', 'Vl_mpl', 'Scl_mpl', 'Mcl']
+
+def _get_interp_matrix(wl, wl_new, kind = 'cubic'):
+    """
+    Get matrix for interpolation (and CIE-conform extrapolation by
+    replicating the closest known value) of spectral data from wl to wl_new
+    (.shape = (number of wavelengths in wl_new, number of wavelengths in wl)).
+    """
+    I = np.eye(wl.shape[0])
+    W = interpolate.interp1d(wl, I, kind = kind, axis = 0, bounds_error = False)(wl_new)
+    W[wl_new < wl[0]] = I[0]
+    W[wl_new > wl[-1]] = I[-1]
+    return W
+
+class PhotoBioMetrics():
+    """
+    Prepared photobiological metrics for spectra on a fixed wavelength grid.
+
+    | The CIE TN003:2015 action spectra, V(λ) and the LRC (Rea et al. 2012)
+      efficiency functions are resampled once to the wavelength grid :wl:.
+      All metrics of a batch of spectra are then obtained from a single
+      matrix product (see spd_to_aopicE() and spd_to_CS_CLa_lrc()).
+
+    Args:
+        :wl:
+            | ndarray with wavelengths of the spectra (or [start, end, spacing]).
+        :cieobs:
+            | _CIEOBS or str, optional
+            | Type of cmf set to use for photometric units.
+        :sid_units:
+            | 'W/m2', optional
+            | Other option 'uW/cm2', input units of the spectra.
+        :interpolate_sources:
+            | True, optional
+            |  - True: spectra are interpolated to wavelength range of the LRC
+            |          efficiency functions (as in LRC calculator) for the
+            |          calculation of CLa and CS.
+            |  - False: efficiency functions are interpolated to :wl:.
+
+    Note:
+        1. The (α-opic) equivalent daylight illuminance EDI is the
+        illuminance of D65 that has the same α-opic irradiance:
+        EDI = Ee,α / ELR(D65), with the efficacy of luminous radiation
+        ELR = Ee,α / E (W/lm).
+    """
+    def __init__(self, wl, cieobs = _CIEOBS, sid_units = 'W/m2', interpolate_sources = True):
+        if sid_units not in ('W/m2', 'uW/cm2'):
+            raise Exception("PhotoBioMetrics(): {} unsupported units for SID.".format(sid_units))
+        self.wl = getwlr(wl)
+        self.cieobs = cieobs
+        self.sid_units = sid_units
+        self.interpolate_sources = interpolate_sources
+        dl = getwld(self.wl)
+
+        # get SI actinic action spectra, sa, and V(lambda) (cfr. spd_to_aopicE()):
+        sa = spd(_ACTIONSPECTRA, wl = self.wl, interpolation = 'cmf', norm_type = 'max')
+        Vl, Km = vlbar(cieobs = cieobs, wl_new = self.wl, out = 2)
+        self.sa = sa
+
+        # weights for all alpha-opic Ee's and E (photometric units with Km corrected to standard air):
+        self._W = np.vstack((sa[1:]*dl, Km*Km_correction_factor*Vl[1:]*dl))
+
+        # conversion factors of alpha-opic Ee's to equivalent alpha-opic E's:
+        self._Eas_f = Km*Km_correction_factor*(Vl[1].sum()/sa[1:].sum(axis = 1))
+
+        # efficacy of luminous radiation of D65 (for EDI):
+        Eeas_D65 = spd_to_aopicE(_CIE_ILLUMINANTS['D65'].copy(), cieobs = cieobs, out = 'Eeas')
+        E_D65 = spd_to_power(_CIE_ILLUMINANTS['D65'], cieobs = cieobs, ptype = 'pusa')
+        self.ELR_D65 = (Eeas_D65/E_D65)[0]
+
+        # LRC model parameters and efficiency function weights:
+        self.cs_cl_lrs = _LRC_CLA_CS_CONST['CLa'].copy()
+        if interpolate_sources == True:
+            wl_lrc = self.cs_cl_lrs['WL']
+            self._W_interp = _get_interp_matrix(self.wl, wl_lrc, kind = 'cubic') # cfr. cie_interp(..., kind = 'spd')
+            dl_lrc = getwld(wl_lrc)
+            self._W_lrc = np.vstack([self.cs_cl_lrs[key]*dl_lrc for key in _LRC_EFF_FCNS])
+        else:
+            self._W_interp = None
+            self._W_lrc = np.vstack([cie_interp(np.vstack((self.cs_cl_lrs['WL'],self.cs_cl_lrs[key])), self.wl, kind = 'cmf')[1]*dl for key in _LRC_EFF_FCNS])
+
+    def _get_CLa(self, Elv_lrc, E = None):
+        """
+        Calculate CLa from the integrals of the efficiency functions
+        (cfr. fCLa()).
+        """
+        c = self.cs_cl_lrs
+        Vphot, Vscot, Vl_mp, Scl_mp, Mc = Elv_lrc.T
+
+        # Rescale to supplied E:
+        if E is not None:
+            f = (np.asarray(E, dtype = float)*np.ones(Vphot.shape))/(683*Vphot)
+            Vphot, Vscot, Vl_mp, Scl_mp, Mc = Vphot*f, Vscot*f, Vl_mp*f, Scl_mp*f, Mc*f
+
+        cond_number = Scl_mp - c['k']*Vl_mp
+        fcn1_3 = c['a_rod'] * (1 - np.exp(-Vscot/c['RodSat']))
+        return c['Norm']*(Mc + 1*(cond_number>=0)*(c['a_b_y']*cond_number) - fcn1_3)
+
+    def compute(self, sid, E = None, out = 'Eeas,Eas'):
+        """
+        Calculate photobiological metrics of a batch of spectra.
+
+        Args:
+            :sid:
+                | ndarray with spectral irradiances on the wavelengths of
+                  the object (.shape = (N, number of wavelengths);
+                  no wavelengths in first row!)
+            :E:
+                | None, float or ndarray, optional
+                | Illuminance of spectra for CLa and CS calculation
+                  (cfr. spd_to_CS_CLa_lrc()).
+                | If None: spectra are used as is.
+            :out:
+                | 'Eeas,Eas' or str, optional
+                | Determines values to return. Options:
+                |   - 'Eeas': α-opic irradiances (.shape = (N,5))
+                |   - 'Eas': α-opic equivalent illuminances (.shape = (N,5))
+                |   - 'E': illuminances (.shape = (N,))
+                |   - 'EDI': α-opic equivalent daylight illuminances (.shape = (N,5))
+                |   - 'ELR': α-opic efficacies of luminous radiation (.shape = (N,5))
+                |   - 'CLa', 'CS': Circadian Light and Circadian Stimulus (.shape = (N,))
+
+        Returns:
+            :returns:
+                | ndarray(s) with metrics requested in :out:.
+        """
+        outlist = out.split(',')
+        sid = np.atleast_2d(sid)
+
+        # Convert to Watt/m²:
+        if self.sid_units == 'uW/cm2':
+            sid = sid/100
+
+        # Calculate all alpha-opic Ee's and E:
+        EeasE = np.dot(sid, self._W.T)
+        Eeas, E_ = EeasE[:,:5], EeasE[:,5]
+        Eas = Eeas*self._Eas_f
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            ELR = Eeas/E_[:,None]
+        EDI = Eeas/self.ELR_D65
+
+        # Calculate Circadian light and Circadian stimulus:
+        if ('CLa' in outlist) | ('CS' in outlist):
+            if self._W_interp is not None:
+                Elv = np.dot(sid, self._W_interp.T)
+                Elv[Elv < 0] = 0 # (cfr. cie_interp())
+            else:
+                Elv = sid
+            CLa = self._get_CLa(np.dot(Elv, self._W_lrc.T), E = E)
+            CS = 0.7 * (1 - (1/(1 + (CLa/355.7)**1.1026)))
+
+        E = E_
+        if out == 'Eeas,Eas':
+            return Eeas, Eas
+        elif out == 'Eeas':
+            return Eeas
+        else:
+            return eval(out)
+
+#------------------------------------------------------------------------------
+def _split_dose_quantities(q):
+    """
+    Split array with (..., 12) dose quantities in dict.
+    """
+    return {'Eeas' : q[...,:5], 'EDI' : q[...,5:10], 'CS' : q[...,10], 'CLa' : q[...,11]}
+
+class PhotoBioDose():
+    """
+    Streaming accumulator of α-opic, EDI and circadian doses for a time 
+    series of spectra.
+    
+    | Chunks of timestamped spectra are processed with update(). Per sample,
+      α-opic irradiances Eeas, EDI's, CLa and CS are calculated 
+      (see PhotoBioMetrics). Running time integrals (trapezoidal rule) and 
+      integrals over fixed time windows are maintained, so memory use 
+      does not depend on the length of the recording.
+      
+    Args:
+        :wl:
+            | ndarray with wavelengths of the spectra (or [start, end, spacing]).
+        :cieobs, sid_units, interpolate_sources:
+            | see PhotoBioMetrics
+        :window:
+            | 3600, optional
+            | Duration (in units of the timestamps, e.g. s) of the (fixed, 
+              non-overlapping) aggregation windows. Windows start at 
+              multiples of :window:.
+            | None: don't calculate windowed aggregates.
+        :max_gap:
+            | None, optional
+            | Time intervals between consecutive samples longer than :max_gap:
+              (e.g. sensor off) are excluded from the integrals.
+              
+    Note:
+        Doses are time integrals in the units of the quantity times the unit
+        of the timestamps (e.g. J/m² for Eeas and lx.s for EDI with 
+        timestamps in s). Mean values are time-weighted averages.
+    """
+    def __init__(self, wl, cieobs = _CIEOBS, sid_units = 'W/m2', interpolate_sources = True, 
+                 window = 3600, max_gap = None):
+        self.metrics = PhotoBioMetrics(wl, cieobs = cieobs, sid_units = sid_units, interpolate_sources = interpolate_sources)
+        self.window = window
+        self.max_gap = max_gap
+        self.n = 0
+        self.duration = 0.0
+        self.integral = np.zeros(12)
+        self._t_last = None
+        self._q_last = None
+        self._win_idx = None
+        self._win_integral = np.zeros(12)
+        self._win_duration = 0.0
+        
+    def _close_window(self):
+        """
+        Get aggregates of current window and reset window integrals.
+        """
+        win = {'t_start' : self._win_idx*self.window, 'duration' : self._win_duration,
+               'dose' : _split_dose_quantities(self._win_integral.copy()),
+               'mean' : _split_dose_quantities(self._win_integral/self._win_duration if self._win_duration > 0 else self._win_integral*np.nan)}
+        self._win_integral = np.zeros(12)
+        self._win_duration = 0.0
+        return win
+        
+    def update(self, t, sid):
+        """
+        Process chunk of timestamped spectra.
+        
+        Args:
+            :t:
+                | ndarray with (increasing) timestamps of spectra (.shape = (N,))
+            :sid:
+                | ndarray with spectral irradiances (.shape = (N, number of 
+                  wavelengths); no wavelengths in first row!)
+                
+        Returns:
+            :res:
+                | dict with keys:
+                |   - 't': timestamps
+                |   - 'Eeas', 'EDI', 'CS', 'CLa': per sample metrics.
+                |   - 'windows': list with aggregates (dicts with keys 
+                |                't_start', 'duration', 'dose', 'mean') of 
+                |                windows completed in this chunk.
+        """
+        t = np.asarray(t, dtype = float).ravel()
+        Eeas, EDI, CLa, CS = self.metrics.compute(sid, out = 'Eeas,EDI,CLa,CS')
+        q = np.hstack((Eeas, EDI, CS[:,None], CLa[:,None]))
+        
+        # Trapezoidal integration over intervals (incl. interval with last sample of previous chunk):
+        if self._t_last is not None:
+            tt, qq = np.hstack((self._t_last, t)), np.vstack((self._q_last, q))
+        else:
+            tt, qq = t, q
+        dt = np.diff(tt)
+        valid = (dt > 0) if (self.max_gap is None) else ((dt > 0) & (dt <= self.max_gap))
+        dt = dt*valid
+        seg = 0.5*(qq[1:] + qq[:-1])*dt[:,None]
+        self.integral += seg.sum(axis = 0)
+        self.duration += dt.sum()
+        
+        # Aggregate intervals per window (interval assigned to window of its start):
+        windows = []
+        if (self.window is not None) & (dt.shape[0] > 0):
+            widx = np.floor(tt[:-1]/self.window).astype(np.int64)
+            starts = np.hstack((0, np.flatnonzero(np.diff(widx)) + 1))
+            sums, durs = np.add.reduceat(seg, starts, axis = 0), np.add.reduceat(dt, starts)
+            for k, i in enumerate(starts):
+                if widx[i] != self._win_idx:
+                    if self._win_idx is not None:
+                        windows.append(self._close_window())
+                    self._win_idx = widx[i]
+                self._win_integral += sums[k]
+                self._win_duration += durs[k]
+        
+        self.n += t.shape[0]
+        if t.shape[0] > 0:
+            self._t_last, self._q_last = t[-1:], q[-1:]
+        return {'t' : t, 'Eeas' : Eeas, 'EDI' : EDI, 'CS' : CS, 'CLa' : CLa, 'windows' : windows}
+    
+    def finalize(self):
+        """
+        Get aggregates of the last (incomplete) window (None if no window).
+        """
+        if (self.window is None) | (self._win_idx is None):
+            return None
+        win = self._close_window()
+        self._win_idx = None
+        return win
+    
+    def summary(self):
+        """
+        Get dict with number of samples, total (integrated) duration, 
+        cumulative doses and time-weighted mean values.
+        """
+        mean = self.integral/self.duration if self.duration > 0 else self.integral*np.nan
+        return {'n' : self.n, 'duration' : self.duration, 
+                'dose' : _split_dose_quantities(self.integral.copy()),
+                'mean' : _split_dose_quantities(mean)}
+
+def iter_spectra_chunks(t, sid, chunk_size = 3600):
+    """
+    Generator of chunks of timestamped spectra.
+    
+    Args:
+        :t:
+            | ndarray with timestamps (.shape = (N,))
+        :sid:
+            | ndarray or numpy.memmap or str with spectral irradiances 
+              (.shape = (N, number of wavelengths)).
+            | If str: filename of .npy file (opened as memory map).
+        :chunk_size:
+            | 3600, optional
+            | Number of spectra per chunk.
+            
+    Returns:
+        :returns:
+            | generator yielding (t, sid) for each chunk.
+    """
+    if isinstance(sid, str):
+        sid = np.load(sid, mmap_mode = 'r')
+    for i in range(0, sid.shape[0], chunk_size):
+        yield np.asarray(t[i:i + chunk_size]), np.asarray(sid[i:i + chunk_size])
+
+def iter_photobio_dose(chunks, wl, cieobs = _CIEOBS, sid_units = 'W/m2', interpolate_sources = True, 
+                       window = 3600, max_gap = None):
+    """
+    Generator of per-sample photobiological metrics and running/windowed
+    doses for a stream of chunks of timestamped spectra.
+    
+    Args:
+        :chunks:
+            | iterable yielding (t, sid) chunks (e.g. iter_spectra_chunks()).
+        :wl, cieobs, sid_units, interpolate_sources, window, max_gap:
+            | see PhotoBioDose
+    
+    Returns:
+        :returns:
+            | generator yielding for each chunk the dict returned by 
+              PhotoBioDose.update() with the running summary 
+              (PhotoBioDose.summary()) added under key 'summary'.
+            | After the last chunk, the last (incomplete) window is included
+              in the 'windows' list of the last yielded dict.
+    """
+    dose = PhotoBioDose(wl, cieobs = cieobs, sid_units = sid_units, interpolate_sources = interpolate_sources, 
+                        window = window, max_gap = max_gap)
+    res = None
+    for t, sid in chunks:
+        if res is not None:
+            yield res
+        res = dose.update(t, sid)
+        res['summary'] = dose.summary()
+    if res is not None:
+        win = dose.finalize()
+        if win is not None:
+            res['windows'].append(win)
+        yield res
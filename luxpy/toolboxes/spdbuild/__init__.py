@@ -26,6 +26,9 @@ Module for building and optimizing SPDs
  :mono_led_spd(): Generate monochromatic LED spectrum based on a Gaussian 
                   or butterworth profile or according to Ohno (Opt. Eng. 2005).
 
+ :led_spd_grid(): | Generate (phosphor) LED spectra for all combinations
+                 | (grid) of the model parameters (chunked, optionally to disk).
+
  :spd_builder(): Build spectrum based on Gaussians, monochromatic 
                  and/or phophor LED spectra.
 
@@ -35,13 +38,28 @@ Module for building and optimizing SPDs
  :colormixer(): Calculate fluxes required to obtain a target chromaticity 
                 when (additively) mixing N light sources.
 
+ :colormixer_batch(): | Calculate fluxes required to obtain an array of target 
+                     | chromaticities when (additively) mixing N light sources
+                     | (vectorized, with in-gamut mask).
+
  :spd_builder(): Build spectrum based on Gaussians, monochromatic 
                  and/or phophor LED-type spectra.
                    
  :get_w_summed_spd(): Calculate weighted sum of spds.
+
+ :get_w_summed_spd_metrics(): | Calculate metrics (Rf, Rg, cct, duv, XYZ, xy) 
+                              | of weighted sums of spds and their gradients
+                              | with respect to the weights (fluxes).
  
+ :FitnessTrace: | Evaluation trace and (bounded) memo cache of fitness 
+                | evaluations (for fitnessfcn and fitnessfcn_pop).
+
  :fitnessfcn(): Fitness function that calculates closeness of solution x to 
                 target values for specified objective functions.
+
+ :fitnessfcn_pop(): Population-level fitness function that calculates closeness 
+                    of a population of solutions X to target values for 
+                    specified objective functions (vectorized over spds).
          
  :spd_constructor_2(): Construct spd from spectral model parameters 
                        using pairs of intermediate sources.
@@ -13,6 +13,9 @@ Functions
  :mono_led_spd(): Generate monochromatic LED spectrum based on a Gaussian 
                   or butterworth profile or according to Ohno (Opt. Eng. 2005).
 
+ :led_spd_grid(): | Generate (phosphor) LED spectra for all combinations
+                 | (grid) of the model parameters (chunked, optionally to disk).
+
  :spd_builder(): Build spectrum based on Gaussians, monochromatic 
                  and/or phophor LED spectra.
 
@@ -22,13 +25,28 @@ Functions
  :colormixer(): Calculate fluxes required to obtain a target chromaticity 
                 when (additively) mixing N light sources.
 
+ :colormixer_batch(): | Calculate fluxes required to obtain an array of target 
+                     | chromaticities when (additively) mixing N light sources
+                     | (vectorized, with in-gamut mask).
+
  :spd_builder(): Build spectrum based on Gaussians, monochromatic 
                  and/or phophor LED-type spectra.
                    
  :get_w_summed_spd(): Calculate weighted sum of spds.
+
+ :get_w_summed_spd_metrics(): | Calculate metrics (Rf, Rg, cct, duv, XYZ, xy) 
+                              | of weighted sums of spds and their gradients
+                              | with respect to the weights (fluxes).
  
+ :FitnessTrace: | Evaluation trace and (bounded) memo cache of fitness 
+                | evaluations (for fitnessfcn and fitnessfcn_pop).
+
  :fitnessfcn(): Fitness function that calculates closeness of solution x to 
                 target values for specified objective functions.
+
+ :fitnessfcn_pop(): Population-level fitness function that calculates closeness 
+                    of a population of solutions X to target values for 
+                    specified objective functions (vectorized over spds).
          
  :spd_constructor_2(): Construct spd from spectral model parameters 
                        using pairs of intermediate sources.
@@ -65,16 +83,20 @@ References
 
 .. codeauthor:: Kevin A.G. Smet (ksmet1977 at gmail.com)
 """
-from luxpy import (np, plt, warnings, minimize, math, _WL3, _CIEOBS, _EPS, np2d, 
+from luxpy import (np, plt, warnings, odict, minimize, math, _WL3, _CIEOBS, _EPS, np2d, 
                    vec_to_dict, getwlr, SPD, plotSL, 
-                   spd_to_xyz, xyz_to_Yxy, Yxy_to_xyz, colortf, xyz_to_cct)
+                   spd_to_xyz, xyz_to_Yxy, Yxy_to_xyz, colortf, xyz_to_cct, parallel_map)
 from luxpy import cri 
 import itertools
+import time
+from scipy.spatial import Delaunay
+from functools import partial
 
 #np.set_printoptions(formatter={'float': lambda x: "{0:0.2e}".format(x)})
 
-__all__ = ['gaussian_spd','mono_led_spd','phosphor_led_spd','spd_builder',
-         'get_w_summed_spd','fitnessfcn','spd_constructor_2',
+__all__ = ['gaussian_spd','butterworth_spd','mono_led_spd','phosphor_led_spd','led_spd_grid','spd_builder',
+         'color3mixer','colormixer','colormixer_batch',
+         'get_w_summed_spd','get_w_summed_spd_metrics','FitnessTrace','fitnessfcn','fitnessfcn_pop','spd_constructor_2',
          'spd_constructor_3','spd_optimizer_2_3','get_optim_pars_dict',
          'initialize_spd_model_pars','initialize_spd_optim_pars','spd_optimizer']
 
@@ -183,7 +205,7 @@ def mono_led_spd(peakwl = 530, fwhm = 20, wl = _WL3, with_wl = True, strength_sh
         | Ohno's model:
         |    ohno = (g + strength_shoulder*g**5)/(1+strength_shoulder)
         |     
-        |    mono_led_spd = ohno*(bw_order == 0) + bw*(bw_order > 0)
+        |    mono_led_spd = ohno*(bw_order <= 0) + bw*(bw_order > 0)
     
     Reference:
         1. `Ohno Y (2005). 
@@ -193,13 +215,14 @@ def mono_led_spd(peakwl = 530, fwhm = 20, wl = _WL3, with_wl = True, strength_sh
 
     """
     g = gaussian_spd(peakwl = peakwl, fwhm = fwhm, wl = wl, with_wl = False)
-    ohno = (g + np.atleast_2d(strength_shoulder)*g**5)/(1+np.atleast_2d(strength_shoulder))
+    strength_shoulder = np.atleast_2d(strength_shoulder).T
+    ohno = (g + strength_shoulder*g**5)/(1+strength_shoulder)
     bw_order = np.atleast_2d(bw_order)
     if (bw_order == -1).all():
         spd = ohno
     else:
         bw = butterworth_spd(peakwl = peakwl, fwhm = fwhm, wl = wl, bw_order = bw_order, with_wl = False)
-        spd = ohno*(bw_order == 0).T + bw*(bw_order > 0).T
+        spd = ohno*(bw_order <= 0).T + bw*(bw_order > 0).T
     if with_wl == True:
         spd = np.vstack((getwlr(wl), spd))
     return spd
@@ -308,12 +331,14 @@ def phosphor_led_spd(peakwl = 450, fwhm = 20, wl = _WL3, bw_order = -1, with_wl
         
     mono_led = mono_led_spd(peakwl = peakwl, fwhm = fwhm, wl = wl, bw_order = bw_order, with_wl = False, strength_shoulder = strength_shoulder)
     wl = getwlr(wl)
+    component_spds = None
     if strength_ph is not None:
         strength_ph = np.atleast_2d(strength_ph)
         if ((strength_ph > 0).any()): # Use phophor type led for obtaining target:
             ph1 = mono_led_spd(peakwl = peakwl_ph1, fwhm = fwhm_ph1, wl = wl, with_wl = False, strength_shoulder = 1)
             ph2 = mono_led_spd(peakwl = peakwl_ph2, fwhm = fwhm_ph2, wl = wl, with_wl = False, strength_shoulder = 1)
-            component_spds = np.dstack((mono_led,ph1,ph2))
+            if ('component_spds' in out.split(',')):
+                component_spds = np.dstack((mono_led,ph1,ph2))
            
             if ('spd' in out.split(',')):
                 strength_ph1 = np.atleast_2d(strength_ph1)
@@ -336,14 +361,16 @@ def phosphor_led_spd(peakwl = 450, fwhm = 20, wl = _WL3, bw_order = -1, with_wl
             ph2 = None
             phosphors = None
             spd = mono_led.copy()
-            component_spds = mono_led[:,:,None].T.copy()
+            if ('component_spds' in out.split(',')):
+                component_spds = mono_led[:,:,None].T.copy()
     
     else: # Only monochromatic leds:
         ph1 = None
         ph2 = None
         phosphors = None
         spd = mono_led.copy()
-        component_spds = mono_led[:,:,None].T.copy()
+        if ('component_spds' in out.split(',')):
+            component_spds = mono_led[:,:,None].T.copy()
 
 
     if (use_piecewise_fcn == True):
@@ -361,7 +388,8 @@ def phosphor_led_spd(peakwl = 450, fwhm = 20, wl = _WL3, bw_order = -1, with_wl
 
     # Normalize to max = 1:
     spd = spd/spd.max(axis = 1, keepdims = True)
-    component_spds = component_spds/component_spds.max(axis=1,keepdims=True)
+    if component_spds is not None:
+        component_spds = component_spds/component_spds.max(axis=1,keepdims=True)
 
     if verbosity > 0:
         mono_led_str = 'Mono_led_1'
@@ -383,7 +411,8 @@ def phosphor_led_spd(peakwl = 450, fwhm = 20, wl = _WL3, bw_order = -1, with_wl
 
     if (with_wl == True):
         spd = np.vstack((wl, spd))
-        component_spds = np.vstack((wl, component_spds))
+        if component_spds is not None:
+            component_spds = np.vstack((wl, component_spds))
 
     if out == 'spd':
         return spd
@@ -392,6 +421,104 @@ def phosphor_led_spd(peakwl = 450, fwhm = 20, wl = _WL3, bw_order = -1, with_wl
     elif out == 'spd,component_spds':
         return spd, component_spds
 
+#------------------------------------------------------------------------------
+def led_spd_grid(peakwl = 450, fwhm = 20, bw_order = -1, strength_shoulder = 2,\
+                 strength_ph = 0, peakwl_ph1 = 530, fwhm_ph1 = 80, strength_ph1 = 1,\
+                 peakwl_ph2 = 560, fwhm_ph2 = 80, strength_ph2 = None,\
+                 wl = _WL3, use_piecewise_fcn = False, dtype = np.float32,\
+                 chunk_size = 10000, filename = None, out = 'spds'):
+    """
+    Generate (phosphor) LED spectra for all combinations (grid) of the model 
+    parameters.
+    
+    | Spectra are calculated with phosphor_led_spd() (out = 'spd'), but all 
+      parameter values are combined (cartesian product) and the spectra are 
+      calculated in chunks and written directly into a single 
+      (n_combinations, n_wl) array (or a .npy file on disk).
+    
+    Args:
+        :peakwl, fwhm, bw_order, strength_shoulder, strength_ph, 
+        :peakwl_ph1, fwhm_ph1, strength_ph1, peakwl_ph2, fwhm_ph2, strength_ph2:
+            | int or float or list or ndarray, optional
+            | Values of each model parameter to combine.
+            | (see ?phosphor_led_spd for more info on each parameter)
+        :wl: 
+            | _WL3, optional 
+            | Wavelength range.
+        :use_piecewise_fcn:
+            | False, optional
+            | True: uses piece-wise function as in Smet et al. 2011.
+        :dtype:
+            | np.float32, optional
+            | Data type of the output spectra.
+        :chunk_size:
+            | 10000, optional
+            | Number of spectra calculated at once.
+        :filename:
+            | None, optional
+            | If not None: write spectra to a .npy file with this name 
+              (memory-mapped; can be (re)loaded with np.load(filename, mmap_mode = 'r'))
+              for grids that do not fit in memory.
+        :out: 
+            | 'spds', optional
+            | Specifies output: e.g. 'spds', 'spds,wl,pars'
+            
+    Returns:
+        :spds: 
+            | ndarray (or numpy.memmap if filename is not None) with 
+              normalized (max = 1) spectra (.shape = (n_combinations, n_wl)).
+            | Spectra are ordered as the cartesian product of the parameters 
+              (order of the arguments, last parameter varying fastest).
+        :wl:
+            | ndarray with wavelengths.
+        :pars: 
+            | dict with for each parameter an ndarray with its value for 
+              each spectrum.
+    """
+    # Parameter grid:
+    names = ['peakwl','fwhm','bw_order','strength_shoulder','strength_ph',
+             'peakwl_ph1','fwhm_ph1','strength_ph1','peakwl_ph2','fwhm_ph2','strength_ph2']
+    values = [peakwl, fwhm, bw_order, strength_shoulder, strength_ph,
+              peakwl_ph1, fwhm_ph1, strength_ph1, peakwl_ph2, fwhm_ph2, strength_ph2]
+    if strength_ph2 is None:
+        names, values = names[:-1], values[:-1]
+    values = [np.atleast_1d(v).astype(float).flatten() for v in values]
+    shape = tuple([v.shape[0] for v in values])
+    N = int(np.prod(shape))
+    wl = getwlr(wl)
+    
+    # Pre-allocate output:
+    if filename is None:
+        spds = np.empty((N, wl.shape[0]), dtype = dtype)
+    else:
+        spds = np.lib.format.open_memmap(filename, mode = 'w+', dtype = dtype, shape = (N, wl.shape[0]))
+    
+    for i in range(0, N, chunk_size):
+        
+        # Get parameter values for current chunk:
+        idx = np.unravel_index(np.arange(i, min(i + chunk_size, N)), shape)
+        p = dict([(names[j], values[j][idx[j]]) for j in range(len(names))])
+        
+        # Calculate (normalized) spectra with the phosphor led model:
+        spd = phosphor_led_spd(peakwl = p['peakwl'], fwhm = p['fwhm'], wl = wl, bw_order = p['bw_order'],\
+                               strength_shoulder = p['strength_shoulder'], strength_ph = p['strength_ph'],\
+                               peakwl_ph1 = p['peakwl_ph1'], fwhm_ph1 = p['fwhm_ph1'], strength_ph1 = p['strength_ph1'],\
+                               peakwl_ph2 = p['peakwl_ph2'], fwhm_ph2 = p['fwhm_ph2'], strength_ph2 = p.get('strength_ph2', None),\
+                               use_piecewise_fcn = use_piecewise_fcn, with_wl = False, out = 'spd')
+        
+        spds[i:i + spd.shape[0]] = spd
+    
+    if filename is not None:
+        spds.flush()
+    
+    if out == 'spds':
+        return spds
+    else:
+        if 'pars' in out.split(','):
+            idx = np.unravel_index(np.arange(N), shape)
+            pars = dict([(names[j], values[j][idx[j]]) for j in range(len(names))])
+        return eval(out)
+
 
 #------------------------------------------------------------------------------
 def spd_builder(flux = None, component_spds = None, peakwl = 450, fwhm = 20, bw_order = -1,\
@@ -399,7 +526,7 @@ def spd_builder(flux = None, component_spds = None, peakwl = 450, fwhm = 20, bw_
                 strength_ph = 0, peakwl_ph1 = 530, fwhm_ph1 = 80, strength_ph1 = 1,\
                 peakwl_ph2 = 560, fwhm_ph2 = 80, strength_ph2 = None,\
                 target = None, tar_type = 'Yuv', cspace_bwtf = {}, cieobs = _CIEOBS,\
-                use_piecewise_fcn = False, verbosity = 0, out = 'spd',**kwargs):
+                use_piecewise_fcn = False, verbosity = 0, out = 'spd', seed = None, **kwargs):
     """
     Build spectrum based on Gaussian, monochromatic and/or phophor type spectra.
            
@@ -468,6 +595,10 @@ def spd_builder(flux = None, component_spds = None, peakwl = 450, fwhm = 20, bw_
         :out: 
             | 'spd', optional
             | Specifies output.
+        :seed:
+            | None, optional
+            | None or int or numpy.random.RandomState used to draw random
+              pair_strengths (when :pair_strengths: is None).
         :use_piecewise_fcn:
             | False, optional
             | True: uses piece-wise function as in Smet et al. 2011. Can give 
@@ -555,10 +686,10 @@ def spd_builder(flux = None, component_spds = None, peakwl = 450, fwhm = 20, bw_
 
         # Calculate fluxes for obtaining target chromaticity:
         if component_spds.shape[0] == 1: # mono_led spectra can have more than 3 componenents
-            if pair_strengths is None:
-                M = np.asarray(np.nan)
-                while (np.isnan(M).any()) & (M.size!=3): #if outside of gamut for 3 components than it will always be outside of gamut
-                    M = colormixer(Yxyt = Yxyt, Yxyi = Yxyi, pair_strengths = pair_strengths)
+            if (pair_strengths is None) & (Yxyi.shape[0] > 3):
+                # Solve for a batch of random pair_strengths at once and keep first in-gamut solution:
+                M, in_gamut = colormixer_batch(Yxyt = Yxyt[:1], Yxyi = Yxyi, pair_strengths = _get_rng(seed).rand(100, Yxyi.shape[0] - 3))
+                M = M[np.argmax(in_gamut[:,0]),:,:] # all NaN if none in gamut
             else:
                 M = colormixer(Yxyt = Yxyt, Yxyi = Yxyi, pair_strengths = pair_strengths)
             M[np.isnan(M)] = -1
@@ -852,6 +983,170 @@ def colormixer(Yxyt = None, Yxyi = None, n = 4, pair_strengths = None, source_or
     return np.atleast_2d(M)
 
 
+_COLORMIXER_PAIR_TREES = {} # cache with pairing trees of colormixer_batch()
+
+def _get_colormixer_pair_tree(n, source_order = None):
+    """
+    Get the (pA,pB) index pairs of the intermediate sources (n + kk) and the 
+    indices of the final 3 sources as created by colormixer() for n sources.
+    (The tree only depends on the number of sources and their order, not on 
+    the pair strengths or chromaticities).
+    """
+    so = np.arange(n) if source_order is None else np.asarray(source_order, dtype = int).copy()
+    key = (n,) + tuple(so)
+    if key in _COLORMIXER_PAIR_TREES:
+        return _COLORMIXER_PAIR_TREES[key]
+    pairs = []
+    rem_so = so.copy()
+    N_sources = so.shape[0]
+    sn_k = -np.ones(int(n/2), dtype = int)
+    su_k = -np.ones((int(n/2),2), dtype = int)
+    k, kk = 0, 0
+    while (N_sources > 3):
+        pAB = np.hstack((so[2*k], so[2*k+1]))
+        pairs.append(pAB)
+        sn_k[k] = n + kk
+        su_k[k,:] = pAB
+        rem_so = np.hstack((np.setdiff1d(so, su_k),sn_k))
+        rem_so = rem_so[rem_so>=0]
+        N_sources = rem_so.shape[0]
+        nn = int(so.shape[0]/2)
+        if (k == nn - 1):
+            sn_k = -np.ones(nn, dtype = int)
+            su_k = -np.ones((nn,2),dtype = int)
+            so = rem_so.copy()
+            k = 0
+        else:
+            k += 1
+        kk += 1
+    _COLORMIXER_PAIR_TREES[key] = (np.array(pairs, dtype = int).reshape(-1,2), rem_so[:3])
+    return _COLORMIXER_PAIR_TREES[key]
+
+def _solve_3x3(A, b):
+    """
+    Solve A.M = b for M using Cramer's rule (vectorized).
+    
+    | A: ndarray (..., 3, 3) with columns the xyz of 3 sources.
+    | b: ndarray (..., 3) with target xyz.
+    | Singular systems result in NaN (or inf).
+    """
+    cross = lambda u, v: np.stack((u[...,1]*v[...,2] - u[...,2]*v[...,1],
+                                   u[...,2]*v[...,0] - u[...,0]*v[...,2],
+                                   u[...,0]*v[...,1] - u[...,1]*v[...,0]), axis = -1)
+    a0, a1, a2 = A[...,:,0], A[...,:,1], A[...,:,2]
+    c12, c20, c01 = cross(a1,a2), cross(a2,a0), cross(a0,a1)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        det = (a0*c12).sum(axis = -1)
+        return np.stack(((c12*b).sum(axis = -1), (c20*b).sum(axis = -1), (c01*b).sum(axis = -1)), axis = -1)/det[...,None]
+
+def colormixer_batch(Yxyt = None, Yxyi = None, pair_strengths = None, source_order = None, method = 'pairs', out = 'M,in_gamut'):
+    """
+    Calculate fluxes required to obtain an array of target chromaticities 
+    when (additively) mixing N light sources (vectorized version of colormixer).
+    
+    Args:
+        :Yxyt: 
+            | ndarray with target Yxy chromaticities (.shape = (Nt,3)).
+            | Defaults to equi-energy white.
+        :Yxyi:
+            | ndarray with Yxy chromaticities of light sources i = 1 to n.
+            | .shape = (n,3) or (Np,n,3) (only for method == 'pairs') for 
+              a different set of sources for each set of pair strengths.
+        :pair_strengths:
+            | None or ndarray with light source pair strengths, optional
+            | Only used when method == 'pairs'.
+            | .shape = (n-3,) or (Np, n-3) for Np sets of pair strengths.
+            | If None: use randomly generated pair strengths (as colormixer).
+        :source_order:
+            | ndarray with order of source components.
+            | If None: use np.arange(n)
+        :method:
+            | 'pairs', optional
+            | Options:
+            |  - 'pairs': combine (even,odd)-pairs of sources into intermediate 
+            |             sources using the pair strengths until 3 sources 
+            |             remain (same solution as colormixer, but solved in 
+            |             xyz-space for all targets at once).
+            |  - 'barycentric': Delaunay triangulate the source chromaticities
+            |             and mix the 3 sources of the triangle that contains 
+            |             the target. Any target within the gamut of the 
+            |             sources has a solution (max. 3 non-zero fluxes).
+        :out:
+            | 'M,in_gamut', optional
+            | Determines output.
+    
+    Returns:
+        :M: 
+            | ndarray with fluxes (.shape = (Nt, n) or (Np, Nt, n)).
+            | Out-of-gamut solutions are NaN.
+        :in_gamut:
+            | ndarray (bool) with in-gamut mask (.shape = (Nt,) or (Np, Nt)).
+    """
+    if Yxyt is None:
+        Yxyt = np.atleast_2d([100,1/3,1/3])
+    Yxyt = np.atleast_2d(Yxyt)
+    Yxyi = np.atleast_2d(Yxyi)
+    n = Yxyi.shape[-2]
+    if n < 3:
+        raise Exception('colormixer_batch(): At least 3 sources are required.')
+    xyzt = Yxy_to_xyz(Yxyt)
+    xyzi = Yxy_to_xyz(Yxyi)
+    
+    if method == 'pairs':
+        
+        # Get (fixed) pairing tree:
+        pairs, final3 = _get_colormixer_pair_tree(n, source_order = source_order)
+        
+        # Get composition of each intermediate source in terms of the original ones:
+        if pair_strengths is None:
+            pair_strengths = np.random.rand(n-3)
+        ps = np.atleast_2d(pair_strengths)
+        C = np.zeros((ps.shape[0], n + pairs.shape[0], n))
+        C[:,np.arange(n),np.arange(n)] = 1
+        for kk in range(pairs.shape[0]):
+            C[:,n + kk] = ps[:,kk:kk+1]*C[:,pairs[kk,0]] + (1 - ps[:,kk:kk+1])*C[:,pairs[kk,1]]
+        C3 = C[:,final3] # (Np, 3, n)
+        
+        # Solve fluxes of final 3 intermediate sources for all targets and back-calculate:
+        # (columns of A: xyz of final intermediate sources)
+        if xyzi.ndim == 3:
+            A = np.einsum('pjn,pnk->pkj', C3, xyzi) 
+        else:
+            A = np.transpose(np.dot(C3, xyzi), (0,2,1))
+        M3 = _solve_3x3(A[:,None], xyzt[None])  # (Np, Nt, 3)
+        in_gamut = (M3 >= 0).all(axis = -1) 
+        M = np.einsum('ptj,pjn->ptn', M3, C3)
+        if np.ndim(pair_strengths) < 2:
+            M, in_gamut = M[0], in_gamut[0]
+    
+    elif method == 'barycentric':
+        
+        # Find triangle of source chromaticities containing target:
+        tri = Delaunay(Yxyi[:,1:3])
+        s = tri.find_simplex(Yxyt[:,1:3])
+        in_gamut = s >= 0
+        vertices = tri.simplices[s] # (Nt, 3); only valid where in_gamut
+        
+        # Solve fluxes of triangle sources:
+        A = np.transpose(xyzi[vertices], (0,2,1))
+        M3 = _solve_3x3(A, xyzt)
+        in_gamut = in_gamut & (M3 >= -_EPS).all(axis = -1)
+        M = np.zeros((Yxyt.shape[0], n))
+        M[np.arange(Yxyt.shape[0])[:,None], vertices] = np.clip(M3, 0, None)
+    
+    else:
+        raise Exception('colormixer_batch(): Unrecognized method: {:s}. Options: "pairs" or "barycentric".'.format(method))
+    
+    M[np.logical_not(in_gamut)] = np.nan
+    
+    if out == 'M,in_gamut':
+        return M, in_gamut
+    elif out == 'M':
+        return M
+    else:
+        return eval(out)
+
+
 #------------------------------------------------------------------------------
 def get_w_summed_spd(w,spds):
     """
@@ -869,9 +1164,236 @@ def get_w_summed_spd(w,spds):
     """
     return np.vstack((spds[0],np.dot(np.abs(w),spds[1:])))
 
+#------------------------------------------------------------------------------
+def get_w_summed_spd_metrics(w, spds, metrics = 'Rf,Rg,cct,duv', cri_type = 'ies-tm30',\
+                             cieobs = _CIEOBS, grad = False, rel_step = 1e-4):
+    """
+    Calculate metrics of weighted sums of spds and (optionally) their 
+    gradients with respect to the weights (fluxes).
+    
+    | Gradients of 'X', 'Y', 'Z', 'x' and 'y' are calculated analytically 
+      (tristimulus values are linear in the weights).
+    | Gradients of 'Rf', 'Rg', 'cct' and 'duv' are obtained with central 
+      finite differences (forward differences for weights smaller than the 
+      step). All perturbed spectra of all weight vectors are evaluated in a 
+      single (vectorized) call to cri.spd_to_cri() (or xyz_to_cct()).
+    
+    Args:
+        :w: 
+            | ndarray with weigths (e.g. fluxes)
+            | (.shape = (N_components,) or (N_solutions, N_components))
+        :spds: 
+            | ndarray with component spds.
+            | (.shape = (N_components + 1, number of wavelengths))
+        :metrics:
+            | 'Rf,Rg,cct,duv' or str, optional
+            | Comma-separated str with metrics to calculate.
+            | Options: 'Rf', 'Rg', 'cct', 'duv', 'X', 'Y', 'Z', 'x', 'y'
+        :cri_type:
+            | 'ies-tm30' or str or dict or cri.CompiledCriType, optional
+            | cri_type used to calculate 'Rf', 'Rg', 'cct', 'duv'.
+            | (use a cri.CompiledCriType for speed in optimization loops)
+        :cieobs:
+            | _CIEOBS, optional
+            | CIE CMF set used to calculate 'X', 'Y', 'Z', 'x', 'y'.
+        :grad:
+            | False, optional
+            | If True: also return gradients.
+        :rel_step:
+            | 1e-4, optional
+            | Finite-difference step relative to the sum of the weights.
+            
+    Returns:
+        :vals:
+            | ndarray with metric values (.shape = (N_solutions, N_metrics))
+        :grads:
+            | ndarray with gradients (only when :grad: is True)
+            | (.shape = (N_solutions, N_metrics, N_components))
+    """
+    metrics = metrics.split(',')
+    w = np.atleast_2d(w)
+    sw = np.sign(w) + (w == 0) # derivative of abs(w) in get_w_summed_spd()
+    w = np.abs(w)
+    Ns, Nc = w.shape
+    vals = np.empty((Ns, len(metrics)))
+    grads = np.empty((Ns, len(metrics), Nc))
+    
+    # Analytic: tristimulus values and chromaticity coordinates:
+    xyz_metrics = [m for m in metrics if m in ['X','Y','Z','x','y']]
+    if len(xyz_metrics) > 0:
+        xyzi = spd_to_xyz(spds, relative = False, cieobs = cieobs) # (Nc,3)
+        XYZ = np.dot(w, xyzi) # (Ns,3)
+        S, dS = XYZ.sum(axis = 1), xyzi.sum(axis = 1)
+        for m in xyz_metrics:
+            i, k = metrics.index(m), 'XYZxy'.index(m) % 3
+            if m in 'XYZ':
+                vals[:,i], grads[:,i] = XYZ[:,k], xyzi[:,k]
+            else:
+                vals[:,i] = XYZ[:,k]/S
+                grads[:,i] = (xyzi[:,k][None,:]*S[:,None] - XYZ[:,k:k+1]*dS[None,:])/(S[:,None]**2)
+    
+    # Numerical: color rendition metrics, cct and duv:
+    cri_metrics = [m for m in metrics if m in ['Rf','Rg','cct','duv']]
+    if len(cri_metrics) > 0:
+        if grad == True:
+            # setup all perturbed weights (base, +h, -h) in one array:
+            h = rel_step*np.maximum(w.sum(axis = 1, keepdims = True), _EPS)*np.ones((1,Nc))
+            hm = h*(w >= h) # backward step only if weight stays positive
+            eye = np.eye(Nc)
+            W = np.concatenate((w[:,None,:], w[:,None,:] + h[:,:,None]*eye, w[:,None,:] - hm[:,:,None]*eye), axis = 1)
+        else:
+            W = w[:,None,:]
+        Sw = np.vstack((spds[:1], np.dot(W.reshape(-1,Nc), spds[1:])))
+        
+        if ('Rf' in cri_metrics) | ('Rg' in cri_metrics):
+            cvals = cri.spd_to_cri(Sw, cri_type = cri_type, out = ','.join(cri_metrics))
+            cvals = [cvals] if len(cri_metrics) == 1 else cvals
+        else:
+            if isinstance(cri_type,str):
+                cri_type = cri._CRI_DEFAULTS[cri_type]
+            xyzw = spd_to_xyz(Sw, cieobs = cri_type['cieobs']['cct'])
+            cct, duv = xyz_to_cct(xyzw, cieobs = cri_type['cieobs']['cct'], out = 'cct,duv', mode = 'lut')
+            cvals = [cct if m == 'cct' else duv for m in cri_metrics]
+        for m, v in zip(cri_metrics, cvals):
+            i = metrics.index(m)
+            v = np.asarray(v).reshape(Ns, -1)
+            vals[:,i] = v[:,0]
+            if grad == True:
+                grads[:,i] = (v[:,1:Nc+1] - v[:,Nc+1:])/(h + hm)
+    
+    if grad == True:
+        return vals, grads*sw[:,None,:]
+    else:
+        return vals
+
+
+#------------------------------------------------------------------------------
+class FitnessTrace():
+    """
+    Evaluation trace and (bounded) memo cache of fitness evaluations.
+    
+    | Records for each evaluation of fitnessfcn() or fitnessfcn_pop() the 
+      parameters x, the fitness value F, the objective function values, 
+      the time (s) the evaluation took and whether it was a cache hit.
+    | Fitness values are memoized with as key the (quantized) parameter 
+      vector, so re-evaluations of (nearly) identical solutions (e.g. by 
+      Nelder-Mead) do not require the objective functions to be recalculated.
+    | Intermediate results (verbosity > 0 in fitnessfcn()) are printed 
+      by the trace, prefixed with the evaluation counter.
+    
+    Args:
+        :cache_size:
+            | 1000, optional
+            | Maximum number of memoized evaluations (least recently used ones
+              are removed first). If 0: don't use a memo cache.
+        :cache_decimals:
+            | None, optional
+            | Number of decimals to round x to before lookup in the cache.
+            | If None: only identical x are looked up.
+        :keep_trace:
+            | True, optional
+            | If False: only count evaluations and cache hits.
+    """
+    def __init__(self, cache_size = 1000, cache_decimals = None, keep_trace = True):
+        self.cache_size = cache_size
+        self.cache_decimals = cache_decimals
+        self.keep_trace = keep_trace
+        self.cache = odict()
+        self.records = []
+        self.n_evals = 0
+        self.n_cache_hits = 0
+        self.time = 0.0
+        
+    def __len__(self):
+        return self.n_evals
+    
+    def _key(self, x):
+        x = np.asarray(x, dtype = float)
+        if self.cache_decimals is not None:
+            x = np.round(x, self.cache_decimals) + 0.0 # (+0.0: -0.0 -> 0.0)
+        return x.tobytes()
+    
+    def lookup(self, x):
+        """
+        Get memoized (F, obj_vals) for x (None if not in cache).
+        (F are the (non-RSS) per objective function fitness values)
+        """
+        if self.cache_size > 0:
+            key = self._key(x)
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+        return None
+    
+    def store(self, x, F, obj_vals):
+        """
+        Memoize (F, obj_vals) of x.
+        """
+        if self.cache_size > 0:
+            self.cache[self._key(x)] = (F.copy(), obj_vals.copy())
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last = False)
+    
+    def add(self, x, F, obj_vals, dt, cache_hit = False, verbosity = 0, decimals = [3], is_fcn = None):
+        """
+        Add evaluation to the trace (and print it if verbosity > 0).
+        """
+        self.n_evals += 1
+        self.n_cache_hits += int(cache_hit)
+        self.time += dt
+        if self.keep_trace == True:
+            self.records.append((np.array(x, dtype = float, ndmin = 1), F, np.array(obj_vals, dtype = float, ndmin = 1), dt, cache_hit))
+        if verbosity > 0:
+            _print_fitness(F, obj_vals, decimals, is_fcn = is_fcn, n = self.n_evals)
+    
+    def get_trace(self):
+        """
+        Get structured ndarray with fields 'n', 'x', 'F', 'obj_vals', 'time' 
+        and 'cache_hit' (one record per evaluation).
+        """
+        Nx = self.records[0][0].shape[0] if len(self.records) > 0 else 0
+        No = self.records[0][2].shape[0] if len(self.records) > 0 else 0
+        trace = np.zeros((len(self.records),), dtype = [('n',int),('x',float,(Nx,)),('F',float),
+                                                       ('obj_vals',float,(No,)),('time',float),('cache_hit',bool)])
+        for i, r in enumerate(self.records):
+            trace[i] = (i + 1,) + r
+        return trace
+    
+    def summary(self):
+        """
+        Get dict with number of evaluations, cache hits and total time (s).
+        """
+        return {'n_evals' : self.n_evals, 'n_cache_hits' : self.n_cache_hits,
+                'time' : self.time, 'time_per_eval' : self.time/max(self.n_evals, 1)}
 
 #------------------------------------------------------------------------------
-def fitnessfcn(x, spd_constructor, spd_constructor_pars = None, F_rss = True, decimals = [3], obj_fcn = [None], obj_fcn_pars = [{}], obj_fcn_weights = [1], obj_tar_vals = [0], verbosity = 0, out = 'F'):
+def _fitness_from_obj_vals(obj_vals, decimals, obj_fcn_weights, obj_tar_vals):
+    """
+    Calculate per objective function fitness values from obj_vals (..., N).
+    """
+    F = np.nan*np.ones(obj_vals.shape)
+    for i in np.arange(obj_vals.shape[-1]):
+        if obj_tar_vals[i] > 0:
+            f_normalize = obj_tar_vals[i]
+        else:
+            f_normalize = 1
+        F[...,i] = (obj_fcn_weights[i]*(np.abs((np.round(obj_vals[...,i],int(decimals[i])) - obj_tar_vals[i])/f_normalize)**2))
+    return F
+
+def _print_fitness(F, obj_vals, decimals, is_fcn = None, n = None):
+    """
+    Print (RSS) fitness value and objective function values (only those
+    with is_fcn True), prefixed with evaluation counter n if not None.
+    """
+    obj_vals = np.atleast_1d(obj_vals)
+    decimals = np.asarray(decimals)*np.ones(obj_vals.shape)
+    is_fcn = np.ones(obj_vals.shape, dtype = bool) if is_fcn is None else is_fcn
+    output_str = ('c{:1.0f}: '.format(n) if n is not None else '') + 'F = {:1.' + '{:1.0f}'.format(decimals.max()) + 'f}' + ' : '
+    for i in np.where(is_fcn)[0]:
+        output_str = output_str + r' obj_#{:1.0f}'.format(i+1) + ' = {:1.' + '{:1.0f}'.format(int(decimals[i])) + 'f},'
+    print(output_str.format(*np.hstack((F, obj_vals[is_fcn]))))
+
+def fitnessfcn(x, spd_constructor, spd_constructor_pars = None, F_rss = True, decimals = [3], obj_fcn = [None], obj_fcn_pars = [{}], obj_fcn_weights = [1], obj_tar_vals = [0], verbosity = 0, out = 'F', trace = None):
     """
     Fitness function that calculates closeness of solution x to target values 
     for specified objective functions.
@@ -906,65 +1428,70 @@ def fitnessfcn(x, spd_constructor, spd_constructor_pars = None, F_rss = True, de
             | Target values for each objective function.
         :verbosity:
             | 0, optional
-            | If > 0: print intermediate results.
+            | If > 0: print intermediate results (through :trace: if not None).
         :out: 
             | 'F', optional
             | Determines output.
+        :trace:
+            | None, optional
+            | FitnessTrace instance to record evaluation in and to look up 
+              memoized fitness values (only when :out: is 'F', 'obj_vals' 
+              or 'F,obj_vals').
             
     Returns:
         :F:
             | float or ndarray with fitness value for current solution :x:.
     """
-    
-    # Keep track of solutions tried:
-    global optcounter 
-    optcounter = optcounter + 1
+    t0 = time.time()
     
     # Number of objective functions:
     N = len(obj_fcn)
     
-    # Get current spdi:
-    spdi,args_out,component_spds = spd_constructor(x,spd_constructor_pars) 
-
-    # Goodness-of-fit:
-    F = np.nan*np.ones((N))
-    obj_vals = F.copy()
+    # Look up memoized fitness values:
+    cached = None
+    if (trace is not None) & (out in ('F','obj_vals','F,obj_vals')):
+        cached = trace.lookup(x)
     
-    if np.isnan(spdi[1:].sum()):
-        F = 10000000*np.ones(F.shape)
-
+    if cached is not None:
+        F, obj_vals = cached
+        F, obj_vals = F.copy(), obj_vals.copy()
+        
     else:
+        # Get current spdi:
+        spdi,args_out,component_spds = spd_constructor(x,spd_constructor_pars) 
+    
+        # Goodness-of-fit:
+        F = np.nan*np.ones((N))
+        obj_vals = F.copy()
         
-        # Make decimals and obj_fcn_weights same size as N:
-        decimals =  decimals*np.ones((N))
-        obj_fcn_weights =  obj_fcn_weights*np.ones((N))
-        obj_fcn_pars = np.asarray(obj_fcn_pars*N)
-        obj_tar_vals = np.asarray(obj_tar_vals)
+        if np.isnan(spdi[1:].sum()):
+            F = 10000000*np.ones(F.shape)
+    
+        else:
+            
+            # Make decimals and obj_fcn_weights same size as N:
+            decimals =  decimals*np.ones((N))
+            obj_fcn_weights =  obj_fcn_weights*np.ones((N))
+            obj_fcn_pars = np.asarray(obj_fcn_pars*N)
+            obj_tar_vals = np.asarray(obj_tar_vals)*np.ones((N))
+            
+            # Calculate all objective functions and closeness to target values
+            # store squared weighted differences for speed:
+            for i in np.arange(N):
+                if obj_fcn[i] is not None:
+                    obj_vals[i] = obj_fcn[i](spdi, **obj_fcn_pars[i])
+            F = _fitness_from_obj_vals(obj_vals, decimals, obj_fcn_weights, obj_tar_vals)
         
-        # Calculate all objective functions and closeness to target values
-        # store squared weighted differences for speed:
-        output_str = 'c{:1.0f}: F = {:1.' + '{:1.0f}'.format(decimals.max()) + 'f}' + ' : '
-
-        for i in np.arange(N):
-            if obj_fcn[i] is not None:
-                obj_vals[i] = obj_fcn[i](spdi, **obj_fcn_pars[i])
-                
-                if obj_tar_vals[i] > 0:
-                    f_normalize = obj_tar_vals[i]
-                else:
-                    f_normalize = 1
-                    
-                F[i] = (obj_fcn_weights[i]*(np.abs((np.round(obj_vals[i],np.int(decimals[i])) - obj_tar_vals[i])/f_normalize)**2))
-                
-                if (verbosity > 0):
-                    output_str = output_str + r' obj_#{:1.0f}'.format(i+1) + ' = {:1.' + '{:1.0f}'.format(np.int(decimals[i])) + 'f},'
-            else:
-                obj_vals[i] = np.nan
-                F[i] = np.nan
+        if trace is not None:
+            trace.store(x, F, obj_vals)
     
-        # Print intermediate results:
-        if (verbosity > 0):
-            print(output_str.format(*np.hstack((optcounter, np.sqrt(np.nansum(F)), obj_vals))))
+    # Record evaluation and print intermediate results:
+    is_fcn = np.array([o is not None for o in obj_fcn])
+    if trace is not None:
+        trace.add(x, np.sqrt(np.nansum(F)), obj_vals, time.time() - t0, cache_hit = cached is not None,\
+                  verbosity = verbosity, decimals = decimals, is_fcn = is_fcn)
+    elif (verbosity > 0):
+        _print_fitness(np.sqrt(np.nansum(F)), obj_vals, decimals, is_fcn = is_fcn)
     
     # Take Root-Sum-of-Squares of delta((val - tar)**2):
     if F_rss == True:
@@ -994,6 +1521,198 @@ def fitnessfcn(x, spd_constructor, spd_constructor_pars = None, F_rss = True, de
         
 
 
+def fitnessfcn_pop(X, spd_constructor, spd_constructor_pars = None, F_rss = True, decimals = [3], obj_fcn = [None], obj_fcn_pars = [{}], obj_fcn_weights = [1], obj_tar_vals = [0], verbosity = 0, out = 'F', trace = None):
+    """
+    Population-level fitness function that calculates closeness of a whole 
+    population of solutions X to target values for specified objective functions.
+    
+    | The spds of all members are constructed first and stacked, after which 
+      each objective function is called only once on the stacked spectra
+      (objective functions must accept multi-spd input and return 
+      one value per spd, e.g. cri.spd_to_iesrf).
+    | spd_constructor_2 and spd_constructor_3 construct the spds of all 
+      members in a single call (also when the component model parameters, 
+      e.g. peakwl and fwhm, are optimized). Other (user) constructors are 
+      called once for each member.
+    
+    Args:
+        :X: 
+            | ndarray with parameter values 
+            | (.shape = (population size, number of parameters))
+        :spd_constructor:
+            | function handle to a function that constructs the spd
+              from parameter values in a single solution x (row of :X:).
+        :out: 
+            | 'F', optional
+            | Determines output. 
+            | (e.g. 'F', 'F,obj_vals', 'spdi,obj_vals,args_out,component_spds')
+        :trace:
+            | None, optional
+            | FitnessTrace instance to record evaluations in and to look up 
+              memoized fitness values (only when :out: is 'F', 'obj_vals' 
+              or 'F,obj_vals'; only members not in the cache are evaluated).
+        
+    Note:
+        For other input arguments, see ?fitnessfcn.
+        
+    Returns:
+        :F:
+            | ndarray with fitness values of each member of population :X:.
+            | (.shape = (population size,) if :F_rss: else (population size, N_obj_fcns))
+    """
+    t0 = time.time()
+    X = np.atleast_2d(X)
+    Np = X.shape[0]
+    
+    # Number of objective functions:
+    N = len(obj_fcn)
+    
+    # Goodness-of-fit:
+    F = np.nan*np.ones((Np,N))
+    obj_vals = F.copy()
+    
+    # Look up memoized fitness values:
+    is_cached = np.zeros((Np,), dtype = bool)
+    if (trace is not None) & (out in ('F','obj_vals','F,obj_vals')):
+        for j in range(Np):
+            cached = trace.lookup(X[j])
+            if cached is not None:
+                F[j], obj_vals[j] = cached
+                is_cached[j] = True
+    is_eval = np.where(np.logical_not(is_cached))[0]
+    
+    if is_eval.shape[0] > 0:
+        
+        # Construct spds of all members to evaluate:
+        Xe = X[is_eval]
+        if ((spd_constructor is spd_constructor_2) & (_get_component_Yxy_cache(spd_constructor_pars, opt_key = 'pair_strengths') is not None)) |\
+            ((spd_constructor is spd_constructor_3) & (_get_component_Yxy_cache(spd_constructor_pars, opt_key = 'triangle_strengths') is not None)):
+            # fast path (fixed component spectra): construct all at once
+            spdi, M, spds = spd_constructor(Xe,spd_constructor_pars)
+            args_out = [m[None] for m in M] if (spd_constructor is spd_constructor_2) else list(M)
+            component_spds = [spds]*Xe.shape[0]
+        elif (spd_constructor is spd_constructor_2) | (spd_constructor is spd_constructor_3):
+            # generic path: construct component spds of all members at once
+            spdi, M, spds = spd_constructor(Xe,spd_constructor_pars)
+            args_out = [m[None] for m in M] if (spd_constructor is spd_constructor_2) else list(M)
+            component_spds = list(spds)
+        else:
+            constructed = [spd_constructor(Xe[j],spd_constructor_pars) for j in range(Xe.shape[0])]
+            spdi = np.vstack([constructed[0][0][:1]] + [c[0][1:] for c in constructed])
+            args_out = [c[1] for c in constructed]
+            component_spds = [c[2] for c in constructed]
+        
+        is_valid = np.logical_not(np.isnan(spdi[1:]).any(axis = 1))
+        F[is_eval[np.logical_not(is_valid)]] = 10000000
+        
+        if is_valid.any():
+            # Make decimals and obj_fcn_weights same size as N:
+            decimals =  decimals*np.ones((N))
+            obj_fcn_weights =  obj_fcn_weights*np.ones((N))
+            obj_fcn_pars = np.asarray(obj_fcn_pars*N)
+            obj_tar_vals = np.asarray(obj_tar_vals)*np.ones((N))
+            
+            # Calculate all objective functions on stacked spds of valid members:
+            spdv = np.vstack((spdi[:1], spdi[1:][is_valid]))
+            for i in np.arange(N):
+                if obj_fcn[i] is not None:
+                    obj_vals[is_eval[is_valid],i] = np.asarray(obj_fcn[i](spdv, **obj_fcn_pars[i])).flatten()
+            F[is_eval[is_valid]] = _fitness_from_obj_vals(obj_vals[is_eval[is_valid]], decimals, obj_fcn_weights, obj_tar_vals)
+        
+        if trace is not None:
+            for j in is_eval:
+                trace.store(X[j], F[j], obj_vals[j])
+    
+    # Record evaluations (time of population evaluation is distributed over members)
+    # and print intermediate results (best member only):
+    is_fcn = np.array([o is not None for o in obj_fcn])
+    best = np.nanargmin(np.nansum(F, axis = 1)) if (np.isfinite(F).any()) else None
+    if trace is not None:
+        dt = (time.time() - t0)/Np
+        for j in range(Np):
+            trace.add(X[j], np.sqrt(np.nansum(F[j])), obj_vals[j], dt, cache_hit = is_cached[j],\
+                      verbosity = verbosity if (j == best) else 0, decimals = decimals, is_fcn = is_fcn)
+    elif (verbosity > 0) & (best is not None):
+        _print_fitness(np.sqrt(np.nansum(F[best])), obj_vals[best], decimals, is_fcn = is_fcn)
+    
+    # Take Root-Sum-of-Squares of delta((val - tar)**2):
+    if F_rss == True:
+        F = np.sqrt(np.nansum(F, axis = 1))
+
+    if out == 'F':
+        return F
+    else:
+        return eval(out)
+
+def _get_component_Yxy_cache(constructor_pars, opt_key = None):
+    """
+    Get dict with (cached) Yxy of the fixed component spectra and of the target 
+    (fast path of spd_constructor_2/3 when only the fluxes are optimized).
+    
+    | The cache is stored under key '_Yxy_cache' in :constructor_pars: and is 
+      recalculated when 'component_spds', 'target', 'tar_type' or 'cieobs' 
+      change.
+    | Returns None when the component spectra are not fixed (e.g. peakwl, fwhm
+      are optimized) or when :opt_key: is not the only optimization parameter.
+    """
+    spds = constructor_pars.get('component_spds', None)
+    if (not isinstance(spds, np.ndarray)) | (list(constructor_pars.get('list',[opt_key])) != [opt_key]):
+        return None
+    cache = constructor_pars.get('_Yxy_cache', None)
+    if (cache is None) or (cache['component_spds'] is not spds) or (cache['target'] is not constructor_pars['target']) or\
+        (cache['tar_type'] != constructor_pars['tar_type']) or (cache['cieobs'] != constructor_pars['cieobs']):
+        cache = {'component_spds' : spds, 'target' : constructor_pars['target'], 
+                 'tar_type' : constructor_pars['tar_type'], 'cieobs' : constructor_pars['cieobs']}
+        cache['Yxyi'] = xyz_to_Yxy(spd_to_xyz(spds, relative = False, cieobs = constructor_pars['cieobs']))
+        cache['Yxyt'] = colortf(constructor_pars['target'], tf = constructor_pars['tar_type']+'>Yxy', bwtf = constructor_pars.get('cspace_bwtf',{}))
+        constructor_pars['_Yxy_cache'] = cache
+    return cache
+
+def _get_component_spds_pop(X, constructor_pars, out = 'spd'):
+    """
+    Construct the component spectra of all members of a population X (one 
+    solution per row) at once (generic path of spd_constructor_2/3).
+    
+    | The model parameters of all components of all members are stacked and
+      the spectra are calculated with a single call to phosphor_led_spd().
+    | :out: is the phosphor_led_spd() output used as component spds by the 
+      constructor ('spd' for spd_constructor_3, 'component_spds' for
+      spd_constructor_2). These only differ when use_piecewise_fcn is True,
+      in which case the 'component_spds' are built for each member.
+    
+    Returns:
+        :returns:
+            | cps, spds, Yxyi
+            |   - cps: list with the parameter dict of each member.
+            |   - spds: ndarray with component spds of each member 
+            |           (.shape = (Np, N+1, wl), first row of each: wavelengths)
+            |   - Yxyi: ndarray with Yxy of the components (.shape = (Np, N, 3))
+    """
+    cps = [vec_to_dict(vec = x, dic = constructor_pars.copy(), vsize = constructor_pars['len'], keys = constructor_pars['list'])[0] for x in X]
+    cp = cps[0]
+    if (cp['component_spds'] is None) & (cp['use_piecewise_fcn'] == True) & (out == 'component_spds'):
+        wl = getwlr(cp['wl'])
+        N = np.atleast_1d(cp['peakwl']).shape[0]
+        spds = np.vstack([phosphor_led_spd(peakwl = c['peakwl'], fwhm = c['fwhm'], bw_order = c['bw_order'],\
+                                           strength_shoulder = c['strength_shoulder'], wl = wl,\
+                                           use_piecewise_fcn = True, strength_ph = None,\
+                                           with_wl = False, out = 'component_spds')[0].T for c in cps])
+    elif cp['component_spds'] is None:
+        wl = getwlr(cp['wl'])
+        N = np.atleast_1d(cp['peakwl']).shape[0]
+        stack = lambda key: np.hstack([np.broadcast_to(np.atleast_1d(c[key]), (N,)) for c in cps])
+        spds = phosphor_led_spd(peakwl = stack('peakwl'), fwhm = stack('fwhm'), bw_order = stack('bw_order'),\
+                                strength_shoulder = stack('strength_shoulder'), wl = wl,\
+                                use_piecewise_fcn = cp['use_piecewise_fcn'], strength_ph = None,\
+                                with_wl = False, out = 'spd')
+    else:
+        wl = cp['component_spds'][0]
+        N = cp['component_spds'].shape[0] - 1
+        spds = np.tile(cp['component_spds'][1:], (X.shape[0],1))
+    Yxyi = xyz_to_Yxy(spd_to_xyz(np.vstack((wl,spds)), relative = False, cieobs = cp['cieobs']))
+    spds = np.concatenate((np.broadcast_to(wl, (X.shape[0],1,wl.shape[0])), spds.reshape((X.shape[0],N,wl.shape[0]))), axis = 1)
+    return cps, spds, Yxyi.reshape((X.shape[0],N,3))
+
 def spd_constructor_2(x, constructor_pars = {}, **kwargs):
     """
     Construct spd from model parameters using pairs of intermediate sources.
@@ -1003,6 +1722,14 @@ def spd_constructor_2(x, constructor_pars = {}, **kwargs):
       (combined) sources remain. Color3mixer is then used to calculate the 
       fluxes for the remaining 3 sources, after which the fluxes of all 
       components are back-calculated.
+    | When the component spectra are fixed ('component_spds' in 
+      :constructor_pars: and only 'pair_strengths' are optimized), the 
+      chromaticities of the components and target are calculated only once
+      (cached in :constructor_pars:) and the fluxes are solved in xyz-space.
+    | :x: can also be a population of solutions (one per row). The spds 
+      (and component spds when not fixed) of all members are then 
+      constructed at once and M (and spds) have one row (and one set of 
+      component spds) per member.
     
     Args:
         :x: 
@@ -1020,6 +1747,23 @@ def spd_constructor_2(x, constructor_pars = {}, **kwargs):
               themselves.
     
     """
+    # Fast path for fixed component spectra:
+    cache = _get_component_Yxy_cache(constructor_pars, opt_key = 'pair_strengths')
+    if cache is not None:
+        spds = cache['component_spds']
+        M = colormixer_batch(Yxyt = cache['Yxyt'][:1], Yxyi = cache['Yxyi'], pair_strengths = np.atleast_2d(x), out = 'M')[:,0,:]
+        spd = get_w_summed_spd(M, spds)
+        return spd,M,spds
+    
+    # Population of solutions:
+    if np.ndim(x) == 2:
+        cps, spds, Yxyi = _get_component_spds_pop(x, constructor_pars, out = 'component_spds')
+        Yxyt = colortf(constructor_pars['target'], tf = constructor_pars['tar_type']+'>Yxy', bwtf = constructor_pars['cspace_bwtf'])
+        pair_strengths = np.array([np.atleast_1d(cp['pair_strengths']) for cp in cps]).reshape((x.shape[0], Yxyi.shape[1] - 3))
+        M = colormixer_batch(Yxyt = Yxyt[:1], Yxyi = Yxyi, pair_strengths = pair_strengths, out = 'M')[:,0,:]
+        spd = np.vstack((spds[0,0], np.einsum('pn,pnw->pw', np.abs(M), spds[:,1:])))
+        return spd,M,spds
+    
     cp = constructor_pars.copy()
         
     # replace / init cp with values from x (parameters to optimize)
@@ -1060,6 +1804,14 @@ def spd_constructor_3(x, constructor_pars = {}, **kwargs):
       using color3mixer() and then optimizes the weights of each of the latter 
       spectra such that adding them (additive mixing) results in obj_vals as 
       close as possible to the target values.
+    | When the component spectra are fixed ('component_spds' in 
+      :constructor_pars: and only 'triangle_strengths' are optimized), the 
+      fluxes of all triangles are calculated only once (cached in 
+      :constructor_pars:).
+    | :x: can also be a population of solutions (one per row). The spds 
+      (and component spds when not fixed) of all members are then 
+      constructed at once and M (and spds) have one row (and one set of 
+      component spds) per member.
     
     Args:
         :x:
@@ -1077,6 +1829,58 @@ def spd_constructor_3(x, constructor_pars = {}, **kwargs):
               themselves.
     
     """
+    # Fast path for fixed component spectra:
+    cache = _get_component_Yxy_cache(constructor_pars, opt_key = 'triangle_strengths')
+    if cache is not None:
+        spds = cache['component_spds']
+        if 'M3' not in cache:
+            # fluxes of all component triangles (fixed for fixed components and target):
+            Yxyi = cache['Yxyi']
+            combos = np.array(list(itertools.combinations(np.arange(Yxyi.shape[0]), 3))) 
+            M3 = color3mixer(cache['Yxyt'][:1],Yxyi[combos[:,0],:],Yxyi[combos[:,1],:],Yxyi[combos[:,2],:])
+            M3[(((M3<0).sum(axis=1))>0),:] = np.nan
+            
+            # matrix that distributes the triangle fluxes over the components:
+            T = np.zeros((combos.shape[0],Yxyi.shape[0]))
+            T[np.arange(combos.shape[0])[:,None], combos] = np.nan_to_num(M3)
+            cache['M3'], cache['T'] = M3, T
+        X = np.atleast_2d(x)
+        if cache['T'].shape[0] > 1:
+            M = np.dot(X, cache['T'])
+        else:
+            M = np.repeat(cache['M3'], X.shape[0], axis = 0)
+        spd = get_w_summed_spd(M, spds)
+        
+        # When all out-of-gamut: set spd to NaN's:
+        spd[1:][np.nansum(M, axis = 1) == 0] = np.nan
+        return spd,(M[0] if (np.ndim(x) < 2) & (cache['T'].shape[0] > 1) else M),spds
+
+    # Population of solutions:
+    if np.ndim(x) == 2:
+        cps, spds, Yxyi = _get_component_spds_pop(x, constructor_pars)
+        Np, N = Yxyi.shape[:2]
+        combos = np.array(list(itertools.combinations(np.arange(N), 3))) 
+        Nc = combos.shape[0]
+        
+        # calculate fluxes of all component triangles of all members:
+        Yxy_target = np.atleast_2d(constructor_pars['target'])
+        M3 = color3mixer(Yxy_target[:1], Yxyi[:,combos[:,0]].reshape((Np*Nc,3)),\
+                         Yxyi[:,combos[:,1]].reshape((Np*Nc,3)), Yxyi[:,combos[:,2]].reshape((Np*Nc,3))).reshape((Np,Nc,3))
+        M3[((M3<0).sum(axis = 2)) > 0] = np.nan
+        if Nc > 1:
+            # distribute the weighted triangle fluxes over the components:
+            T = np.zeros((Nc,3,N))
+            T[np.arange(Nc)[:,None], np.arange(3), combos] = 1
+            triangle_strengths = np.array([cp['triangle_strengths'] for cp in cps])
+            M = np.einsum('pk,pkc,kcn->pn', triangle_strengths, np.nan_to_num(M3), T)
+        else:
+            M = M3[:,0,:]
+        spd = np.vstack((spds[0,0], np.einsum('pn,pnw->pw', np.abs(M), spds[:,1:])))
+        
+        # When all out-of-gamut: set spd to NaN's:
+        spd[1:][M.sum(axis = 1) == 0] = np.nan
+        return spd,M,spds
+
     cp = constructor_pars.copy()
     
     # replace / init cp with values from x (parameters to optimize)
@@ -1102,7 +1906,7 @@ def spd_constructor_3(x, constructor_pars = {}, **kwargs):
     spds = spd # component spds in Nxwl format
     
     # Calculate xyzi and Yxyi of component spectra:
-    xyzi = spd_to_xyz(spds, relative = False, cieobs = cieobs)
+    xyzi = spd_to_xyz(spds, relative = False, cieobs = cp['cieobs'])
     Yxyi = xyz_to_Yxy(xyzi)
 
     # Generate all possible 3-channel combinations (component triangles):
@@ -1136,6 +1940,97 @@ def spd_constructor_3(x, constructor_pars = {}, **kwargs):
         
     return spd,M,spds
 
+#------------------------------------------------------------------------------
+class _OptimizationTimeout(Exception):
+    pass
+
+class _TimedFitnessFcn():
+    """
+    Positional argument only fitness function (for math.minimizebnd() or 
+    math.minimizede()) that keeps track of the best solution tried and 
+    raises _OptimizationTimeout when :timeout: seconds have passed.
+    """
+    def __init__(self, fcn, timeout = None):
+        self.fcn = fcn
+        self.timeout = timeout
+        self.t0 = time.time()
+        self.best_x = None
+        self.best_F = np.inf
+        
+    def __call__(self, x, *args):
+        if (self.timeout is not None) and ((time.time() - self.t0) > self.timeout):
+            raise _OptimizationTimeout()
+        F = self.fcn(x, *args)
+        Fx = np.atleast_1d(F)
+        if np.nanmin(Fx) < self.best_F:
+            self.best_F = np.nanmin(Fx)
+            self.best_x = np.atleast_2d(x)[np.nanargmin(Fx)].copy()
+        return F
+
+def _spd_optimizer_fit_fcn(x, out, spd_constructor, spd_model_pars,  obj_fcn, obj_fcn_pars, obj_fcn_weights, obj_tar_vals, F_rss, decimals, verbosity, trace = None):
+    """
+    Positional argument only version of fitnessfcn (for math.minimizebnd()).
+    """
+    return fitnessfcn(x, spd_constructor, spd_constructor_pars = spd_model_pars,\
+                      F_rss = F_rss, decimals = decimals,\
+                      obj_fcn = obj_fcn, obj_fcn_pars = obj_fcn_pars, obj_fcn_weights = obj_fcn_weights,\
+                      obj_tar_vals = obj_tar_vals, verbosity = verbosity, out = out, trace = trace)
+
+def _spd_optimizer_fit_fcn_pop(X, out, spd_constructor, spd_model_pars,  obj_fcn, obj_fcn_pars, obj_fcn_weights, obj_tar_vals, F_rss, decimals, verbosity, trace = None):
+    """
+    Positional argument only version of fitnessfcn_pop (for math.minimizede()).
+    """
+    return fitnessfcn_pop(X, spd_constructor, spd_constructor_pars = spd_model_pars,\
+                          F_rss = F_rss, decimals = decimals,\
+                          obj_fcn = obj_fcn, obj_fcn_pars = obj_fcn_pars, obj_fcn_weights = obj_fcn_weights,\
+                          obj_tar_vals = obj_tar_vals, verbosity = verbosity, out = out, trace = trace)
+
+def _spd_optimizer_run(x0, minimize_opts, input_par = (), minimize_method = 'nelder-mead', bounds = (None,None), timeout = None, trace_opts = {}):
+    """
+    Run a single optimization (start) of spd_optimizer_2_3() 
+    (module level, so it can be run in a process pool).
+    """
+    # Setup optimization (evaluation trace and memo cache):
+    trace = FitnessTrace(**trace_opts)
+    args = input_par + (trace,)
+    
+    # Perform optimzation:
+    if minimize_method.lower() == 'de':
+        # population-vectorized differential evolution:
+        fit_fcn = _TimedFitnessFcn(_spd_optimizer_fit_fcn_pop, timeout = timeout)
+        minimizer = lambda: math.minimizede(fit_fcn, x0, args = args, bounds = bounds, options = minimize_opts)
+    else:
+        fit_fcn = _TimedFitnessFcn(_spd_optimizer_fit_fcn, timeout = timeout)
+        minimizer = lambda: math.minimizebnd(fit_fcn, x0, args = args, method = minimize_method, use_bnd = True, bounds = bounds , options = minimize_opts)
+    try:
+        res = minimizer()
+        res['timed_out'] = False
+    except _OptimizationTimeout:
+        # continue with best solution so far:
+        res = {'x' : x0 if fit_fcn.best_x is None else fit_fcn.best_x, 'fval' : fit_fcn.best_F, 'success' : False, 
+               'message' : 'Timeout after {} s.'.format(timeout), 'timed_out' : True}
+    res = dict(res) # (scipy OptimizeResult is a dict subclass)
+    
+    # Get obj_vals of final solution:
+    res['x_final'] = np.abs(res['x'])
+    res['fval'], res['obj_vals'] = _spd_optimizer_fit_fcn(res['x_final'], 'F,obj_vals', *(input_par[1:-1] + (0,)))
+    trace.cache.clear() # (don't return memoized values)
+    res['trace'] = trace
+    return res
+
+def _get_pareto_front(obj_vals, obj_tar_vals):
+    """
+    Get indices of the non-dominated solutions (Pareto front) based on the 
+    (normalized) absolute differences between obj_vals and obj_tar_vals.
+    """
+    obj_tar_vals = np.asarray(obj_tar_vals)*np.ones(obj_vals.shape[1])
+    f_normalize = np.where(obj_tar_vals > 0, obj_tar_vals, 1)
+    D = np.abs(obj_vals - obj_tar_vals)/f_normalize
+    D = D[:,np.logical_not(np.isnan(D).all(axis = 0))] # remove None obj_fcns
+    D[np.isnan(D)] = np.inf
+    dominated = ((D[None,:,:] <= D[:,None,:]).all(axis = 2) & (D[None,:,:] < D[:,None,:]).any(axis = 2)).any(axis = 1)
+    return np.where(np.logical_not(dominated))[0]
+
 #------------------------------------------------------------------------------
 def spd_optimizer_2_3(optimizer_type = '2mixer', \
                     spd_constructor = None, spd_model_pars = None,\
@@ -1145,7 +2040,8 @@ def spd_optimizer_2_3(optimizer_type = '2mixer', \
                     obj_fcn = [None], obj_fcn_pars = [{}], obj_fcn_weights = [1],\
                     obj_tar_vals = [0], decimals = [5], \
                     minimize_method = 'nelder-mead', minimize_opts = None, F_rss = True,\
-                    verbosity = 0,**kwargs):
+                    verbosity = 0, n_starts = 1, seed = None, timeout = None,\
+                    executor = None, max_workers = None, trace_opts = None, **kwargs):
     """
     Optimizes the weights (fluxes) of a set of component spectra by combining 
     pairs (2) or trio's (3) of components to intermediate sources until only 3
@@ -1222,14 +2118,48 @@ def spd_optimizer_2_3(optimizer_type = '2mixer', \
         :minimize_method:
             | 'nelder-mead', optional
             | Optimization method used by minimize function.
+            | If 'de': use built-in population-vectorized differential 
+              evolution (math.minimizede), in which the spds of all members
+              of a generation are evaluated at once (see fitnessfcn_pop).
         :minimize_opts: 
             | None, optional
             | Dict with minimization options. 
             | None defaults to: {'xtol': 1e-5, 'disp': True, 'maxiter': 1000*Nc,
             |                     'maxfev' : 1000*Nc,'fatol': 0.01}
+            | or for 'de': {'popsize': 10*Nc, 'maxiter': 100, 'tol': 1e-4,
+            |               'disp': False} (see ?math.minimizede for others)
         :verbosity:
             | 0, optional
             | If > 0: print intermediate results.
+        :n_starts:
+            | 1, optional
+            | Number of optimization runs (starts). The first start uses the 
+              default starting values, the others start from random values
+              (uniformly drawn within the parameter bounds).
+            | The result with the lowest fitness value is returned, the 
+              results of all starts are stored in res['starts'].
+        :seed:
+            | None, optional
+            | Seed (int) for the random generator of the starting values 
+              (incl. random initial pair/triangle strengths of the first 
+              start) and of the 'de' minimizer to get reproducible results.
+        :timeout:
+            | None, optional
+            | Maximum time (s) for each start. When exceeded, the optimization 
+              is stopped and the best solution so far is used.
+        :executor:
+            | None, optional
+            | Run starts in parallel: None (serial), 'process', 'thread' or 
+              a concurrent.futures.Executor instance (see luxpy.parallel_map()).
+        :max_workers:
+            | None, optional
+            | Maximum number of workers when :executor: is a string.
+        :trace_opts:
+            | None, optional
+            | Dict with options for the FitnessTrace (evaluation trace and 
+              memo cache) of each start, e.g. {'cache_size': 1000, 
+              'cache_decimals': None, 'keep_trace': True}.
+              (None: use defaults, see ?FitnessTrace)
             
     Returns:
         :returns:
@@ -1237,6 +2167,15 @@ def spd_optimizer_2_3(optimizer_type = '2mixer', \
             |   - 'M': ndarray with fluxes for each component spectrum.
             |   - 'spd_opt': optimized spectrum.
             |   - 'obj_vals': values of the obj. fcns for the optimized spectrum.
+            |   - 'res': dict with optimization results, with res['starts']
+            |       a dict with the results of all starts:
+            |       'x0', 'x_final', 'F', 'obj_vals', 'timed_out', 'best' 
+            |       (index of best start), 'pareto_front' (indices of the 
+            |       starts that are not dominated on all objectives, with 
+            |       closeness to target = abs(obj_vals - obj_tar_vals)) and 
+            |       'trace' (FitnessTrace of each start, see 
+            |       res['trace'].get_trace() and res['trace'].summary() of 
+            |       the best start).
     """
 
     # Set spd_constructor function:
@@ -1250,12 +2189,15 @@ def spd_optimizer_2_3(optimizer_type = '2mixer', \
         if spd_constructor is None:
             raise Exception('spd_to_optimizer_2_3(): No user defined spd_constructor found.')
     
+    # Random number generator for (random) starting values:
+    rng = np.random.RandomState(seed)
+    
     # Initialize  spd_model_pars and spd_optim_pars:
     if optimizer_type != 'user':
         spd_optim_pars, spd_model_pars = initialize_spd_optim_pars(component_data, \
                                                                    optimizer_type = optimizer_type, \
                                                                    allow_butterworth_mono_spds = allow_butterworth_mono_spds, \
-                                                                   wl = wl)        
+                                                                   wl = wl, seed = None if seed is None else rng)        
         spd_model_pars = {**spd_model_pars, **spd_optim_pars} # merge two dicts
     else:
         if 'x0' not in spd_model_pars:
@@ -1271,32 +2213,51 @@ def spd_optimizer_2_3(optimizer_type = '2mixer', \
     spd_model_pars['cspace_bwtf'] = {}
     spd_model_pars['cieobs'] = cieobs
     
+    # Pre-calculate chromaticities of fixed component spectra and target 
+    # (used by fast path of spd_constructor_2/3):
+    if optimizer_type != 'user':
+        _get_component_Yxy_cache(spd_model_pars, opt_key = {'2mixer':'pair_strengths','3mixer':'triangle_strengths'}[optimizer_type])
+    
     # Get starting value, lower and upper bounds:
     x0 = spd_optim_pars['x0']
     bounds = (spd_optim_pars['LB'], spd_optim_pars['UB'])
 
     # Setup optimization:
-    global optcounter
-    optcounter = 1     
-
     if minimize_opts is None:
-        minimize_opts = {'xtol': 1e-5, 'disp': True, 'maxiter' : 1000*len(x0), 'maxfev' : 1000*len(x0),'fatol': 0.01}
+        if minimize_method.lower() == 'de':
+            minimize_opts = {'popsize' : 10*len(x0), 'maxiter' : 100, 'tol' : 1e-4, 'disp' : False}
+        else:
+            minimize_opts = {'xtol': 1e-5, 'disp': True, 'maxiter' : 1000*len(x0), 'maxfev' : 1000*len(x0),'fatol': 0.01}
     input_par = ('F', spd_constructor, spd_model_pars, obj_fcn, obj_fcn_pars, obj_fcn_weights, obj_tar_vals, F_rss, decimals, verbosity)
-      
-    # Create positional argument only function for scipy.minimize():
-    def fit_fcn(x, out, spd_constructor, spd_model_pars,  obj_fcn, obj_fcn_pars, obj_fcn_weights, obj_tar_vals, F_rss, decimals, verbosity):
-        F = fitnessfcn(x, spd_constructor, spd_constructor_pars = spd_model_pars,\
-                  F_rss = F_rss, decimals = decimals,\
-                  obj_fcn = obj_fcn, obj_fcn_pars = obj_fcn_pars, obj_fcn_weights = obj_fcn_weights,\
-                  obj_tar_vals = obj_tar_vals, verbosity = verbosity, out = out)
-        return F
-
-    # Perform optimzation:
-    res = math.minimizebnd(fit_fcn, x0, args = input_par, method = minimize_method, use_bnd = True, bounds = bounds , options = minimize_opts)
-    x_final = np.abs(res['x'])
+    
+    # Get starting values (x0 + n_starts - 1 random draws within bounds):
+    x0 = np.asarray(x0, dtype = float).flatten()
+    LB = -np.inf*np.ones(x0.shape) if (bounds[0] is None) or (x0.shape[0] == 0) else np.hstack(bounds[0]).astype(float)
+    UB = np.inf*np.ones(x0.shape) if (bounds[1] is None) or (x0.shape[0] == 0) else np.hstack(bounds[1]).astype(float)
+    lo = np.where(np.isfinite(LB), LB, x0 - np.abs(x0) - 1)
+    hi = np.where(np.isfinite(UB), UB, x0 + np.abs(x0) + 1)
+    X0 = np.vstack((x0, lo + rng.rand(n_starts - 1, x0.shape[0])*(hi - lo)))
+    
+    # Make seeds for the population-based optimizer reproducible:
+    opts = [dict(minimize_opts) for i in range(n_starts)]
+    if minimize_method.lower() == 'de':
+        for i in range(n_starts):
+            opts[i]['seed'] = minimize_opts.get('seed', rng.randint(2**31 - 1)) if (n_starts == 1) else rng.randint(2**31 - 1)
+    
+    # Perform optimzations (in parallel if executor is not None):
+    run = partial(_spd_optimizer_run, input_par = input_par, minimize_method = minimize_method,\
+                  bounds = bounds, timeout = timeout, trace_opts = {} if trace_opts is None else trace_opts)
+    results = parallel_map(run, list(X0), opts, executor = executor, max_workers = max_workers)
+    
+    # Reduce to best solution:
+    F = np.array([r['fval'] for r in results], dtype = float)
+    F[np.isnan(F)] = np.inf
+    best = np.argmin(F)
+    res = results[best]
+    x_final = res['x_final']
    
     # Calculate optimized SPD and get obj_vals and fluxes:
-    spd_opt, obj_vals, M, component_spds = fit_fcn(x_final, 'spdi,obj_vals,args_out,component_spds', spd_constructor, spd_model_pars, obj_fcn, obj_fcn_pars, obj_fcn_weights, obj_tar_vals, F_rss, decimals, verbosity)
+    spd_opt, obj_vals, M, component_spds = _spd_optimizer_fit_fcn(x_final, 'spdi,obj_vals,args_out,component_spds', spd_constructor, spd_model_pars, obj_fcn, obj_fcn_pars, obj_fcn_weights, obj_tar_vals, F_rss, decimals, 0)
     
     res['obj_vals'] = obj_vals
     res['x_final'] = x_final
@@ -1304,10 +2265,30 @@ def spd_optimizer_2_3(optimizer_type = '2mixer', \
     res['M'] = M
     res['component_spds'] = component_spds
     
+    # Store results of all starts and the Pareto front over the objectives:
+    obj_vals_s = np.array([r['obj_vals'] for r in results])
+    res['starts'] = {'x0' : X0, 'x_final' : np.array([r['x_final'] for r in results]),
+                     'F' : F, 'obj_vals' : obj_vals_s,
+                     'timed_out' : np.array([r['timed_out'] for r in results]),
+                     'trace' : [r['trace'] for r in results],
+                     'best' : best,
+                     'pareto_front' : _get_pareto_front(obj_vals_s, obj_tar_vals)}
+    
     return spd_opt, M, component_spds, obj_vals, res
         
 
 #------------------------------------------------------------------------------
+def _get_rng(seed = None):
+    """
+    Get random number generator (np.random if seed is None, else RandomState).
+    """
+    if seed is None:
+        return np.random
+    elif isinstance(seed, np.random.RandomState):
+        return seed
+    else:
+        return np.random.RandomState(seed)
+
 def get_optim_pars_dict(target = np2d([100,1/3,1/3]), tar_type = 'Yxy', cieobs = _CIEOBS,\
               optimizer_type = '2mixer', spd_constructor = None, spd_model_pars = None,\
               cspace = 'Yuv', cspace_bwtf = {}, cspace_fwtf = {},\
@@ -1325,13 +2306,17 @@ def get_optim_pars_dict(target = np2d([100,1/3,1/3]), tar_type = 'Yxy', cieobs =
               pair_strengths = None,triangle_strengths = None,\
               peakwl_min = [400], peakwl_max = [700],\
               fwhm_min = [5], fwhm_max = [300],\
-              bw_order_min = [0], bw_order_max = [100]):
+              bw_order_min = [0], bw_order_max = [100], seed = None):
     """
     Setup dict with optimization parameters.
     
     
     Args:
         See  ?spd_optimizer for more info. 
+        :seed:
+            | None, optional
+            | None or int or numpy.random.RandomState used to draw random 
+              pair_strengths and triangle_strengths (when None).
         
     Returns:
         :opts: 
@@ -1339,6 +2324,7 @@ def get_optim_pars_dict(target = np2d([100,1/3,1/3]), tar_type = 'Yxy', cieobs =
     """
     opts = locals()
     spd_models_pars = opts.pop('spd_model_pars')
+    rng = _get_rng(opts.pop('seed'))
     
     
     # Set number of component sources:
@@ -1411,21 +2397,21 @@ def get_optim_pars_dict(target = np2d([100,1/3,1/3]), tar_type = 'Yxy', cieobs =
     
     # Generate random set of pair_strengths (for '2mixer'):
     if pair_strengths is None:
-        opts['pair_strengths'] = np.random.rand(N_components-3)
+        opts['pair_strengths'] = rng.rand(N_components-3)
     else:
         opts['pair_strengths'] = pair_strengths
 
     # Generate random set of triangle_strengths (for '3mixer'):
     if triangle_strengths is None:
         combos = np.array(list(itertools.combinations(np.arange(N_components), 3))) 
-        opts['triangle_strengths'] = np.random.rand(combos.shape[0])
+        opts['triangle_strengths'] = rng.rand(combos.shape[0])
     else:
         opts['triangle_strengths'] = triangle_strengths
 
     return opts
 
 
-def initialize_spd_model_pars(component_data, N_components = None, allow_butterworth_mono_spds = False, optimizer_type = '2mixer', wl = _WL3):
+def initialize_spd_model_pars(component_data, N_components = None, allow_butterworth_mono_spds = False, optimizer_type = '2mixer', wl = _WL3, seed = None):
     """
     Initialize spd_model_pars dict (for spd_constructor) based on type 
     of component_data.
@@ -1467,7 +2453,7 @@ def initialize_spd_model_pars(component_data, N_components = None, allow_butterw
     if isinstance(component_data,int):
         # input is Number of components
         N = component_data
-        spd_model_pars = get_optim_pars_dict(N_components = N, allow_butterworth_mono_spds = allow_butterworth_mono_spds)
+        spd_model_pars = get_optim_pars_dict(N_components = N, allow_butterworth_mono_spds = allow_butterworth_mono_spds, seed = seed)
         spd_model_pars['N_components'] = N
         spd_model_pars['component_spds'] = None
         
@@ -1524,7 +2510,7 @@ def initialize_spd_model_pars(component_data, N_components = None, allow_butterw
     
     else:
         # input is ndarray with component spectra
-        spd_model_pars = get_optim_pars_dict(component_spds = component_data)
+        spd_model_pars = get_optim_pars_dict(component_spds = component_data, seed = seed)
         N = component_data.shape[0] - 1
         spd_model_pars['N_components'] = N
         spd_model_pars['component_spds'] = component_data        
@@ -1546,7 +2532,7 @@ def initialize_spd_model_pars(component_data, N_components = None, allow_butterw
 
 def initialize_spd_optim_pars(component_data, N_components = None,\
                               allow_butterworth_mono_spds = False,\
-                              optimizer_type = '2mixer', wl = _WL3):
+                              optimizer_type = '2mixer', wl = _WL3, seed = None):
     """
     Initialize spd_optim_pars dict based on type of component_data.
     
@@ -1585,7 +2571,8 @@ def initialize_spd_optim_pars(component_data, N_components = None,\
     spd_optim_pars = {}
     spd_model_pars = initialize_spd_model_pars(component_data, N_components = N_components,\
                                                optimizer_type = optimizer_type, \
-                                               allow_butterworth_mono_spds = allow_butterworth_mono_spds, wl = wl)
+                                               allow_butterworth_mono_spds = allow_butterworth_mono_spds, wl = wl,\
+                                               seed = seed)
     N = spd_model_pars['N_components']
 
     # Initialize parameter dict:
@@ -1680,7 +2667,10 @@ def spd_optimizer(target = np2d([100,1/3,1/3]), tar_type = 'Yxy', cieobs = _CIEO
                   pair_strengths = None,\
                   peakwl_min = [400], peakwl_max = [700],\
                   fwhm_min = [5], fwhm_max = [300],\
-                  bw_order_min = 0, bw_order_max = 100):
+                  bw_order_min = 0, bw_order_max = 100,\
+                  n_starts = 1, seed = None, timeout = None,\
+                  executor = None, max_workers = None, trace_opts = None,\
+                  out = 'spds,M'):
     """
     Generate a spectrum with specified white point and optimized for certain 
     objective functions from a set of component spectra or component spectrum 
@@ -1764,23 +2754,70 @@ def spd_optimizer(target = np2d([100,1/3,1/3]), tar_type = 'Yxy', cieobs = _CIEO
         :minimize_method:
             | 'nelder-mead', optional
             | Optimization method used by minimize function.
+            | If 'de': use built-in population-vectorized differential 
+              evolution (math.minimizede), in which the spds of all members
+              of a generation are evaluated at once (see fitnessfcn_pop).
         :minimize_opts:
             | None, optional
             | Dict with minimization options. 
             |  None defaults to: {'xtol': 1e-5, 'disp': True, 'maxiter': 1000*Nc,
             |                     'maxfev' : 1000*Nc,'fatol': 0.01}
+            |  or for 'de': {'popsize': 10*Nc, 'maxiter': 100, 'tol': 1e-4,
+            |                'disp': False} (see ?math.minimizede for others)
         :verbosity:
             | 0, optional
             | If > 0: print intermediate results.
+        :n_starts:
+            | 1, optional
+            | Number of optimization runs (starts). The first start uses the 
+              default starting values, the others start from random values
+              (uniformly drawn within the parameter bounds).
+            | The result with the lowest fitness value is returned, the 
+              results of all starts are stored in res['starts'].
+        :seed:
+            | None, optional
+            | Seed (int) for the random generator of the starting values 
+              (incl. random initial pair/triangle strengths of the first 
+              start) and of the 'de' minimizer to get reproducible results.
+        :timeout:
+            | None, optional
+            | Maximum time (s) for each start. When exceeded, the optimization 
+              is stopped and the best solution so far is used.
+        :executor:
+            | None, optional
+            | Run starts in parallel: None (serial), 'process', 'thread' or 
+              a concurrent.futures.Executor instance (see luxpy.parallel_map()).
+        :max_workers:
+            | None, optional
+            | Maximum number of workers when :executor: is a string.
+        :trace_opts:
+            | None, optional
+            | Dict with options for the FitnessTrace (evaluation trace and 
+              memo cache) of each start, e.g. {'cache_size': 1000, 
+              'cache_decimals': None, 'keep_trace': True}.
+              (None: use defaults, see ?FitnessTrace)
+              The trace is returned in res['trace'] (see :out:).
+        :out:
+            | 'spds,M', optional
+            | Determines output ('spds,M' or 'spds,M,res').
          
     Note:
         peakwl:, :fwhm:, ... : see ?spd_builder for more info.   
             
     Returns:
         :returns: 
-            | spds, M
+            | spds, M (, res)
             |   - 'spds': optimized spectrum.
             |   - 'M': ndarray with fluxes for each component spectrum.
+            |   - 'res': dict with optimization results (only when 'res' in :out:), 
+            |       with res['obj_vals'] the values of the obj. fcns for the 
+            |       optimized spectrum, res['trace'] the FitnessTrace 
+            |       (evaluation trace and cache statistics, see 
+            |       res['trace'].get_trace() and res['trace'].summary()) 
+            |       of the best start and res['starts'] a dict with the 
+            |       results of all starts ('x0', 'x_final', 'F', 'obj_vals',
+            |       'timed_out', 'best', 'pareto_front' and 'trace').
+            |       (see ?spd_optimizer_2_3 for more info)
 
     Notes:
         :Optimization algorithms:
@@ -1842,7 +2879,10 @@ def spd_optimizer(target = np2d([100,1/3,1/3]), tar_type = 'Yxy', cieobs = _CIEO
                                                     obj_tar_vals = obj_tar_vals, decimals = decimals, \
                                                     minimize_method = minimize_method, F_rss = F_rss,\
                                                     minimize_opts = minimize_opts,\
-                                                    verbosity = verbosity)
+                                                    verbosity = verbosity, n_starts = n_starts,\
+                                                    seed = seed, timeout = timeout,\
+                                                    executor = executor, max_workers = max_workers,\
+                                                    trace_opts = trace_opts)
     
     # store component spectra in spds with first axis components, second axis wavelengths
     spds = component_spds 
@@ -1852,7 +2892,13 @@ def spd_optimizer(target = np2d([100,1/3,1/3]), tar_type = 'Yxy', cieobs = _CIEO
     
     if with_wl == True:
         spds = np.vstack((getwlr(wl), spds))
-    return spds, M       
+    
+    if out == 'spds,M':
+        return spds, M
+    elif out == 'spds,M,res':
+        return spds, M, res
+    else:
+        return eval(out)
 
 
 #------------------------------------------------------------------------------
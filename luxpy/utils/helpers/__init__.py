@@ -61,6 +61,12 @@ Module with helper functions
  :todim(): Expand x to dimensions that are broadcast-compatable 
            with shape of another array.
 
+ :parallel_map(): Map a function over iterables, optionally using 
+                  a (process or thread) pool executor.
+
+ :unique_colors(): | Get the unique colors (rows) of an (N,3) array (or image) 
+                   | fast, by packing (8/16 bit) integer channels into a single key.
+
 ===============================================================================
 """
 from .helpers import *
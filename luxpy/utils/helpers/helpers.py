@@ -60,13 +60,20 @@ Module with helper functions
            
  :write_to_excel(): Write a DataFrame to existing an Excel file into specific Sheet.
 
+ :parallel_map(): Map a function over iterables, optionally using 
+                  a (process or thread) pool executor.
+
+ :unique_colors(): | Get the unique colors (rows) of an (N,3) array (or image) 
+                   | fast, by packing (8/16 bit) integer channels into a single key.
+
 ===============================================================================
 """
 
 from luxpy import np, pd, odict, warnings
+import concurrent.futures
 __all__ = ['np2d','np3d','np2dT','np3dT','put_args_in_db','vec_to_dict',
            'getdata','dictkv','OD','meshblock','asplit','ajoin',
-           'broadcast_shape','todim','write_to_excel']
+           'broadcast_shape','todim','write_to_excel','parallel_map','unique_colors']
 
 #--------------------------------------------------------------------------------------------------
 def np2d(data):
@@ -581,4 +588,129 @@ def write_to_excel(filename, df, sheet_name='Sheet1', startrow=None,
     df.to_excel(writer, sheet_name, startrow=startrow, **to_excel_kwargs)
 
     # save the workbook
-    writer.save()
\ No newline at end of file
+    writer.save()
+
+#------------------------------------------------------------------------------
+def parallel_map(fcn, *iterables, executor = None, max_workers = None):
+    """
+    Map a function over iterables, optionally using a pool executor.
+    
+    Args:
+        :fcn: 
+            | function handle 
+            | Must be picklable (i.e. defined at module level) when using
+              a process pool.
+        :iterables:
+            | one or more iterables with input arguments for :fcn:
+        :executor:
+            | None or 'process' or 'thread' or concurrent.futures.Executor, optional
+            |   - None: map :fcn: serially in the current process.
+            |   - 'process': create (and afterwards shut down) 
+            |                a ProcessPoolExecutor.
+            |   - 'thread': create (and afterwards shut down) 
+            |               a ThreadPoolExecutor.
+            |   - Executor instance: use user supplied executor 
+            |                        (is not shut down).
+        :max_workers:
+            | None or int, optional
+            | Number of workers of a newly created executor.
+            | None: use default of concurrent.futures.
+            
+    Returns:
+        :returns:
+            | list with output of :fcn: for each (set of) input argument(s),
+            | in the same order as the input.
+    """
+    if executor is None:
+        return list(map(fcn, *iterables))
+    elif isinstance(executor, concurrent.futures.Executor):
+        return list(executor.map(fcn, *iterables))
+    elif executor == 'process':
+        pool_executor = concurrent.futures.ProcessPoolExecutor
+    elif executor == 'thread':
+        pool_executor = concurrent.futures.ThreadPoolExecutor
+    else:
+        raise Exception("parallel_map(): Unrecognized executor: {}. Options: None, 'process', 'thread' or concurrent.futures.Executor instance.".format(executor))
+    with pool_executor(max_workers = max_workers) as ex:
+        return list(ex.map(fcn, *iterables))
+
+#------------------------------------------------------------------------------
+def unique_colors(rgb, return_index = False, return_inverse = False, return_counts = False):
+    """
+    Get the unique colors (rows) of an (N,3) array with color values 
+    (e.g. the pixels of a rgb image).
+    
+    | For (8 or 16 bit) integer data the three channels are packed into a 
+      single integer key, after which only the (1D) keys are uniqued:
+    |  - 8 bit data: using a bincount over all 2**24 possible keys (no sort,
+    |    for N > 2**20).
+    |  - other integer data (max. 21 bit per channel): using a sort of the keys.
+    | For other data (e.g. float) the rows are uniqued as raw bytes.
+    
+    Args:
+        :rgb: 
+            | ndarray with color values (.shape = (N,3)) or image (.shape = (M,N,3)).
+        :return_index:
+            | False, optional
+            | If True: also return the indices of the first occurrences of 
+              the unique colors in rgb.
+        :return_inverse:
+            | False, optional
+            | If True: also return the indices to reconstruct rgb from the 
+              unique colors.
+        :return_counts:
+            | False, optional
+            | If True: also return the number of times each unique color 
+              appears in rgb.
+            
+    Returns:
+        :rgb_u:
+            | ndarray with unique colors (.shape = (Nu,3), same dtype as rgb).
+            | For integer data the colors are sorted lexicographically (as 
+              for np.unique(rgb, axis = 0)).
+        :index, inverse, counts:
+            | optional outputs (see above).
+    """
+    rgb = np.asarray(rgb)
+    rgb = rgb.reshape(rgb.size//3, 3)
+    
+    if (rgb.dtype.kind in 'ui') and (rgb.shape[0] > 0) and (rgb.min() >= 0) and (rgb.max() < 2**21):
+        # Pack channels into a single (integer) key:
+        nbits = 8 if (rgb.max() < 2**8) else int(np.ceil(np.log2(float(rgb.max()) + 1)))
+        rgbi = rgb.astype(np.int64)
+        keys = (rgbi[:,0] << (2*nbits)) | (rgbi[:,1] << nbits) | rgbi[:,2]
+        
+        if (nbits == 8) & (keys.shape[0] > 2**20):
+            # Use bincount over all possible keys (O(N), for large arrays):
+            counts = np.bincount(keys, minlength = 2**24)
+            keys_u = np.nonzero(counts)[0]
+            lut = np.zeros((2**24,), dtype = np.int64)
+            lut[keys_u] = np.arange(keys_u.shape[0])
+            inverse = lut[keys] if (return_inverse | return_index) else None
+            index = None
+            if return_index:
+                index = np.zeros(keys_u.shape, dtype = np.int64)
+                index[inverse[::-1]] = np.arange(keys.shape[0])[::-1] # first occurrence
+            counts = counts[keys_u]
+        else:
+            keys_u, index, inverse, counts = np.unique(keys, return_index = True, return_inverse = True, return_counts = True)
+        
+        # Unpack keys:
+        mask = (1 << nbits) - 1
+        rgb_u = np.vstack(((keys_u >> (2*nbits)) & mask, (keys_u >> nbits) & mask, keys_u & mask)).T.astype(rgb.dtype)
+        
+    else:
+        # Unique rows as raw bytes:
+        rgbc = np.ascontiguousarray(rgb + 0) if (rgb.dtype.kind == 'f') else np.ascontiguousarray(rgb) # (+0: -0.0 -> 0.0)
+        keys = rgbc.view(np.dtype((np.void, rgbc.dtype.itemsize*3))).ravel()
+        keys_u, index, inverse, counts = np.unique(keys, return_index = True, return_inverse = True, return_counts = True)
+        rgb_u = rgbc[index]
+    
+    out = (rgb_u,)
+    if return_index:
+        out = out + (index,)
+    if return_inverse:
+        out = out + (inverse,)
+    if return_counts:
+        out = out + (counts,)
+    return out[0] if len(out) == 1 else out
@@ -78,10 +78,19 @@ Module with useful math functions
 
  :cik_to_v(): Calculate v-format ellipse descriptor from 2x2 'covariance matrix'^-1 cik.
 
+ :grid_indices(): Get the (flattened) indices of the grid points (pixels) 
+                  in whose sampling window each sample lies (binning).
+
+ :accumarray(): | Accumulate values with identical subscripts (e.g. grid indices)
+                | using numpy.bincount (cfr. matlab accumarray).
+
  :minimizebnd(): scipy.minimize() that allows contrained parameters on 
                  unconstrained methods(port of Matlab's fminsearchbnd). 
                  Starting, lower and upper bounds values can also be provided 
                  as a dict.
+ :minimizede(): | Minimize a population-level objective function using 
+                | (vectorized) differential evolution.
+                
  :DEMO: Module for Differential Evolutionary Multi-objective Optimization  (DEMO).
  
  :vec3: Module for spherical vector coordinates.
@@ -94,6 +103,9 @@ __all__ = basics.__all__
 from .minimizebnd import minimizebnd
 __all__ += ['minimizebnd']
 
+from .minimizede import minimizede
+__all__ += ['minimizede']
+
 from .DEMO import DEMO as DEMO
 __all__ += ['DEMO']
 
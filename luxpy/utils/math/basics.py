@@ -77,6 +77,12 @@ Module with useful basic math functions
 
  :cik_to_v(): Calculate v-format ellipse descriptor from 2x2 'covariance matrix'^-1 cik.
 
+ :grid_indices(): Get the (flattened) indices of the grid points (pixels) 
+                  in whose sampling window each sample lies (binning).
+
+ :accumarray(): | Accumulate values with identical subscripts (e.g. grid indices)
+                | using numpy.bincount (cfr. matlab accumarray).
+
 .. codeauthor:: Kevin A.G. Smet (ksmet1977 at gmail.com)
 ===============================================================================
 """
@@ -89,6 +95,7 @@ __all__  = ['normalize_3x3_matrix','symmM_to_posdefM','check_symmetric',
 __all__ += ['bvgpdf','mahalanobis2','dot23', 'rms','geomean','polyarea']
 __all__ += ['magnitude_v','angle_v1v2']
 __all__ += ['v_to_cik', 'cik_to_v']
+__all__ += ['grid_indices', 'accumarray']
 
 
 #------------------------------------------------------------------------------
@@ -761,3 +768,134 @@ def cik_to_v(cik, xyc = None, inverse = False):
         v[:,2:4] = xyc
     
     return v
+
+#------------------------------------------------------------------------------
+def grid_indices(x, ranges, deltas = None, flatten = True):
+    """
+    Get the indices of the grid points (pixels) in whose sampling window 
+    each sample lies (binning).
+    
+    | The grid points along each dimension are given by 
+      np.arange(ranges[i,0], ranges[i,1], ranges[i,2]).
+    | Instead of looping over all grid points, each sample is assigned 
+      to its nearest grid point(s) by rounding, which makes the binning 
+      linear in the number of samples.
+    
+    Args:
+        :x: 
+            | ndarray with sample coordinates (.shape = (N, ndim))
+        :ranges:
+            | ndarray with grid specification (.shape = (ndim, 3)), 
+              with second axis: min, max, delta.
+        :deltas:
+            | None or float or ndarray, optional
+            | Specifies the sampling window around each grid point.
+            |   - None: city block window with size equal to the grid spacing.
+            |   - ndarray with ndim deltas: city block window, a sample lies 
+            |     in the window if abs(x - xgrid) <= deltas/2 for all dims.
+            |   - float: Euclidean window, a sample lies in the window 
+            |     if the Euclidean distance to the grid point <= deltas/2.
+            | Note that samples can belong to more than one grid point
+              (e.g. on window boundaries or for overlapping windows) or 
+              to none at all (samples outside the grid).
+        :flatten:
+            | True, optional
+            | True: return flattened (C-order) grid indices.
+            | False: return (N_pairs, ndim) ndarray of per-dimension indices.
+            
+    Returns:
+        :returns:
+            | sample_idx, grid_idx, grid_shape
+            |   - :sample_idx: ndarray with sample numbers
+            |   - :grid_idx: ndarray with (flattened) grid point index 
+            |                of each sample in :sample_idx:
+            |   - :grid_shape: tuple with number of grid points 
+            |                  along each dimension.
+    """
+    x = np2d(x)
+    ranges = np2d(ranges)
+    x0 = ranges[:,0]
+    dx = ranges[:,2]
+    grid_shape = tuple([np.arange(*r).shape[0] for r in ranges])
+    
+    # Determine maximum number of neighbouring grid points to check:
+    euclidean = (deltas is not None) and (np.ndim(deltas) == 0)
+    if deltas is None:
+        half_window = dx/2
+    else:
+        half_window = np.ones(dx.shape)*np.asarray(deltas, dtype = float)/2
+    K = np.ceil(half_window/dx).astype(int)
+    
+    # nearest grid point of each sample:
+    idx0 = np.round((x - x0)/dx).astype(int)
+    
+    sample_idx = []
+    grid_idx = []
+    offsets = np.array(np.meshgrid(*[np.arange(-k,k+1) for k in K], indexing = 'ij')).reshape(len(K),-1).T
+    for offset in offsets:
+        idx = idx0 + offset
+        xg = x0 + idx*dx 
+        if euclidean:
+            inwindow = ((x - xg)**2).sum(axis = 1) <= half_window[0]**2
+        else:
+            inwindow = (np.abs(x - xg) <= half_window).all(axis = 1)
+        inwindow &= ((idx >= 0) & (idx < np.array(grid_shape))).all(axis = 1)
+        sample_idx.append(np.where(inwindow)[0])
+        grid_idx.append(idx[inwindow])
+    sample_idx = np.hstack(sample_idx)
+    grid_idx = np.vstack(grid_idx)
+    
+    if flatten == True:
+        grid_idx = np.ravel_multi_index(tuple(grid_idx.T), grid_shape)
+    return sample_idx, grid_idx, grid_shape
+
+#------------------------------------------------------------------------------
+def accumarray(subs, vals, size = None, func = 'sum', fillval = 0):
+    """
+    Accumulate values with identical subscripts using numpy.bincount 
+    (cfr. matlab accumarray).
+    
+    Args:
+        :subs: 
+            | ndarray with (non-negative) integer subscripts (e.g. grid indices)
+        :vals:
+            | ndarray with values to accumulate (.shape = (N,) or (N, K)).
+            | (first axis corresponds to :subs:)
+        :size:
+            | None or int, optional
+            | Size of output along first axis. 
+            | None: subs.max() + 1
+        :func:
+            | 'sum' or 'mean' or 'count', optional
+            | Accumulation function.
+        :fillval:
+            | 0, optional
+            | Value of output for subscripts that have no values.
+            
+    Returns:
+        :returns:
+            | ndarray with accumulated values (.shape = (size,) or (size, K))
+    """
+    subs = np.asarray(subs, dtype = int).ravel()
+    vals = np.asarray(vals, dtype = float)
+    if size is None:
+        size = subs.max() + 1 if (subs.shape[0] > 0) else 0
+    
+    counts = np.bincount(subs, minlength = size).astype(float)
+    if func == 'count':
+        acc = counts
+    else:
+        if vals.ndim == 1:
+            acc = np.bincount(subs, weights = vals, minlength = size)
+        else:
+            acc = np.empty((size,) + vals.shape[1:])
+            for k in range(vals.shape[1]):
+                acc[:,k] = np.bincount(subs, weights = vals[:,k], minlength = size)
+        if func == 'mean':
+            with np.errstate(invalid = 'ignore', divide = 'ignore'):
+                acc = acc/(counts if (vals.ndim == 1) else counts[:,None])
+        elif func != 'sum':
+            raise Exception("accumarray(): Unrecognized func: {}. Options: 'sum', 'mean', 'count'.".format(func))
+    empty = (counts == 0)
+    acc[empty,...] = fillval
+    return acc
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Module with a population-vectorized differential evolution minimizer
+=====================================================================
+
+ :minimizede(): | Minimize a population-level objective function using
+                | differential evolution (DE/rand/1/bin or DE/best/1/bin).
+                | The objective function is called once per generation with
+                | the whole population (popsize x n parameter matrix).
+
+===============================================================================
+"""
+
+from luxpy import np
+
+__all__ = ['minimizede']
+
+def minimizede(fun, x0 = None, args = (), bounds = (None,None), options = None):
+    """
+    Minimize a population-level objective function using differential
+    evolution.
+
+    | Each generation, the trial vectors of the complete population are
+      evaluated in a single call to :fun:, so the objective function can
+      exploit vectorization (e.g. evaluate all spectra at once).
+
+    Args:
+        :fun:
+            | Function handle: fun(X, \\*args), with X an ndarray with
+              parameter values (.shape = (popsize, n)), returning an ndarray
+              with the function value of each member (.shape = (popsize,)).
+            | NaN function values are treated as +inf.
+        :x0:
+            | None or ndarray with parameter starting values, optional
+            | If not None: x0 is included in the initial population.
+        :args:
+            | (), optional
+            | Additional arguments for :fun:.
+        :bounds:
+            | (lower, upper), optional
+            | Tuple of lists or ndarrays of lower and upper bounds.
+            | Infinite (or None) bounds are allowed, but then :x0: (or an 
+              'init_pop' option) is required to determine the range of the 
+              initial population (x0 -/+ (abs(x0)+1)).
+        :options:
+            | None, optional
+            | Dict with optimization options.
+            | None defaults to:
+            |   {'popsize': 10*n, 'maxiter': 1000, 'F': 0.7, 'CR': 0.9,
+            |    'strategy': 'rand1bin', 'tol': 1e-6, 'atol': 0, 'seed': None,
+            |    'disp': False, 'init_pop': None}
+            | - 'F': differential weight (mutation).
+            | - 'CR': crossover probability.
+            | - 'strategy': 'rand1bin' or 'best1bin'
+            | - 'tol', 'atol': stop when
+            |       std(fval population) <= atol + tol*abs(mean(fval population))
+            | - 'seed': None or int or numpy.random.RandomState
+            | - 'init_pop': None or ndarray with initial population.
+
+    Returns:
+        :res:
+            | dict with optimization output:
+            |   - 'x', 'x_final': best solution
+            |   - 'fun', 'fval': function value of best solution
+            |   - 'nit': number of generations, 'nfev': number of function
+            |            evaluations (population members)
+            |   - 'success', 'message'
+            |   - 'population', 'population_fval': final population and its
+            |                                      function values.
+    """
+    # Get options:
+    opts = {'popsize': None, 'maxiter': 1000, 'F': 0.7, 'CR': 0.9,
+            'strategy': 'rand1bin', 'tol': 1e-6, 'atol': 0, 'seed': None,
+            'disp': False, 'init_pop': None}
+    if options is not None:
+        opts.update(options)
+    rng = opts['seed'] if isinstance(opts['seed'], np.random.RandomState) else np.random.RandomState(opts['seed'])
+    init_pop = None if (opts['init_pop'] is None) else np.atleast_2d(opts['init_pop']).astype(float)
+
+    # Process bounds:
+    LB, UB = bounds
+    if x0 is not None:
+        n = np.asarray(x0).size
+    elif init_pop is not None:
+        n = init_pop.shape[1]
+    else:
+        n = np.asarray(LB).size
+    LB = -np.inf*np.ones(n) if LB is None else np.asarray(LB, dtype = float).flatten()*np.ones(n)
+    UB = np.inf*np.ones(n) if UB is None else np.asarray(UB, dtype = float).flatten()*np.ones(n)
+
+    # Range of initial population (used when infinite bounds):
+    if x0 is not None:
+        x0 = np.clip(np.asarray(x0, dtype = float).flatten(), LB, UB)
+        lo = np.where(np.isfinite(LB), LB, x0 - np.abs(x0) - 1)
+        hi = np.where(np.isfinite(UB), UB, x0 + np.abs(x0) + 1)
+    elif init_pop is not None:
+        lo = np.where(np.isfinite(LB), LB, init_pop.min(axis = 0))
+        hi = np.where(np.isfinite(UB), UB, init_pop.max(axis = 0))
+    elif (not np.isfinite(LB).all()) | (not np.isfinite(UB).all()):
+        raise Exception('minimizede(): x0 or init_pop is required when bounds are not finite.')
+    else:
+        lo, hi = LB, UB
+    NP = int(max(10*n if opts['popsize'] is None else opts['popsize'], 5))
+
+    # Initialize population:
+    if init_pop is not None:
+        P = np.clip(init_pop, LB, UB)
+        NP = P.shape[0]
+    else:
+        P = lo + rng.rand(NP,n)*(hi - lo)
+        if x0 is not None:
+            P[0] = x0
+    fP = np.asarray(fun(P, *args), dtype = float).flatten()
+    fP[np.isnan(fP)] = np.inf
+    nfev = NP
+
+    rows = np.arange(NP)
+    nit = 0
+    success, message = False, 'Maximum number of generations reached.'
+    for nit in range(1, opts['maxiter'] + 1):
+
+        # Mutation: pick 3 distinct members different from the target member:
+        r = np.argsort(rng.rand(NP,NP-1), axis = 1)[:,:3]
+        r = r + (r >= rows[:,None])
+        if opts['strategy'] == 'best1bin':
+            base = P[np.argmin(fP)][None,:]
+        else:
+            base = P[r[:,0]]
+        V = base + opts['F']*(P[r[:,1]] - P[r[:,2]])
+
+        # Binomial crossover (at least one parameter from the mutant):
+        cross = rng.rand(NP,n) < opts['CR']
+        cross[rows, rng.randint(n, size = NP)] = True
+        U = np.where(cross, V, P)
+
+        # Re-initialize parameters that violate the bounds:
+        out_of_bounds = (U < LB) | (U > UB)
+        U[out_of_bounds] = (lo + rng.rand(NP,n)*(hi - lo))[out_of_bounds]
+
+        # Selection:
+        fU = np.asarray(fun(U, *args), dtype = float).flatten()
+        fU[np.isnan(fU)] = np.inf
+        nfev += NP
+        better = fU <= fP
+        P[better], fP[better] = U[better], fU[better]
+
+        if opts['disp'] == True:
+            print('minimizede(): generation {:1.0f}: best fval = {:1.6f}'.format(nit, fP.min()))
+
+        # Check convergence:
+        if np.isfinite(fP).all():
+            if np.std(fP) <= (opts['atol'] + opts['tol']*np.abs(np.mean(fP))):
+                success, message = True, 'Population converged.'
+                break
+
+    best = np.argmin(fP)
+    res = {'x' : P[best].copy(), 'fun' : fP[best], 'nit' : nit, 'nfev' : nfev,
+           'success' : success, 'message' : message,
+           'population' : P, 'population_fval' : fP}
+    res['x_final'] = res['x']
+    res['fval'] = res['fun']
+    return res